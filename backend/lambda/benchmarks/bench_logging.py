@@ -0,0 +1,66 @@
+"""ログ出力の呼び出し側のコストを計測する
+
+従来の出力（f-string で組み立てたメッセージを StreamHandler で同期的に書き込む）と、
+common.logger の出力（% 形式の引数をキューに入れ、別スレッドでJSONにして書き込む）を比較する。
+同じテンプレートのINFOが間引かれる場合と、間引かない場合（LOG_SAMPLE_PER_SECOND=0）を計測する
+
+    python benchmarks/bench_logging.py --messages 100000 > /dev/null
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+# devicesディレクトリをパスに追加（Lambdaと同じく common をトップレベルのパッケージとして読み込む）
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'devices'))
+from common.logger import TEXT_FORMAT, configure_logging, flush_logging, setup_logger, shutdown_logging
+
+def per_message(logger: logging.Logger, messages: int, lazy: bool) -> float:
+    """1メッセージあたりの秒数（呼び出し元のスレッドでの時間）"""
+    started = time.perf_counter()
+    if lazy:
+        for i in range(messages):
+            logger.info("デバイスを取得しました: %s", f'device-{i}')
+    else:
+        for i in range(messages):
+            logger.info(f"デバイスを取得しました: {f'device-{i}'}")
+    return (time.perf_counter() - started) / messages
+
+def legacy(messages: int) -> float:
+    logger = logging.getLogger('bench.legacy')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    logger.addHandler(handler)
+    try:
+        return per_message(logger, messages, lazy=False)
+    finally:
+        logger.removeHandler(handler)
+
+def queued(messages: int, sample_per_second: int) -> float:
+    os.environ['LOG_SAMPLE_PER_SECOND'] = str(sample_per_second)
+    configure_logging(force=True)
+    try:
+        return per_message(setup_logger('bench.queued'), messages, lazy=True)
+    finally:
+        flush_logging()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000, help="出力するメッセージ数")
+    args = parser.parse_args()
+
+    results = {
+        'legacy_stream': legacy(args.messages),
+        'queued_json': queued(args.messages, 0),
+        'queued_json_sampled': queued(args.messages, 20),
+    }
+    shutdown_logging()
+    # 結果はログと混ざらないよう標準エラーに出す
+    for name, seconds in results.items():
+        print(f"{name:<20} {seconds * 1e6:>8.2f} us/メッセージ", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""メモリのバックエンド（DB_TYPE=memory）の1デバイスあたりのメモリ使用量を計測する
+
+行ごとの辞書のリスト（RDSの fetchall と同じ形）と、MemoryInterface（インデックスを含む）を比較する
+
+    python benchmarks/bench_memory_backend.py --devices 100000
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+# devicesディレクトリをパスに追加（Lambdaと同じく common をトップレベルのパッケージとして読み込む）
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'devices'))
+from common.memory import MemoryInterface
+
+def generate_rows(count: int, seed: int = 42) -> list:
+    """データベースから読み込んだ行と同じ形のデバイスを生成する"""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            'id': f'{rng.getrandbits(128):032x}',
+            'name': f'テストデバイス{i}',
+            # メーカー名はデータベースから読み込んだ場合と同じく行ごとに別の文字列にする
+            'manufacturer': ''.join(['テストメーカー', str(rng.randrange(50))]),
+            'created_at': base + timedelta(seconds=i),
+            'updated_at': base + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+class _Rows:
+    """source として行のリストを返す（MemoryInterface.hydrate 用）"""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    def iter_devices(self, batch_size: int = 500):
+        yield from self.rows
+
+def measure(build) -> int:
+    """build が作ったオブジェクトが保持しているメモリ（バイト）"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=100000, help="デバイスの件数")
+    parser.add_argument('--json', action='store_true', help="結果をJSONで出力する")
+    args = parser.parse_args()
+
+    # 入力データ自体のメモリを除くため、比較対象ごとに生成して計測する
+    results = {
+        'dict_per_row': measure(lambda: generate_rows(args.devices)),
+        'memory_backend': measure(lambda: _hydrated(args.devices)),
+    }
+    per_device = {name: round(size / args.devices, 1) for name, size in results.items()}
+
+    if args.json:
+        print(json.dumps({'devices': args.devices, 'bytes_per_device': per_device}, indent=2))
+        return
+    print(f"{args.devices}件のデバイスを保持するメモリ（1件あたり）")
+    for name, size in per_device.items():
+        print(f"  {name:<16} {size:>8.1f} bytes")
+
+def _hydrated(count: int) -> MemoryInterface:
+    interface = MemoryInterface()
+    interface.hydrate(_Rows(generate_rows(count)))
+    return interface
+
+if __name__ == '__main__':
+    main()
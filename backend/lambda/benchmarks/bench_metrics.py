@@ -0,0 +1,71 @@
+"""リクエストの計測（Server-Timing・ヒストグラム）のオーバーヘッドを計測する
+
+何もしないASGIアプリを TimingMiddleware あり・なしで呼び出し、1リクエストあたりの差を出す。
+アプリ内では実際のリクエストと同じく db と serialize のステージを記録する
+
+    python benchmarks/bench_metrics.py --requests 100000
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+# devicesディレクトリをパスに追加（Lambdaと同じく common をトップレベルのパッケージとして読み込む）
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'devices'))
+from common.metrics import TimingMiddleware
+from common.timing import stage
+
+async def app(scope, receive, send):
+    with stage('db'):
+        pass
+    with stage('serialize'):
+        pass
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def discard(message):
+    pass
+
+async def per_request(target, requests: int) -> float:
+    """1リクエストあたりの秒数"""
+    route = object()
+    started = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': f'/api/v1/devices/{i}',
+            'route': route, 'path_params': {'device_id': str(i)},
+        }
+        await target(scope, None, discard)
+    return (time.perf_counter() - started) / requests
+
+async def measure(requests: int, rounds: int) -> dict:
+    middleware = TimingMiddleware(app)
+    await per_request(middleware, 1000)
+    # 実行環境の揺れを除くため、複数回の最小値を使う
+    base = min([await per_request(app, requests) for _ in range(rounds)])
+    timed = min([await per_request(middleware, requests) for _ in range(rounds)])
+    return {
+        'base_us': round(base * 1e6, 2),
+        'timed_us': round(timed * 1e6, 2),
+        'overhead_us': round((timed - base) * 1e6, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100000, help="1回あたりのリクエスト数")
+    parser.add_argument('--rounds', type=int, default=5, help="計測の回数")
+    parser.add_argument('--json', action='store_true', help="結果をJSONで出力する")
+    args = parser.parse_args()
+
+    result = asyncio.run(measure(args.requests, args.rounds))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"計測なし      {result['base_us']:>8.2f} us/リクエスト")
+    print(f"計測あり      {result['timed_us']:>8.2f} us/リクエスト")
+    print(f"オーバーヘッド {result['overhead_us']:>8.2f} us/リクエスト")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""デバイス一覧のJSONエンコードのマイクロベンチマーク
+
+従来の実装（行ごとに isoformat() した辞書を indent=2 の json.dumps でエンコード）と、
+common.serialization の各エンジン（datetime をそのまま渡してコンパクトにエンコード）を比較する
+
+    python benchmarks/bench_serialization.py --devices 10000 --repeat 20
+"""
+import os
+import sys
+import json
+import uuid
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+# devicesディレクトリをパスに追加（Lambdaと同じく common をトップレベルのパッケージとして読み込む）
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'devices'))
+from common.serialization import get_encoder
+
+def generate_devices(count: int) -> list:
+    """ベンチマーク用のデバイス（データベースから読み込んだ行と同じ形）を生成する"""
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            'id': str(uuid.uuid4()),
+            'name': f'テストデバイス{i}',
+            'manufacturer': f'テストメーカー{i % 50}',
+            'created_at': base + timedelta(seconds=i),
+            'updated_at': base + timedelta(seconds=i, microseconds=i % 1000),
+        }
+        for i in range(count)
+    ]
+
+def legacy_encode(devices: list) -> bytes:
+    """変更前の FastAPI ハンドラーと同じエンコード"""
+    content = [{
+        'name': device['name'],
+        'manufacturer': device['manufacturer'],
+        'id': device['id'],
+        'created_at': device['created_at'].isoformat(),
+        'updated_at': device['updated_at'].isoformat()
+    } for device in devices]
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=2, separators=(",", ": ")).encode("utf-8")
+
+def measure(encode, devices: list, repeat: int) -> dict:
+    encode(devices)  # ウォームアップ
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(devices)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'bytes': len(body),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=10000, help="エンコードするデバイスの件数")
+    parser.add_argument('--repeat', type=int, default=20, help="計測の繰り返し回数")
+    parser.add_argument('--json', action='store_true', help="結果をJSONで出力する")
+    args = parser.parse_args()
+
+    devices = generate_devices(args.devices)
+    candidates = {'legacy (indent=2)': legacy_encode}
+    for engine in ('json', 'orjson', 'msgspec'):
+        try:
+            __import__(engine)
+        except ImportError:
+            continue
+        candidates[engine] = get_encoder(engine)
+
+    results = {name: measure(encode, devices, args.repeat) for name, encode in candidates.items()}
+    baseline = results['legacy (indent=2)']['median_ms']
+    for result in results.values():
+        result['speedup'] = round(baseline / result['median_ms'], 2)
+
+    if args.json:
+        print(json.dumps({'devices': args.devices, 'repeat': args.repeat, 'results': results}, indent=2))
+        return
+    print(f"{args.devices}件のデバイス一覧のエンコード（{args.repeat}回の中央値）")
+    for name, result in results.items():
+        print(
+            f"  {name:<18} {result['median_ms']:>9.3f} ms  {result['bytes']:>10,} bytes  x{result['speedup']}"
+        )
+
+if __name__ == '__main__':
+    main()
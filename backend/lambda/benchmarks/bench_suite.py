@@ -0,0 +1,430 @@
+"""APIルートとLambdaハンドラーのベンチマーク
+
+FastAPIのアプリ（TestClient経由、SQLiteのデータベース）と、Lambdaのハンドラー
+（create / read / update / delete）を、ローカルで動くバックエンドに対して計測する。
+操作ごとに ops/sec・レイテンシ（p50 / p95 / p99）・1操作あたりのメモリを表示し、
+--output を指定した場合は結果をJSONで保存する（--compare で以前の結果と比較できる）
+
+    python benchmarks/bench_suite.py --sizes 100,1000 --iterations 300 --output bench.json
+    python benchmarks/bench_suite.py --targets handlers:dynamodb --compare bench.json
+
+ターゲット:
+    api                FastAPI + SQLite（DB_TYPE=sqlite、aiosqlite）
+    handlers:memory    Lambdaハンドラー + メモリのバックエンド（DB_TYPE=memory）
+    handlers:sqlite    Lambdaハンドラー + SQLiteのバックエンド（DB_TYPE=sqlite）
+    handlers:dynamodb  Lambdaハンドラー + moto のDynamoDB（moto のインストールが必要）
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+LAMBDA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEVICES_DIR = os.path.join(LAMBDA_DIR, 'devices')
+# FastAPIのアプリは devices パッケージとして、Lambdaのハンドラーは common をトップレベルとして読み込む
+sys.path.insert(0, LAMBDA_DIR)
+sys.path.insert(1, DEVICES_DIR)
+
+# 計測する操作（読み込みを先に計測し、データセットの件数が変わらないようにする）
+OPERATIONS = ('get', 'list', 'update', 'create', 'delete')
+
+# 一覧の1ページの件数
+LIST_PAGE_SIZE = 50
+
+def generate_devices(count: int, rng: random.Random, start: datetime) -> List[Dict]:
+    """ベンチマーク用のデバイスを生成する（乱数のシードが同じなら同じデータになる）"""
+    devices = []
+    for i in range(count):
+        created_at = start + timedelta(seconds=i)
+        devices.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'name': f'ベンチマークデバイス{i}',
+            'manufacturer': f'メーカー{rng.randrange(50)}',
+            'created_at': created_at,
+            'updated_at': created_at,
+        })
+    return devices
+
+def percentile(ordered: List[float], q: float) -> float:
+    """昇順に並んだ値の q パーセンタイル（最近接順位法）"""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize_timings(timings_ms: List[float]) -> Dict[str, float]:
+    """レイテンシの一覧から ops/sec とパーセンタイルを計算する"""
+    ordered = sorted(timings_ms)
+    total_ms = sum(ordered)
+    return {
+        'iterations': len(ordered),
+        'ops_per_sec': round(len(ordered) / (total_ms / 1000), 1) if total_ms else 0.0,
+        'mean_ms': round(total_ms / len(ordered), 4) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 50), 4),
+        'p95_ms': round(percentile(ordered, 95), 4),
+        'p99_ms': round(percentile(ordered, 99), 4),
+        'max_ms': round(ordered[-1], 4) if ordered else 0.0,
+    }
+
+def measure_memory(operation: Callable[[int], None], indexes: range) -> Dict[str, float]:
+    """tracemalloc で1操作あたりのメモリ（ピークの増加量と、操作後に残った量）を計測する
+
+    tracemalloc は処理を大きく遅くするため、レイテンシとは別に少ない回数で計測する
+    """
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for i in indexes:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            operation(i)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    count = max(len(peaks), 1)
+    return {
+        'mem_peak_kib_per_op': round(sum(peaks) / count / 1024, 2),
+        'mem_retained_b_per_op': round(sum(retained) / count, 1),
+    }
+
+def run_operation(operation: Callable[[int], None], iterations: int, warmup: int, memory_samples: int) -> Dict:
+    """ウォームアップ → レイテンシの計測 → メモリの計測の順に実行する
+
+    operation には通し番号を渡す（ウォームアップ・計測・メモリ計測で重複しない）
+    """
+    for i in range(warmup):
+        operation(i)
+    timings_ms = []
+    for i in range(warmup, warmup + iterations):
+        start = time.perf_counter()
+        operation(i)
+        timings_ms.append((time.perf_counter() - start) * 1000)
+    result = summarize_timings(timings_ms)
+    if memory_samples > 0:
+        offset = warmup + iterations
+        result.update(measure_memory(operation, range(offset, offset + memory_samples)))
+    return result
+
+def _check_status(operation: str, status: int, expected: int) -> None:
+    # エラー応答の速さを計測しないよう、想定外のステータスは中断する
+    if status != expected:
+        raise RuntimeError(f"{operation}: ステータス {status}（期待値 {expected}）")
+
+def _use_temporary_sqlite() -> str:
+    """一時ディレクトリのSQLiteを使うよう環境変数を設定し、ディレクトリを返す"""
+    tmpdir = tempfile.mkdtemp(prefix='device-bench-')
+    os.environ['DB_TYPE'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = os.path.join(tmpdir, 'devices.sqlite')
+    return tmpdir
+
+class BenchmarkTarget:
+    """ベンチマークの対象（データの投入と各操作の実行を実装する）"""
+
+    name = ''
+
+    def setup(self, devices: List[Dict]) -> None:
+        """データセットを投入する"""
+        raise NotImplementedError
+
+    def teardown(self) -> None:
+        pass
+
+    def seed(self, devices: List[Dict]) -> None:
+        """計測中に削除する分など、追加のデバイスを投入する"""
+        raise NotImplementedError
+
+    def create(self, i: int) -> None:
+        raise NotImplementedError
+
+    def get(self, device_id: str) -> None:
+        raise NotImplementedError
+
+    def list(self) -> None:
+        raise NotImplementedError
+
+    def update(self, device_id: str, i: int) -> None:
+        raise NotImplementedError
+
+    def delete(self, device_id: str) -> None:
+        raise NotImplementedError
+
+class ApiTarget(BenchmarkTarget):
+    """FastAPIのアプリを TestClient 経由で呼び出す（データベースは一時ディレクトリのSQLite）"""
+
+    name = 'api'
+    prefix = '/api/v1/devices'
+
+    def setup(self, devices: List[Dict]) -> None:
+        from fastapi.testclient import TestClient
+        from devices.common.settings import reload_settings
+        from devices.database import reset_engines
+        from devices.main import app
+
+        # database.py の DB_TYPE=sqlite のエンジン（テーブルは最初の接続時に作成される）
+        self._tmpdir = _use_temporary_sqlite()
+        reload_settings()
+        reset_engines()
+        self.seed(devices)
+
+        self._client = TestClient(app)
+        self._client.__enter__()
+
+    def teardown(self) -> None:
+        from devices.database import get_async_engine, reset_engines
+        # 非同期エンジンの接続は TestClient のイベントループ上で閉じる
+        self._client.portal.call(get_async_engine().dispose)
+        self._client.__exit__(None, None, None)
+        reset_engines()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def seed(self, devices: List[Dict]) -> None:
+        from devices.database import new_session
+        from devices.models import Device
+        session = new_session()
+        try:
+            session.add_all(Device(**device) for device in devices)
+            session.commit()
+        finally:
+            session.close()
+
+    def create(self, i: int) -> None:
+        response = self._client.post(f"{self.prefix}/", json={'name': f'新規デバイス{i}', 'manufacturer': 'ベンチマーク'})
+        _check_status('create', response.status_code, 201)
+
+    def get(self, device_id: str) -> None:
+        _check_status('get', self._client.get(f"{self.prefix}/{device_id}").status_code, 200)
+
+    def list(self) -> None:
+        _check_status('list', self._client.get(f"{self.prefix}/", params={'limit': LIST_PAGE_SIZE}).status_code, 200)
+
+    def update(self, device_id: str, i: int) -> None:
+        response = self._client.put(f"{self.prefix}/{device_id}", json={'name': f'更新デバイス{i}', 'manufacturer': 'ベンチマーク'})
+        _check_status('update', response.status_code, 200)
+
+    def delete(self, device_id: str) -> None:
+        _check_status('delete', self._client.delete(f"{self.prefix}/{device_id}").status_code, 200)
+
+class HandlerTarget(BenchmarkTarget):
+    """Lambdaのハンドラーを API Gateway のプロキシ統合と同じ形のイベントで呼び出す"""
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.name = f'handlers:{backend}'
+
+    def setup(self, devices: List[Dict]) -> None:
+        import create, read, update, delete
+        from common.db_interface import get_db_interface
+        from common.db_registry import registry
+        from common.settings import reload_settings
+        self._handlers = {'create': create, 'read': read, 'update': update, 'delete': delete}
+        if self.backend == 'dynamodb':
+            self._start_dynamodb()
+        elif self.backend == 'sqlite':
+            self._tmpdir = _use_temporary_sqlite()
+        # ハンドラーと同じく DB_TYPE で選択されたインターフェースを使う
+        os.environ['DB_TYPE'] = self.backend
+        reload_settings()
+        registry.clear()
+        self._interface = get_db_interface()
+        self.seed(devices)
+
+    def _start_dynamodb(self) -> None:
+        try:
+            from moto import mock_aws as mock_dynamodb
+        except ImportError:
+            from moto import mock_dynamodb
+        import boto3
+        os.environ.update({
+            'AWS_REGION': 'ap-northeast-1',
+            'AWS_DEFAULT_REGION': 'ap-northeast-1',
+            'AWS_ACCESS_KEY_ID': 'bench',
+            'AWS_SECRET_ACCESS_KEY': 'bench',
+            'DYNAMODB_TABLE_NAME': 'devices-bench',
+        })
+        self._mock = mock_dynamodb()
+        self._mock.start()
+        boto3.client('dynamodb').create_table(
+            TableName='devices-bench',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': field, 'AttributeType': 'S'} for field in ('id', 'name', 'manufacturer')
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': f'{field}-index',
+                    'KeySchema': [{'AttributeName': field, 'KeyType': 'HASH'}],
+                    'Projection': {'ProjectionType': 'ALL'},
+                }
+                for field in ('name', 'manufacturer')
+            ],
+            BillingMode='PAY_PER_REQUEST',
+        )
+
+    def teardown(self) -> None:
+        from common.db_registry import registry
+        registry.clear()
+        if getattr(self, '_mock', None) is not None:
+            self._mock.stop()
+        if getattr(self, '_tmpdir', None) is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def seed(self, devices: List[Dict]) -> None:
+        rows = [dict(device, created_at=device['created_at'].isoformat(), updated_at=device['updated_at'].isoformat())
+                for device in devices]
+        for result in self._interface.create_devices(rows):
+            if not result['success']:
+                raise RuntimeError(f"データの投入に失敗しました: {result['error']}")
+
+    def _invoke(self, operation: str, module: str, event: Dict, expected: int) -> None:
+        response = self._handlers[module].handler(event, None)
+        _check_status(operation, response['statusCode'], expected)
+
+    def create(self, i: int) -> None:
+        body = json.dumps({'name': f'新規デバイス{i}', 'manufacturer': 'ベンチマーク'}, ensure_ascii=False)
+        self._invoke('create', 'create', {'body': body}, 201)
+
+    def get(self, device_id: str) -> None:
+        self._invoke('get', 'read', {'pathParameters': {'id': device_id}}, 200)
+
+    def list(self) -> None:
+        self._invoke('list', 'read', {'queryStringParameters': {'limit': str(LIST_PAGE_SIZE)}}, 200)
+
+    def update(self, device_id: str, i: int) -> None:
+        body = json.dumps({'name': f'更新デバイス{i}', 'manufacturer': 'ベンチマーク'}, ensure_ascii=False)
+        self._invoke('update', 'update', {'pathParameters': {'id': device_id}, 'body': body}, 200)
+
+    def delete(self, device_id: str) -> None:
+        self._invoke('delete', 'delete', {'pathParameters': {'id': device_id}}, 200)
+
+def create_target(name: str) -> BenchmarkTarget:
+    if name == 'api':
+        return ApiTarget()
+    if name.startswith('handlers:'):
+        return HandlerTarget(name.split(':', 1)[1])
+    raise ValueError(f"不明なターゲット: {name}")
+
+def run_target(target_name: str, size: int, args) -> Dict[str, Dict]:
+    """1つのターゲット・データセットの件数について全操作を計測する"""
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1)
+    devices = generate_devices(size, rng, start)
+    ids = [device['id'] for device in devices]
+    per_operation = args.warmup + args.iterations + args.memory_samples
+
+    target = create_target(target_name)
+    target.setup(devices)
+    # ハンドラーはインポート時にログレベルを INFO にするため、読み込んだ後で設定する
+    logging.getLogger().setLevel(args.log_level.upper())
+    try:
+        results = {}
+        for operation in args.operations:
+            if operation == 'get':
+                func = lambda i: target.get(ids[rng.randrange(size)])
+            elif operation == 'list':
+                func = lambda i: target.list()
+            elif operation == 'update':
+                func = lambda i: target.update(ids[rng.randrange(size)], i)
+            elif operation == 'create':
+                func = target.create
+            else:
+                # 削除する分はデータセットとは別に投入しておく
+                extra = generate_devices(per_operation, rng, start + timedelta(days=1))
+                target.seed(extra)
+                extra_ids = [device['id'] for device in extra]
+                func = lambda i: target.delete(extra_ids[i])
+            results[operation] = run_operation(func, args.iterations, args.warmup, args.memory_samples)
+            print(f"  {target_name:<18} n={size:<7} {operation:<7} " + _format_result(results[operation]))
+        return results
+    finally:
+        target.teardown()
+
+def _format_result(result: Dict) -> str:
+    line = (f"{result['ops_per_sec']:>10,.1f} ops/s  p50 {result['p50_ms']:.3f} ms  "
+            f"p95 {result['p95_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms")
+    if 'mem_peak_kib_per_op' in result:
+        line += f"  peak {result['mem_peak_kib_per_op']:.1f} KiB/op"
+    return line
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=LAMBDA_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: Dict, baseline: Dict) -> None:
+    """以前の結果と ops/sec・p95 を比較して表示する"""
+    print(f"\n比較（基準: {baseline['metadata'].get('revision')} {baseline['metadata'].get('timestamp')}）")
+    for key, operations in current['results'].items():
+        for operation, result in operations.items():
+            base = baseline['results'].get(key, {}).get(operation)
+            if not base:
+                continue
+            throughput = (result['ops_per_sec'] / base['ops_per_sec'] - 1) * 100 if base['ops_per_sec'] else 0.0
+            latency = (result['p95_ms'] / base['p95_ms'] - 1) * 100 if base['p95_ms'] else 0.0
+            print(f"  {key:<26} {operation:<7} ops/s {throughput:+7.1f}%  p95 {latency:+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--targets', default='api,handlers:memory', help="計測するターゲット（カンマ区切り）")
+    parser.add_argument('--sizes', default='1000', help="データセットの件数（カンマ区切り）")
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help="計測する操作（カンマ区切り）")
+    parser.add_argument('--iterations', type=int, default=200, help="操作ごとの計測回数")
+    parser.add_argument('--warmup', type=int, default=20, help="操作ごとのウォームアップ回数")
+    parser.add_argument('--memory-samples', type=int, default=20, help="メモリを計測する回数（0は計測しない）")
+    parser.add_argument('--seed', type=int, default=42, help="データ生成の乱数シード")
+    parser.add_argument('--log-level', default='WARNING', help="計測中のログレベル")
+    parser.add_argument('--output', help="結果を保存するJSONファイル")
+    parser.add_argument('--compare', help="比較する以前の結果のJSONファイル")
+    args = parser.parse_args()
+
+    args.operations = [op.strip() for op in args.operations.split(',') if op.strip()]
+    unknown = [op for op in args.operations if op not in OPERATIONS]
+    if unknown:
+        parser.error(f"不明な操作: {', '.join(unknown)}")
+    targets = [target.strip() for target in args.targets.split(',') if target.strip()]
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    report = {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        },
+        'results': {},
+    }
+    for target_name in targets:
+        for size in sizes:
+            try:
+                report['results'][f'{target_name}@{size}'] = run_target(target_name, size, args)
+            except ImportError as e:
+                print(f"  {target_name}: 必要なパッケージがないためスキップします（{e}）")
+                break
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import json
+from common.db_interface import get_db_interface, report_db_interface_failure
+from common.exceptions import ValidationError
+from common.batch import validate_batch, prepare_batch, batch_summary
+from common.serialization import dumps_text
+from common.metrics import timed_handler
+from common.logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+@timed_handler('batch_create')
+def handler(event, context):
+    """複数のデバイスを一括で作成するLambda関数
+
+    リクエストボディは {"devices": [{"name": ..., "manufacturer": ...}, ...]}
+    結果は要素ごとに成功・失敗を返す（全件成功は201、一部でも失敗があれば207）
+    """
+    try:
+        # リクエストボディの取得
+        body = json.loads(event['body'])
+        items = validate_batch(body.get('devices') if isinstance(body, dict) else None)
+
+        # 要素ごとの検証（不正な要素だけを失敗とし、残りは登録する）
+        devices, results = prepare_batch(items)
+
+        if devices:
+            # データベース操作
+            db = get_db_interface()
+            created = db.create_devices([device_data for _, device_data in devices])
+            for (index, _), result in zip(devices, created):
+                results.append(dict(result, index=index))
+
+        summary = batch_summary(results)
+        return {
+            'statusCode': 201 if summary['failed'] == 0 else 207,
+            'body': dumps_text(summary)
+        }
+
+    except ValidationError as e:
+        return {
+            'statusCode': 400,
+            'body': dumps_text({
+                'error': str(e),
+                'details': e.details
+            })
+        }
+    except Exception as e:
+        logger.error("エラー: %s", e)
+        # 接続が壊れている可能性があるため、次回の呼び出しでヘルスチェックを行う
+        report_db_interface_failure()
+        return {
+            'statusCode': 500,
+            'body': dumps_text({
+                'error': 'Internal server error'
+            })
+        }
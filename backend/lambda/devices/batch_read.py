@@ -0,0 +1,53 @@
+import json
+from common.db_interface import get_db_interface, report_db_interface_failure
+from common.exceptions import ValidationError
+from common.batch import validate_lookup_ids
+from common.fields import normalize_fields
+from common.serialization import dumps_text
+from common.metrics import timed_handler
+from common.logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+@timed_handler('batch_read')
+def handler(event, context):
+    """指定された複数のIDのデバイスをまとめて取得するLambda関数
+
+    リクエストボディは {"ids": ["...", ...]}
+    見つからなかったIDはエラーとせず missing で返す
+    クエリパラメータ fields（カンマ区切り）を指定した場合は、そのフィールドだけを読み込んで返す
+    """
+    try:
+        # リクエストボディの取得
+        body = json.loads(event['body'])
+        device_ids = validate_lookup_ids(body.get('ids') if isinstance(body, dict) else None)
+        fields = normalize_fields((event.get('queryStringParameters') or {}).get('fields'))
+
+        # データベース操作
+        db = get_db_interface()
+        result = db.get_devices(device_ids, fields)
+
+        return {
+            'statusCode': 200,
+            'body': dumps_text(result)
+        }
+
+    except ValidationError as e:
+        return {
+            'statusCode': 400,
+            'body': dumps_text({
+                'error': str(e),
+                'details': e.details
+            })
+        }
+    except Exception as e:
+        logger.error("エラー: %s", e)
+        # 接続が壊れている可能性があるため、次回の呼び出しでヘルスチェックを行う
+        report_db_interface_failure()
+        return {
+            'statusCode': 500,
+            'body': dumps_text({
+                'error': 'Internal server error'
+            })
+        }
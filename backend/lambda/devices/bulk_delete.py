@@ -0,0 +1,52 @@
+import json
+from common.db_interface import get_db_interface, report_db_interface_failure
+from common.exceptions import ValidationError
+from common.batch import validate_delete_request
+from common.serialization import dumps_text
+from common.metrics import timed_handler
+from common.logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+@timed_handler('bulk_delete')
+def handler(event, context):
+    """複数のデバイスをまとめて削除するLambda関数
+
+    リクエストボディは {"ids": ["...", ...]} または {"manufacturer": "..."}（どちらか一方）
+    見つからなかったIDはエラーとせず missing で返す
+    """
+    try:
+        # リクエストボディの取得
+        body = json.loads(event['body'])
+        if not isinstance(body, dict):
+            body = {}
+        device_ids, manufacturer = validate_delete_request(body.get('ids'), body.get('manufacturer'))
+
+        # データベース操作（削除したIDと見つからなかったIDを返す）
+        db = get_db_interface()
+        result = db.delete_devices(device_ids, manufacturer)
+
+        return {
+            'statusCode': 200,
+            'body': dumps_text(result)
+        }
+
+    except ValidationError as e:
+        return {
+            'statusCode': 400,
+            'body': dumps_text({
+                'error': str(e),
+                'details': e.details
+            })
+        }
+    except Exception as e:
+        logger.error("エラー: %s", e)
+        # 接続が壊れている可能性があるため、次回の呼び出しでヘルスチェックを行う
+        report_db_interface_failure()
+        return {
+            'statusCode': 500,
+            'body': dumps_text({
+                'error': 'Internal server error'
+            })
+        }
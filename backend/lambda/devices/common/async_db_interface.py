@@ -0,0 +1,84 @@
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+class AsyncDatabaseInterface(ABC):
+    """データベース操作の抽象クラス（非同期版）
+
+    DatabaseInterface と同じ操作を async メソッドとして提供する
+    """
+
+    @abstractmethod
+    async def create_device(self, device_data: Dict) -> Dict:
+        """デバイスを作成する"""
+        pass
+
+    @abstractmethod
+    async def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスを取得する（fields 指定時はそのフィールドだけを読み込む）"""
+        pass
+
+    @abstractmethod
+    async def update_device(self, device_id: str, device_data: Dict) -> Optional[Dict]:
+        """デバイスを更新する"""
+        pass
+
+    @abstractmethod
+    async def delete_device(self, device_id: str) -> bool:
+        """デバイスを削除する"""
+        pass
+
+    @abstractmethod
+    async def list_devices(self) -> List[Dict]:
+        """全デバイスを取得する"""
+        pass
+
+    @abstractmethod
+    async def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """デバイスを1ページ分取得する（引数・戻り値は DatabaseInterface.list_devices_page と同じ）"""
+        pass
+
+    @abstractmethod
+    def iter_devices(self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None) -> AsyncIterator[Dict]:
+        """全デバイスを batch_size 件ずつ読み込みながら逐次返す（非同期ジェネレーター）"""
+        pass
+
+    async def close(self) -> None:
+        """保持している接続を解放する"""
+        pass
+
+# プロセス内で共有するインスタンス（DB種別ごと）
+_async_interfaces: Dict[str, AsyncDatabaseInterface] = {}
+
+def get_async_db_interface() -> AsyncDatabaseInterface:
+    """
+    環境変数に基づいて適切な非同期データベースインターフェースを返す
+    DB_TYPE環境変数が 'dynamodb' の場合はDynamoDB、それ以外の場合はRDSを使用
+
+    接続プールやクライアントを使い回すため、インスタンスはプロセス内で共有する
+    """
+    from .settings import load_env
+    load_env()
+    db_type = os.getenv('DB_TYPE', 'rds').lower()
+    interface = _async_interfaces.get(db_type)
+    if interface is None:
+        if db_type == 'dynamodb':
+            from .async_dynamodb import AsyncDynamoDBInterface
+            logger.info("Using async DynamoDB interface")
+            interface = AsyncDynamoDBInterface()
+        else:
+            from .async_rds import AsyncRDSInterface
+            logger.info("Using async RDS interface")
+            interface = AsyncRDSInterface()
+        _async_interfaces[db_type] = interface
+    return interface
@@ -0,0 +1,171 @@
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+import aioboto3
+from botocore.exceptions import ClientError
+from .async_db_interface import AsyncDatabaseInterface
+from .pagination import encode_cursor, decode_cursor
+from .dynamodb import build_read_request, projection_kwargs
+from .settings import get_settings
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+class AsyncDynamoDBInterface(AsyncDatabaseInterface):
+    """DynamoDBを使用したデバイス管理クラス（非同期版、aioboto3）"""
+
+    def __init__(self):
+        """セッションの初期化（テーブルのリソースは最初の操作時に生成する）"""
+        self.session = aioboto3.Session()
+        self.region = get_settings().aws_region
+        self.table_name = get_settings().dynamodb_table_name
+        self._resource_context = None
+        self._table = None
+        self._lock = asyncio.Lock()
+
+    async def _get_table(self):
+        """DynamoDBテーブルのリソースを返す（初回のみ生成）"""
+        if self._table is None:
+            async with self._lock:
+                if self._table is None:
+                    try:
+                        self._resource_context = self.session.resource(
+                            'dynamodb', region_name=self.region
+                        )
+                        dynamodb = await self._resource_context.__aenter__()
+                        self._table = await dynamodb.Table(self.table_name)
+                        logger.info("DynamoDBテーブル %s に接続しました", self.table_name)
+                    except ClientError as e:
+                        logger.error("DynamoDB接続エラー: %s", e.response['Error']['Message'])
+                        raise
+        return self._table
+
+    async def create_device(self, device_data: Dict) -> Dict:
+        """デバイスを作成する"""
+        table = await self._get_table()
+        try:
+            await table.put_item(Item=device_data)
+            logger.info("デバイスを作成しました: %s", device_data['id'])
+            return device_data
+        except ClientError as e:
+            logger.error("デバイス作成エラー: %s", e.response['Error']['Message'])
+            raise
+
+    async def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスを取得する（fields 指定時は ProjectionExpression でその属性だけを読み込む）"""
+        table = await self._get_table()
+        try:
+            response = await table.get_item(Key={'id': device_id}, **projection_kwargs(fields))
+            device = response.get('Item')
+            if device:
+                logger.info("デバイスを取得しました: %s", device_id)
+            else:
+                logger.info("デバイスが見つかりません: %s", device_id)
+            return device
+        except ClientError as e:
+            logger.error("デバイス取得エラー: %s", e.response['Error']['Message'])
+            raise
+
+    async def update_device(self, device_id: str, update_data: Dict) -> Optional[Dict]:
+        """デバイスを更新する"""
+        fields = {k: v for k, v in update_data.items() if k != 'id'}  # idは更新しない
+        update_expression = "SET " + ", ".join(f"#{key} = :{key}" for key in fields)
+
+        table = await self._get_table()
+        try:
+            response = await table.update_item(
+                Key={'id': device_id},
+                UpdateExpression=update_expression,
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeValues={f":{key}": value for key, value in fields.items()},
+                ExpressionAttributeNames={f"#{key}": key for key in fields},
+                ReturnValues="ALL_NEW"
+            )
+            updated_device = response.get('Attributes')
+            logger.info("デバイスを更新しました: %s", device_id)
+            return updated_device
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logger.info("更新対象のデバイスが見つかりません: %s", device_id)
+                return None
+            logger.error("デバイス更新エラー: %s", e.response['Error']['Message'])
+            raise
+
+    async def delete_device(self, device_id: str) -> bool:
+        """デバイスを削除する"""
+        table = await self._get_table()
+        try:
+            await table.delete_item(
+                Key={'id': device_id},
+                ConditionExpression="attribute_exists(id)"
+            )
+            logger.info("デバイスを削除しました: %s", device_id)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logger.info("削除対象のデバイスが見つかりません: %s", device_id)
+                return False
+            logger.error("デバイス削除エラー: %s", e.response['Error']['Message'])
+            raise
+
+    async def list_devices(self) -> List[Dict]:
+        """全デバイスを取得する（LastEvaluatedKey を辿って全ページを読み込む）"""
+        devices = [device async for device in self.iter_devices()]
+        logger.info("デバイス一覧を取得しました: %s件", len(devices))
+        return devices
+
+    async def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """デバイスを1ページ分取得する（LastEvaluatedKey をカーソルとして使用、絞り込み時はGSIへの Query）"""
+        operation, read_kwargs = build_read_request(filters)
+        read_kwargs.update(projection_kwargs(fields))
+        read_kwargs['Limit'] = limit
+        if cursor:
+            read_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+        table = await self._get_table()
+        try:
+            response = await getattr(table, operation)(**read_kwargs)
+            devices = response.get('Items', [])
+            last_key = response.get('LastEvaluatedKey')
+            next_cursor = encode_cursor(last_key) if last_key else None
+            logger.info("デバイス一覧を取得しました: %s件", len(devices))
+            return {'items': devices, 'next_cursor': next_cursor}
+        except ClientError as e:
+            logger.error("デバイス一覧取得エラー: %s", e.response['Error']['Message'])
+            raise
+
+    async def iter_devices(
+        self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Dict]:
+        """全デバイスを Scan（絞り込み時はGSIへの Query）のページを辿りながら逐次返す"""
+        operation, read_kwargs = build_read_request(filters)
+        read_kwargs['Limit'] = batch_size
+        count = 0
+        table = await self._get_table()
+        try:
+            while True:
+                response = await getattr(table, operation)(**read_kwargs)
+                items = response.get('Items', [])
+                count += len(items)
+                for item in items:
+                    yield item
+                last_key = response.get('LastEvaluatedKey')
+                if not last_key:
+                    break
+                read_kwargs['ExclusiveStartKey'] = last_key
+            logger.info("デバイス一覧をストリーミングしました: %s件", count)
+        except ClientError as e:
+            logger.error("デバイス一覧取得エラー: %s", e.response['Error']['Message'])
+            raise
+
+    async def close(self) -> None:
+        """DynamoDBリソースのクライアントを閉じる"""
+        if self._resource_context is not None:
+            await self._resource_context.__aexit__(None, None, None)
+            self._resource_context = None
+            self._table = None
@@ -0,0 +1,227 @@
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import URL
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from .async_db_interface import AsyncDatabaseInterface
+from .pagination import FILTER_FIELDS, encode_keyset_cursor, decode_keyset_cursor
+from .rds import DEVICE_COLUMNS
+from .fields import column_list, with_fields, project
+from .search import normalize_text
+from .settings import get_settings
+from .clock import SESSION_TIME_ZONE_INIT, utc_now
+from .db_health import install_sqlalchemy_health_checks
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+class AsyncRDSInterface(AsyncDatabaseInterface):
+    """RDS（MySQL）インターフェースの非同期実装クラス
+
+    SQLAlchemyの非同期エンジン（aiomysql）を使用し、待ち時間の間イベントループを解放する
+    """
+
+    def __init__(self):
+        """非同期エンジンの初期化（接続は最初のクエリ実行時に確立する）"""
+        settings = get_settings()
+        self.engine = create_async_engine(
+            URL.create(
+                "mysql+aiomysql",
+                username=settings.rds_user,
+                password=settings.rds_password,
+                host=settings.rds_host,
+                port=settings.rds_port,
+                database=settings.rds_database,
+                query={"charset": "utf8mb4"}
+            ),
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_pool_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=3600,
+            connect_args={"init_command": SESSION_TIME_ZONE_INIT}
+        )
+        # 長くアイドルだった接続だけを、借りる時に確認する
+        self.health = install_sqlalchemy_health_checks(self.engine, 'rds_async')
+
+    async def create_device(self, device_data: Dict) -> Dict:
+        """デバイスを作成する（INSERT 1回で完了し、作成したレコードは手元の値から組み立てる）"""
+        now = utc_now()
+        device = {
+            'id': device_data.get('id') or str(uuid.uuid4()),
+            'name': device_data['name'],
+            'manufacturer': device_data['manufacturer'],
+            'created_at': now,
+            'updated_at': now
+        }
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(
+                    text("""
+                        INSERT INTO devices (id, name, manufacturer, name_search, created_at, updated_at)
+                        VALUES (:id, :name, :manufacturer, :name_search, :created_at, :updated_at)
+                    """),
+                    dict(device, name_search=normalize_text(device['name']))
+                )
+            logger.info("デバイスを作成しました: %s", device['id'])
+            return device
+        except SQLAlchemyError as e:
+            logger.error("デバイス作成エラー: %s", e)
+            raise
+
+    async def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスを取得する（fields 指定時はその列だけを読み込む）"""
+        try:
+            async with self.engine.connect() as conn:
+                result = await conn.execute(
+                    text(f"SELECT {column_list(fields)} FROM devices WHERE id = :id"),
+                    {'id': device_id}
+                )
+                row = result.mappings().first()
+            if row:
+                logger.info("デバイスを取得しました: %s", device_id)
+                return dict(row)
+            logger.info("デバイスが見つかりません: %s", device_id)
+            return None
+        except SQLAlchemyError as e:
+            logger.error("デバイス取得エラー: %s", e)
+            raise
+
+    async def update_device(self, device_id: str, update_data: Dict) -> Optional[Dict]:
+        """デバイスを更新し、更新後のデバイスを返す（UPDATE と更新後の行の SELECT を1トランザクションで実行する）"""
+        # 更新可能なフィールドを指定
+        allowed_fields = ['name', 'manufacturer']
+        update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
+
+        if not update_fields:
+            logger.warning("更新可能なフィールドがありません: %s", device_id)
+            return None
+
+        # UPDATE文の構築（名前を変更する場合は検索用の列も更新する）
+        columns = dict(update_fields)
+        if 'name' in columns:
+            columns['name_search'] = normalize_text(columns['name'])
+        set_clause = ", ".join([f"{field} = :{field}" for field in columns.keys()])
+        query = text(f"UPDATE devices SET {set_clause}, updated_at = :updated_at WHERE id = :id")
+        params = dict(columns, updated_at=utc_now(), id=device_id)
+
+        device = None
+        try:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(query, params)
+                # 一致した行がなければ読み直さない（行ロック中のため、他の書き込みに変更される前の値を読む）
+                if result.rowcount > 0:
+                    row = (await conn.execute(
+                        text(f"SELECT {DEVICE_COLUMNS} FROM devices WHERE id = :id"), {'id': device_id}
+                    )).mappings().first()
+                    device = dict(row) if row is not None else None
+        except SQLAlchemyError as e:
+            logger.error("デバイス更新エラー: %s", e)
+            raise
+
+        if device is None:
+            logger.info("更新対象のデバイスが見つかりません: %s", device_id)
+            return None
+        logger.info("デバイスを更新しました: %s", device_id)
+        return device
+
+    async def delete_device(self, device_id: str) -> bool:
+        """デバイスを削除する"""
+        try:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(
+                    text("DELETE FROM devices WHERE id = :id"),
+                    {'id': device_id}
+                )
+            deleted = result.rowcount > 0
+            if deleted:
+                logger.info("デバイスを削除しました: %s", device_id)
+            else:
+                logger.info("削除対象のデバイスが見つかりません: %s", device_id)
+            return deleted
+        except SQLAlchemyError as e:
+            logger.error("デバイス削除エラー: %s", e)
+            raise
+
+    async def list_devices(self) -> List[Dict]:
+        """全デバイスを取得する"""
+        try:
+            async with self.engine.connect() as conn:
+                result = await conn.execute(text(f"SELECT {DEVICE_COLUMNS} FROM devices"))
+                devices = [dict(row) for row in result.mappings()]
+            logger.info("デバイス一覧を取得しました: %s件", len(devices))
+            return devices
+        except SQLAlchemyError as e:
+            logger.error("デバイス一覧取得エラー: %s", e)
+            raise
+
+    @staticmethod
+    def _filter_conditions(filters: Optional[Dict[str, str]]) -> Tuple[List[str], Dict[str, Any]]:
+        """絞り込み条件をWHERE句の条件とパラメータに変換する（name / manufacturer はインデックスを使用）"""
+        conditions = []
+        params = {}
+        for field in FILTER_FIELDS:
+            if filters and filters.get(field) is not None:
+                conditions.append(f"{field} = :{field}")
+                params[field] = filters[field]
+        return conditions, params
+
+    async def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """デバイスを1ページ分取得する（(created_at, id) によるキーセットページネーション）"""
+        conditions, params = self._filter_conditions(filters)
+        if cursor:
+            created_at, last_id = decode_keyset_cursor(cursor)
+            conditions.append("(created_at > :created_at OR (created_at = :created_at AND id > :id))")
+            params.update(created_at=created_at, id=last_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = column_list(with_fields(fields, 'created_at'))
+        query = text(f"SELECT {columns} FROM devices {where} ORDER BY created_at, id LIMIT :limit")
+        params['limit'] = limit + 1
+
+        try:
+            # 次ページの有無を判定するため1件多く取得する
+            async with self.engine.connect() as conn:
+                result = await conn.execute(query, params)
+                devices = [dict(row) for row in result.mappings()]
+        except SQLAlchemyError as e:
+            logger.error("デバイス一覧取得エラー: %s", e)
+            raise
+
+        next_cursor = None
+        if len(devices) > limit:
+            devices = devices[:limit]
+            next_cursor = encode_keyset_cursor(devices[-1]['created_at'], devices[-1]['id'])
+        logger.info("デバイス一覧を取得しました: %s件", len(devices))
+        return {'items': [project(device, fields) for device in devices], 'next_cursor': next_cursor}
+
+    async def iter_devices(
+        self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Dict]:
+        """全デバイスをサーバーサイドカーソルで batch_size 件ずつ逐次返す"""
+        conditions, params = self._filter_conditions(filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        count = 0
+        try:
+            async with self.engine.connect() as conn:
+                result = await conn.stream(
+                    text(f"SELECT {DEVICE_COLUMNS} FROM devices {where} ORDER BY created_at, id"), params
+                )
+                async for rows in result.mappings().partitions(batch_size):
+                    count += len(rows)
+                    for row in rows:
+                        yield dict(row)
+            logger.info("デバイス一覧をストリーミングしました: %s件", count)
+        except SQLAlchemyError as e:
+            logger.error("デバイス一覧取得エラー: %s", e)
+            raise
+
+    async def close(self) -> None:
+        """エンジンの接続プールを破棄する"""
+        await self.engine.dispose()
@@ -0,0 +1,128 @@
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .exceptions import ValidationError
+
+# 1リクエストで登録できる最大件数
+MAX_BATCH_SIZE = int(os.getenv('DEVICE_BATCH_MAX_SIZE', '1000'))
+
+# 1リクエストで取得できる最大ID数
+MAX_LOOKUP_IDS = int(os.getenv('DEVICE_LOOKUP_MAX_IDS', '1000'))
+
+# 1リクエストで削除できる最大ID数
+MAX_DELETE_IDS = int(os.getenv('DEVICE_DELETE_MAX_IDS', '1000'))
+
+# 必須フィールド
+REQUIRED_FIELDS = ('name', 'manufacturer')
+
+def validate_batch(items: Any) -> List[Any]:
+    """一括登録のリクエスト全体を検証する
+
+    Raises:
+        ValidationError: リストでない、空、または最大件数を超える場合
+    """
+    if not isinstance(items, list):
+        raise ValidationError("devicesはリストで指定してください", {"field": "devices"})
+    if not items:
+        raise ValidationError("devicesが空です", {"field": "devices"})
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValidationError(
+            f"一度に登録できるデバイスは{MAX_BATCH_SIZE}件までです",
+            {"field": "devices", "count": len(items)}
+        )
+    return items
+
+def validate_batch_item(item: Any) -> Dict:
+    """一括登録の1件分を検証し、IDを採番したデバイスデータを返す
+
+    Raises:
+        ValidationError: 必須フィールドがない場合
+    """
+    if not isinstance(item, dict):
+        raise ValidationError("デバイスはオブジェクトで指定してください", {})
+    for field in REQUIRED_FIELDS:
+        if not item.get(field):
+            raise ValidationError(f"必須フィールドがありません: {field}", {"field": field})
+    return {
+        'id': str(uuid.uuid4()),
+        'name': item['name'],
+        'manufacturer': item['manufacturer']
+    }
+
+def prepare_batch(items: List[Any]) -> Tuple[List[Tuple[int, Dict]], List[Dict]]:
+    """各要素を検証し、登録対象と検証エラーの結果に振り分ける
+
+    Returns:
+        ((リクエスト内の位置, デバイスデータ) のリスト, 検証エラーになった要素の結果リスト)
+    """
+    devices = []
+    failures = []
+    for index, item in enumerate(items):
+        try:
+            devices.append((index, validate_batch_item(item)))
+        except ValidationError as e:
+            failures.append({'index': index, 'success': False, 'error': str(e)})
+    return devices, failures
+
+def batch_summary(results: List[Dict]) -> Dict:
+    """要素ごとの結果をリクエスト内の順に並べ、件数と合わせて返す"""
+    results = sorted(results, key=lambda result: result['index'])
+    created = sum(1 for result in results if result['success'])
+    return {
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    }
+
+def _validate_ids(ids: Any, max_ids: int, action: str) -> List[str]:
+    if not isinstance(ids, list) or not all(isinstance(device_id, str) for device_id in ids):
+        raise ValidationError("idsは文字列のリストで指定してください", {"field": "ids"})
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValidationError("idsが空です", {"field": "ids"})
+    if len(ids) > max_ids:
+        raise ValidationError(
+            f"一度に{action}できるデバイスは{max_ids}件までです",
+            {"field": "ids", "count": len(ids)}
+        )
+    return ids
+
+def validate_lookup_ids(ids: Any) -> List[str]:
+    """一括取得のIDリストを検証し、重複を除いて返す（順序は維持）
+
+    Raises:
+        ValidationError: 文字列のリストでない、空、または最大件数を超える場合
+    """
+    return _validate_ids(ids, MAX_LOOKUP_IDS, "取得")
+
+def validate_delete_request(ids: Any, manufacturer: Any) -> Tuple[Optional[List[str]], Optional[str]]:
+    """一括削除の条件を検証し、(重複を除いたIDリスト, メーカー) のどちらか一方を返す
+
+    Raises:
+        ValidationError: ids と manufacturer の両方または一方も指定されていない場合、
+            ids が不正な場合、manufacturer が空の場合
+    """
+    if (ids is None) == (manufacturer is None):
+        raise ValidationError(
+            "idsかmanufacturerのどちらか一方を指定してください", {"fields": ["ids", "manufacturer"]}
+        )
+    if manufacturer is not None:
+        if not isinstance(manufacturer, str) or not manufacturer:
+            raise ValidationError("manufacturerは空でない文字列で指定してください", {"field": "manufacturer"})
+        return None, manufacturer
+    return _validate_ids(ids, MAX_DELETE_IDS, "削除"), None
+
+def lookup_result(ids: List[str], found: Dict[str, Dict]) -> Dict:
+    """取得結果を指定されたIDの順に並べ、見つからなかったIDと合わせて返す"""
+    return {
+        'items': [found[device_id] for device_id in ids if device_id in found],
+        'missing': [device_id for device_id in ids if device_id not in found]
+    }
+
+def delete_result(ids: List[str], deleted: Iterable[str]) -> Dict:
+    """削除結果を指定されたIDの順に並べ、見つからなかったIDと合わせて返す"""
+    deleted = set(deleted)
+    return {
+        'deleted': [device_id for device_id in ids if device_id in deleted],
+        'missing': [device_id for device_id in ids if device_id not in deleted]
+    }
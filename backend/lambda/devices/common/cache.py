@@ -0,0 +1,261 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .db_interface import DatabaseInterface
+from .batch import lookup_result
+from .fields import project
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+def cache_enabled() -> bool:
+    """デバイスキャッシュが有効か（DEVICE_CACHE_ENABLED、既定は無効）"""
+    return os.getenv('DEVICE_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+class LRUTTLCache:
+    """件数上限つきのLRUキャッシュ（エントリごとに有効期限を持つ）
+
+    Lambdaのウォームスタート間やuvicornのワーカー内で共有するため、スレッドセーフにしている
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('DEVICE_CACHE_MAX_ENTRIES', '1024'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('DEVICE_CACHE_TTL_SECONDS', '30'))
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'stale_sets': 0,
+        }
+        # 無効化の通し番号（世代）と、キーごとに最後に無効化された世代（最大 max_entries 件）
+        # 記録から溢れたキーは、溢れた時点の世代（_invalidated_floor）以降に無効化されたものとみなす
+        self._generation = 0
+        self._invalidated: 'OrderedDict[str, int]' = OrderedDict()
+        self._invalidated_floor = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """キャッシュから値を取得する（期限切れ・未登録の場合はNone）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+        # 呼び出し側での変更がキャッシュに影響しないようコピーを返す
+        return dict(value)
+
+    def generation(self) -> int:
+        """現在の世代を返す（データベースから読み込む前に取得し、読み込んだ値の set に渡す）"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key: str, value: Dict, generation: Optional[int] = None) -> bool:
+        """値を登録する（上限を超えた場合は最も古く使われたエントリを追い出す）
+
+        generation を指定した場合、その世代の後に key が無効化されていれば登録せずにFalseを返す
+        （読み込みと更新が重なった場合に、更新前の値を無効化の後から登録しないため）
+        """
+        with self._lock:
+            if generation is not None and self._invalidated_since(key, generation):
+                self._stats['stale_sets'] += 1
+                return False
+            self._entries[key] = (dict(value), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return True
+
+    def _invalidated_since(self, key: str, generation: int) -> bool:
+        invalidated = self._invalidated.get(key)
+        if invalidated is None:
+            return self._invalidated_floor > generation
+        return invalidated > generation
+
+    def invalidate(self, key: str) -> None:
+        """エントリを削除し、読み込み中の古い値が登録されないよう世代を進める"""
+        with self._lock:
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.max_entries:
+                _, self._invalidated_floor = self._invalidated.popitem(last=False)
+            if self._entries.pop(key, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        """全てのエントリを削除する"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._invalidated.clear()
+            self._invalidated_floor = self._generation
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット・ミス・追い出し等の回数と現在の件数を返す"""
+        with self._lock:
+            return dict(
+                self._stats,
+                size=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl
+            )
+
+class CachedDatabaseInterface(DatabaseInterface):
+    """任意の DatabaseInterface を包み、get_device をキャッシュから返すクラス
+
+    - get_device / get_devices はキャッシュになければ内側のインターフェースから読み込んで登録する
+      （読み込み中に update / delete で無効化された場合は登録しない）
+    - create は結果をエントリに登録し、update / delete は書き込みの後でエントリを削除する
+    - 一覧系の操作はキャッシュを使わずにそのまま委譲する
+    - fields 指定時はキャッシュにあればフィールドを絞って返し、なければ絞った読み込みを委譲する
+      （一部のフィールドしか持たない結果はキャッシュに登録しない）
+    """
+
+    def __init__(self, interface: DatabaseInterface, cache: Optional[LRUTTLCache] = None):
+        self.interface = interface
+        self.cache = cache if cache is not None else LRUTTLCache()
+
+    def __getattr__(self, name: str) -> Any:
+        # get_pool_stats など実装固有のメソッドは内側のインターフェースに委譲する
+        return getattr(self.interface, name)
+
+    def create_device(self, device_data: Dict) -> Dict:
+        """デバイスを作成し、結果をキャッシュに登録する"""
+        device = self.interface.create_device(device_data)
+        if device:
+            self.cache.set(device['id'], device)
+        return device
+
+    def create_devices(self, devices: List[Dict]) -> List[Dict]:
+        """デバイスを一括作成する（作成したデバイスはキャッシュに登録しない）"""
+        return self.interface.create_devices(devices)
+
+    def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスをキャッシュから取得する（なければデータベースから読み込んで登録する）"""
+        device = self.cache.get(device_id)
+        if device is not None:
+            return project(device, fields)
+        if fields is not None:
+            return self.interface.get_device(device_id, fields)
+        generation = self.cache.generation()
+        device = self.interface.get_device(device_id)
+        if device:
+            self.cache.set(device_id, device, generation)
+        return device
+
+    def get_devices(self, device_ids: List[str], fields: Optional[List[str]] = None) -> Dict:
+        """キャッシュにないIDだけをまとめてデータベースから取得する"""
+        found = {}
+        misses = []
+        for device_id in device_ids:
+            device = self.cache.get(device_id)
+            if device is not None:
+                found[device_id] = project(device, fields)
+            else:
+                misses.append(device_id)
+        if misses and fields is not None:
+            found.update(
+                (device['id'], device) for device in self.interface.get_devices(misses, fields)['items']
+            )
+        elif misses:
+            generation = self.cache.generation()
+            for device in self.interface.get_devices(misses)['items']:
+                self.cache.set(device['id'], device, generation)
+                found[device['id']] = device
+        return lookup_result(device_ids, found)
+
+    def update_device(self, device_id: str, device_data: Dict) -> Optional[Dict]:
+        """デバイスを更新し、キャッシュから削除する
+
+        更新前に読み込みを始めた get_device が古い値を登録しないよう、書き込みの後で無効化する。
+        結果は登録しない（同時に実行された更新の結果と、どちらが新しいか判定できないため）
+        """
+        try:
+            return self.interface.update_device(device_id, device_data)
+        finally:
+            self.cache.invalidate(device_id)
+
+    def delete_device(self, device_id: str) -> bool:
+        """デバイスを削除し、書き込みの後でキャッシュからも削除する"""
+        try:
+            return self.interface.delete_device(device_id)
+        finally:
+            self.cache.invalidate(device_id)
+
+    def delete_devices(self, device_ids: Optional[List[str]] = None, manufacturer: Optional[str] = None) -> Dict:
+        """デバイスを一括削除し、削除したデバイスをキャッシュからも削除する"""
+        result = self.interface.delete_devices(device_ids, manufacturer)
+        for device_id in result['deleted']:
+            self.cache.invalidate(device_id)
+        return result
+
+    def list_devices(self) -> List[Dict]:
+        return self.interface.list_devices()
+
+    def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        return self.interface.list_devices_page(limit, cursor, filters, fields)
+
+    def iter_devices(self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+        return self.interface.iter_devices(batch_size, filters)
+
+    def search_devices(self, query: str, limit: int, fuzzy: bool = False) -> List[Dict]:
+        return self.interface.search_devices(query, limit, fuzzy)
+
+    def get_collection_version(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Optional[str]:
+        return self.interface.get_collection_version(limit, cursor, filters)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """キャッシュのヒット・ミス・追い出しの回数を返す"""
+        return self.cache.get_stats()
+
+    def is_healthy(self) -> bool:
+        return self.interface.is_healthy()
+
+    def close(self) -> None:
+        self.cache.clear()
+        self.interface.close()
+
+# FastAPIのルートで共有するキャッシュ（有効な場合のみ生成）
+_device_cache: Optional[LRUTTLCache] = None
+_device_cache_lock = threading.Lock()
+
+def get_device_cache() -> Optional[LRUTTLCache]:
+    """プロセス内で共有するデバイスキャッシュを返す（無効な場合はNone）"""
+    global _device_cache
+    if not cache_enabled():
+        return None
+    if _device_cache is None:
+        with _device_cache_lock:
+            if _device_cache is None:
+                _device_cache = LRUTTLCache()
+                logger.info(
+                    "デバイスキャッシュを有効化しました: 最大%s件, TTL %s秒",
+                    _device_cache.max_entries, _device_cache.ttl
+                )
+    return _device_cache
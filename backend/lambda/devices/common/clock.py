@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+from typing import Union
+
+# MySQLのセッションのタイムゾーン（全ての接続でUTCに固定し、TIMESTAMP 列の読み書きで変換されないようにする）
+SESSION_TIME_ZONE = '+00:00'
+# 接続時に実行する文（time_zone を接続設定で指定できないドライバー用）
+SESSION_TIME_ZONE_INIT = f"SET time_zone = '{SESSION_TIME_ZONE}'"
+
+def utc_now() -> datetime:
+    """書き込みに使う現在時刻（UTC、タイムゾーン情報なし）
+
+    日時の列はタイムゾーン情報なしで保存・比較するため tzinfo を外して返す。
+    MySQLの接続はセッションのタイムゾーンをUTCに固定しているため、
+    サーバー側の CURRENT_TIMESTAMP（列の既定値）とも同じ時計になる。
+    TIMESTAMP(6) 列にマイクロ秒まで保存するため、同じ秒の中の更新でも updated_at（ETag）が変わる
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def to_utc(value: Union[datetime, str, None], default: datetime) -> datetime:
+    """呼び出し元が指定した日時を、書き込みに使う形（UTC、タイムゾーン情報なし）にする
+
+    DynamoDBなどから移行する日時はISO 8601の文字列のため変換する。指定がなければ default を返す
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
@@ -1,60 +1,18 @@
-import os
-import logging
-from typing import Optional
 import mysql.connector
-from mysql.connector import pooling
-from mysql.connector.pooling import MySQLConnectionPool, PooledMySQLConnection
-from dotenv import load_dotenv
+from .db_pool import get_db_pool, PooledConnection
+from .migrations import migrate
 from .logger import setup_logger
 
 # ロギングの設定
 logger = setup_logger(__name__)
 
-# 環境変数の読み込み
-load_dotenv()
-
-# データベース接続プールの設定
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'database': os.getenv('DB_NAME', 'device_management'),
-    'charset': 'utf8mb4',
-    'collation': 'utf8mb4_unicode_ci',
-    'pool_name': 'device_management_pool',
-    'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
-    'pool_reset_session': True
-}
-
-# グローバル変数としてコネクションプールを保持
-connection_pool: Optional[MySQLConnectionPool] = None
-
 def initialize_connection_pool() -> None:
-    """データベース接続プールを初期化する関数"""
-    global connection_pool
-    try:
-        if connection_pool is None:
-            connection_pool = mysql.connector.pooling.MySQLConnectionPool(**DB_CONFIG)
-            logger.info("データベース接続プールを初期化しました")
-    except mysql.connector.Error as err:
-        logger.error(f"接続プールの初期化エラー: {err}")
-        raise
+    """データベース接続プールを初期化する関数（最小アイドル数まで接続を確立する）"""
+    get_db_pool().warm_up()
 
-def get_db_connection() -> PooledMySQLConnection:
-    """接続プールからデータベース接続を取得する関数"""
-    global connection_pool
-    try:
-        if connection_pool is None:
-            initialize_connection_pool()
-        connection = connection_pool.get_connection()
-        logger.debug("データベース接続を取得しました")
-        return connection
-    except mysql.connector.Error as err:
-        logger.error(f"データベース接続エラー: {err}")
-        raise
-    except Exception as err:
-        logger.error(f"予期せぬエラー: {err}")
-        raise
+def get_db_connection() -> PooledConnection:
+    """接続プールからデータベース接続を取得する関数（close() でプールに返却される）"""
+    return get_db_pool().get_connection()
 
 def init_db() -> None:
     """データベースとテーブルを初期化する関数"""
@@ -68,16 +26,21 @@ def init_db() -> None:
                 id VARCHAR(36) PRIMARY KEY,
                 name VARCHAR(255) NOT NULL COMMENT '機器名',
                 manufacturer VARCHAR(255) NOT NULL COMMENT 'メーカー名',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                name_search VARCHAR(255) NOT NULL COMMENT '検索用に正規化した機器名',
+                created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+                updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
                 INDEX idx_name (name),
-                INDEX idx_manufacturer (manufacturer)
+                INDEX idx_manufacturer (manufacturer),
+                INDEX idx_created_at_id (created_at, id),
+                FULLTEXT INDEX ft_name_search (name_search) WITH PARSER ngram
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         """)
         connection.commit()
+        # 既存のテーブルには、後から追加した列・インデックスを追加する
+        migrate(connection)
         logger.info("devicesテーブルを初期化しました")
     except mysql.connector.Error as err:
-        logger.error(f"テーブル作成エラー: {err}")
+        logger.error("テーブル作成エラー: %s", err)
         raise
     finally:
         cursor.close()
@@ -85,14 +48,4 @@ def init_db() -> None:
 
 def close_all_connections() -> None:
     """全ての接続を閉じる関数"""
-    global connection_pool
-    if connection_pool:
-        try:
-            # プール内の全ての接続を閉じる
-            connection_pool._remove_connections()
-            logger.info("全てのデータベース接続を閉じました")
-        except Exception as err:
-            logger.error(f"接続クローズエラー: {err}")
-            raise
-        finally:
-            connection_pool = None
\ No newline at end of file
+    get_db_pool().close_all_connections()
@@ -0,0 +1,169 @@
+import time
+import functools
+import threading
+from typing import Any, Callable, Dict, Optional
+from .settings import get_settings
+from .metrics import metrics
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# 接続が切れたことを示すMySQLのエラー番号
+# 2006: MySQL server has gone away / 2013: Lost connection during query /
+# 2055: Lost connection at '...' / 4031: サーバー側でアイドル接続が切断された
+DISCONNECT_ERRNOS = frozenset({2006, 2013, 2055, 4031})
+
+# クエリがサーバーに届く前に切断が分かったエラー番号（書き込みでも再実行してよい）
+NOT_SENT_ERRNOS = frozenset({2006, 4031})
+
+# 接続の確認（ping）の回数（avoided: アイドル時間が短いため確認を省略、ok / failed: 確認した結果）
+PROBES = metrics.counter(
+    'device_db_connection_probes_total', "接続の確認（ping）の回数", ('backend', 'result')
+)
+# 切断エラーで操作を再実行した回数
+DISCONNECT_RETRIES = metrics.counter(
+    'device_db_disconnect_retries_total', "切断エラーで操作を再実行した回数", ('backend',)
+)
+
+def is_disconnect_error(error: BaseException) -> bool:
+    """接続が切れたことによるエラーか（MySQLのエラー番号で判定する）"""
+    return getattr(error, 'errno', None) in DISCONNECT_ERRNOS
+
+class ConnectionHealthManager:
+    """プールの接続の死活確認を管理する
+
+    - 借りるたびに確認するのではなく、idle_seconds 以上使われていなかった接続だけを確認する
+    - check_interval 秒ごとにバックグラウンドでアイドル接続を確認し、切れた接続を作り直す
+    - 確認を省略した回数・確認の結果をメトリクス（/metrics）と get_stats() で返す
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        ping: Callable[[Any], bool],
+        idle_seconds: Optional[float] = None,
+        check_interval: Optional[float] = None
+    ):
+        settings = get_settings()
+        self.backend = backend
+        self._ping = ping
+        self.idle_seconds = idle_seconds if idle_seconds is not None else settings.db_health_idle_seconds
+        self.check_interval = check_interval if check_interval is not None else settings.db_health_check_interval
+        self._stats = {'probes': 0, 'probes_avoided': 0, 'probe_failures': 0, 'disconnect_retries': 0}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def is_stale(self, idle_since: float, now: Optional[float] = None) -> bool:
+        """idle_since（time.monotonic()）から idle_seconds 以上経っているか"""
+        return (time.monotonic() if now is None else now) - idle_since >= self.idle_seconds
+
+    def validate(self, connection: Any, idle_since: float) -> bool:
+        """借りる直前の接続を確認する（アイドル時間が短い場合は確認せずに True を返す）"""
+        if not self.is_stale(idle_since):
+            self._count('avoided', 'probes_avoided')
+            return True
+        return self.probe(connection)
+
+    def probe(self, connection: Any) -> bool:
+        """接続を確認する（ping が例外を送出した場合も切れているとみなす）"""
+        try:
+            healthy = bool(self._ping(connection))
+        except Exception as e:
+            logger.warning("接続の確認に失敗しました: %s", e)
+            healthy = False
+        if healthy:
+            self._count('ok', 'probes')
+        else:
+            self._count('failed', 'probes', 'probe_failures')
+        return healthy
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self._stats['disconnect_retries'] += 1
+        DISCONNECT_RETRIES.inc(self.backend)
+
+    def _count(self, result: str, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._stats[key] += 1
+        PROBES.inc(self.backend, result)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self, refresh: Callable[[], None]) -> None:
+        """check_interval 秒ごとに refresh（アイドル接続の確認）を呼ぶスレッドを開始する（0以下の場合は何もしない）"""
+        if self.check_interval <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(refresh,), name=f'{self.backend}-health', daemon=True
+            )
+        self._thread.start()
+
+    def _run(self, refresh: Callable[[], None]) -> None:
+        while not self._stopped.wait(self.check_interval):
+            try:
+                refresh()
+            except Exception as e:
+                # 次の周期で再度確認する
+                logger.warning("アイドル接続の確認エラー: %s", e)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+def retry_on_disconnect(health_attr: str = 'health', idempotent: bool = True) -> Callable:
+    """切断エラーの場合に1回だけ再実行するメソッドのデコレーター
+
+    切れた接続は _get_cursor で破棄されるため、再実行時は別の接続（または新しい接続）を使う。
+    idempotent=False の操作（作成・更新・削除）は、クエリがサーバーに届いていないことが
+    確実なエラー（NOT_SENT_ERRNOS）の場合だけ再実行する。それ以外のエラーは再実行しない
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            except Exception as e:
+                retryable = is_disconnect_error(e) if idempotent else getattr(e, 'errno', None) in NOT_SENT_ERRNOS
+                if not retryable:
+                    raise
+                logger.warning("接続が切れていたため再実行します: %s", e)
+                getattr(self, health_attr).record_retry()
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def install_sqlalchemy_health_checks(engine, backend: str = 'sqlalchemy') -> ConnectionHealthManager:
+    """SQLAlchemyのエンジンに、アイドル時間に応じた接続の確認を設定する
+
+    pool_pre_ping（借りるたびに確認）の代わりに使う。返却時刻を接続ごとに記録し、
+    idle_seconds 以上使われていなかった接続だけを借りる時に確認する。確認に失敗した場合は
+    DisconnectionError を送出し、プールが接続を破棄して新しい接続で借り直す（呼び出し元には見えない）
+    """
+    from sqlalchemy import event
+    from sqlalchemy.exc import DisconnectionError
+
+    sync_engine = getattr(engine, 'sync_engine', engine)
+    health = ConnectionHealthManager(backend, sync_engine.dialect.do_ping)
+
+    @event.listens_for(sync_engine, 'checkin')
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info['device_idle_since'] = time.monotonic()
+
+    @event.listens_for(sync_engine, 'checkout')
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        idle_since = connection_record.info.get('device_idle_since')
+        if idle_since is None:
+            # 確立した直後の接続は確認しない
+            health._count('avoided', 'probes_avoided')
+            return
+        if not health.validate(dbapi_connection, idle_since):
+            raise DisconnectionError("アイドル接続が切断されていました")
+
+    return health
@@ -1,11 +1,11 @@
 import os
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
-import logging
+from typing import Dict, Iterator, List, Optional
+from .batch import delete_result, lookup_result
+from .logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = setup_logger(__name__)
 
 class DatabaseInterface(ABC):
     """データベース操作の抽象クラス"""
@@ -16,37 +16,202 @@ class DatabaseInterface(ABC):
         pass
     
     @abstractmethod
-    def get_device(self, device_id: str) -> Optional[Dict]:
-        """デバイスを取得する"""
+    def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスを取得する（fields 指定時はそのフィールドだけを読み込む）"""
         pass
     
     @abstractmethod
     def update_device(self, device_id: str, device_data: Dict) -> Optional[Dict]:
-        """デバイスを更新する"""
+        """デバイスを更新する（デバイスが存在しない場合はNone）"""
         pass
     
     @abstractmethod
     def delete_device(self, device_id: str) -> bool:
-        """デバイスを削除する"""
+        """デバイスを削除する（デバイスが存在しない場合はFalse）"""
         pass
     
     @abstractmethod
     def list_devices(self) -> List[Dict]:
         """全デバイスを取得する"""
         pass
+    
+    @abstractmethod
+    def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """デバイスを1ページ分取得する
 
-def get_db_interface() -> DatabaseInterface:
-    """
-    環境変数に基づいて適切なデータベースインターフェースを返す
-    DB_TYPE環境変数が 'dynamodb' の場合はDynamoDB、それ以外の場合はRDSを使用
-    """
-    db_type = os.getenv('DB_TYPE', 'rds').lower()
+        Args:
+            limit: 1ページあたりの最大件数
+            cursor: 前ページの next_cursor（Noneの場合は先頭ページ）
+            filters: 完全一致の絞り込み条件（name, manufacturer）
+            fields: 返すフィールド（fields.normalize_fields で検証済み、Noneの場合は全フィールド）
+
+        Returns:
+            {'items': デバイスのリスト, 'next_cursor': 次ページのカーソル（最終ページはNone）}
+            ページのバージョン（etag.page_version）を読み込んだ行から安価に求められる実装は、
+            'version' にも返す（一覧のETagを別のクエリなしで計算するため）
+        """
+        pass
     
+    @abstractmethod
+    def iter_devices(self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+        """全デバイス（filters 指定時は条件に一致するデバイス）を batch_size 件ずつ読み込みながら逐次返す
+
+        全件をメモリに展開しないため、テーブルの大きさに関係なくメモリ使用量は一定
+        """
+        pass
+
+    def create_devices(self, devices: List[Dict]) -> List[Dict]:
+        """複数のデバイスを一括で作成する
+
+        Args:
+            devices: IDを採番済みのデバイスデータのリスト
+                （created_at / updated_at を指定した場合はその日時で保存する。移行・テストデータ用）
+
+        Returns:
+            devices と同じ順の結果リスト
+            （成功は {'success': True, 'device': ...}、失敗は {'success': False, 'error': ...}）
+
+        既定では1件ずつ create_device を呼び出す。各実装でまとめて書き込むようにオーバーライドする
+        """
+        results = []
+        for device_data in devices:
+            try:
+                results.append({'success': True, 'device': self.create_device(device_data)})
+            except Exception as e:
+                logger.error("デバイス作成エラー: %s", e)
+                results.append({'success': False, 'error': str(e)})
+        return results
+
+    def get_devices(self, device_ids: List[str], fields: Optional[List[str]] = None) -> Dict:
+        """指定された複数のIDのデバイスをまとめて取得する
+
+        Args:
+            device_ids: デバイスIDのリスト（重複なし）
+            fields: 返すフィールド（Noneの場合は全フィールド）
+
+        Returns:
+            {'items': 見つかったデバイスのリスト（device_ids の順）, 'missing': 見つからなかったIDのリスト}
+
+        既定では1件ずつ get_device を呼び出す。各実装でまとめて読み込むようにオーバーライドする
+        """
+        found = {}
+        for device_id in device_ids:
+            device = self.get_device(device_id, fields)
+            if device:
+                found[device_id] = device
+        return lookup_result(device_ids, found)
+
+    def delete_devices(self, device_ids: Optional[List[str]] = None, manufacturer: Optional[str] = None) -> Dict:
+        """指定された複数のIDのデバイス、または指定されたメーカーの全デバイスをまとめて削除する
+
+        Args:
+            device_ids: デバイスIDのリスト（重複なし）
+            manufacturer: 削除するデバイスのメーカー（device_ids とどちらか一方を指定する）
+
+        Returns:
+            {'deleted': 削除したIDのリスト（device_ids の順）, 'missing': 見つからなかったIDのリスト}
+
+        既定では1件ずつ delete_device を呼び出す。各実装でまとめて削除するようにオーバーライドする
+        """
+        if manufacturer is not None:
+            device_ids = [device['id'] for device in self.iter_devices(filters={'manufacturer': manufacturer})]
+        deleted = [device_id for device_id in device_ids if self.delete_device(device_id)]
+        return delete_result(device_ids, deleted)
+
+    def search_devices(self, query: str, limit: int, fuzzy: bool = False) -> List[Dict]:
+        """名前に検索語を含むデバイスを名前の短い順に検索する
+
+        Args:
+            query: 検索語（search.normalize_text で正規化済み）
+            limit: 最大件数
+            fuzzy: 部分一致が limit 件に満たない場合に、n-gramの一致率が高いデバイスで補うか
+
+        既定では全件を走査して部分一致を判定する。各実装でインデックスを使うようにオーバーライドする
+        """
+        from .search import NgramIndex
+        index = NgramIndex()
+        index.build(self.iter_devices())
+        return index.search(query, limit, fuzzy)
+
+    def get_collection_version(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """一覧のETag計算に使うページのバージョン（etag.page_version）を返す
+
+        list_devices_page と同じ条件で (id, updated_at) だけを読み込んで計算する。
+        一覧の取得を省略できるか確かめるための追加のクエリのため、If-None-Match がある場合にだけ呼び出す
+        （それ以外は list_devices_page の 'version' を使う）。
+        安価に求められない実装ではNoneを返す（一覧のETagを付けない）
+        """
+        return None
+
+    def is_healthy(self) -> bool:
+        """接続が利用可能か確認する（レジストリのヘルスチェックで使用）"""
+        return True
+
+    def close(self) -> None:
+        """保持している接続を解放する"""
+        pass
+
+def _create_backend(db_type: str) -> DatabaseInterface:
     if db_type == 'dynamodb':
         from .dynamodb import DynamoDBInterface
         logger.info("Using DynamoDB interface")
         return DynamoDBInterface()
-    else:
-        from .rds import RDSInterface
-        logger.info("Using RDS interface")
-        return RDSInterface() 
\ No newline at end of file
+    if db_type == 'sqlite':
+        from .sqlite import SQLiteInterface
+        logger.info("Using SQLite interface")
+        return SQLiteInterface()
+    if db_type == 'memory':
+        from .memory import MemoryInterface
+        # DEVICE_MEMORY_SOURCE（rds / dynamodb / sqlite）を指定した場合は、起動時にそこから読み込み、書き込みを転送する
+        source_type = os.getenv('DEVICE_MEMORY_SOURCE', '').lower()
+        source = _create_backend(source_type) if source_type in ('rds', 'dynamodb', 'sqlite') else None
+        logger.info("Using in-memory interface (source: %s)", source_type or 'none')
+        return MemoryInterface(source)
+    from .rds import RDSInterface
+    logger.info("Using RDS interface")
+    return RDSInterface()
+
+def create_db_interface(db_type: str) -> DatabaseInterface:
+    """
+    指定された種類のデータベースインターフェースを新しく生成する
+    'dynamodb' の場合はDynamoDB、'sqlite' の場合はSQLite、'memory' の場合はメモリ、それ以外の場合はRDSを使用
+
+    DEVICE_CACHE_ENABLED が有効な場合は get_device をキャッシュするラッパーで包んで返す
+    （メモリの場合は全件をメモリに持つためキャッシュしない）
+    """
+    interface = _create_backend(db_type)
+
+    from .cache import cache_enabled, CachedDatabaseInterface
+    if db_type != 'memory' and cache_enabled():
+        logger.info("Using device cache")
+        interface = CachedDatabaseInterface(interface)
+    return interface
+
+def get_db_interface() -> DatabaseInterface:
+    """
+    環境変数に基づいて適切なデータベースインターフェースを返す
+    DB_TYPE環境変数が 'dynamodb' の場合はDynamoDB、'sqlite' の場合はSQLite、'memory' の場合はメモリ、
+    それ以外の場合はRDSを使用
+
+    インスタンスはプロセス内のレジストリに保持され、Lambdaのウォームスタート間で再利用される
+    """
+    from .settings import load_env
+    load_env()
+    from .db_registry import registry
+    return registry.get(os.getenv('DB_TYPE', 'rds').lower())
+
+def report_db_interface_failure() -> None:
+    """処理中にエラーが発生したことをレジストリに通知する（次回取得時にヘルスチェックを行う）"""
+    from .db_registry import registry
+    registry.mark_failed(os.getenv('DB_TYPE', 'rds').lower())
@@ -1,85 +1,384 @@
-import os
-from typing import Optional
+import time
+import weakref
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
 import mysql.connector
-from mysql.connector import pooling
-from mysql.connector.pooling import MySQLConnectionPool, PooledMySQLConnection
-from dotenv import load_dotenv
+from mysql.connector.constants import ClientFlag
+from mysql.connector.errors import PoolError
 from .logger import setup_logger
+from .settings import get_settings
+from .clock import SESSION_TIME_ZONE
+from .db_health import ConnectionHealthManager
+from .metrics import metrics
 
 # ロガーの設定
 logger = setup_logger(__name__)
 
-# 環境変数の読み込み
-load_dotenv()
+# 接続取得レイテンシのヒストグラムの境界（ミリ秒）
+CHECKOUT_LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+# 接続の取得にかかった時間（返却待ちと接続の確立を含む）
+CHECKOUT_SECONDS = metrics.histogram(
+    'device_db_pool_checkout_seconds', "接続プールから接続を取得するまでの時間", ('backend',)
+)
+# プールの操作の回数（checkout: 取得 / wait: 返却を待った取得 / timeout: 取得のタイムアウト /
+# created: 接続の確立 / discarded: 接続の破棄）
+POOL_EVENTS = metrics.counter(
+    'device_db_pool_events_total', "接続プールの操作の回数", ('backend', 'event')
+)
+
+# 生成された接続プール（ゲージで接続数を合計するため。参照されなくなったプールは除かれる）
+_pools: 'weakref.WeakSet[DatabaseConnectionPool]' = weakref.WeakSet()
+_pools_lock = threading.Lock()
+
+def _total(count: Callable[['DatabaseConnectionPool'], int]) -> Callable[[], Optional[float]]:
+    def collect() -> Optional[float]:
+        with _pools_lock:
+            pools = list(_pools)
+        return sum(count(pool) for pool in pools) if pools else None
+    return collect
+
+metrics.gauge(
+    'device_db_pool_connections_in_use', "貸し出し中の接続数（プロセス内の全てのプールの合計）",
+    _total(lambda pool: pool._in_use)
+)
+metrics.gauge(
+    'device_db_pool_connections_idle', "アイドルの接続数（プロセス内の全てのプールの合計）",
+    _total(lambda pool: len(pool._idle))
+)
+
+def default_db_config() -> Dict[str, Any]:
+    """ローカル開発用（DB_*）の接続設定を返す"""
+    settings = get_settings()
+    return {
+        'host': settings.db_host,
+        'port': settings.db_port,
+        'user': settings.db_user,
+        'password': settings.db_password,
+        'database': settings.db_name,
+        'charset': 'utf8mb4',
+        'collation': 'utf8mb4_unicode_ci',
+        'auth_plugin': 'mysql_native_password',
+        'connect_timeout': 10,
+        'connection_timeout': 10,
+        'time_zone': SESSION_TIME_ZONE
+    }
+
+def rds_db_config() -> Dict[str, Any]:
+    """Lambda用のRDS（RDS_*）の接続設定を返す"""
+    settings = get_settings()
+    return {
+        'host': settings.rds_host,
+        'user': settings.rds_user,
+        'password': settings.rds_password,
+        'database': settings.rds_database,
+        'port': settings.rds_port,
+        'time_zone': SESSION_TIME_ZONE,
+        # UPDATE の rowcount を変更された行数ではなく一致した行数にする（存在確認に使用）
+        'client_flags': [ClientFlag.FOUND_ROWS]
+    }
+
+class PooledConnection:
+    """プールから貸し出した接続
+
+    MySQL接続と同じように使用でき、close() でプールに返却される
+    """
+
+    __slots__ = ('_pool', '_connection', '_invalid')
+
+    def __init__(self, pool: 'DatabaseConnectionPool', connection):
+        self._pool = pool
+        self._connection = connection
+        self._invalid = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    @property
+    def raw_connection(self):
+        """貸し出し中のMySQL接続（接続ごとに保持する状態の格納に使う）"""
+        return self._connection
+
+    def invalidate(self) -> None:
+        """接続が壊れていることを記録する（返却時にプールへ戻さず破棄する）"""
+        self._invalid = True
+
+    def close(self) -> None:
+        """接続をプールに返却する"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool._release(connection, self._invalid)
+
+    def __enter__(self) -> 'PooledConnection':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
 
 class DatabaseConnectionPool:
-    """データベース接続プールを管理するクラス"""
-    
-    _instance: Optional['DatabaseConnectionPool'] = None
-    _pool: Optional[MySQLConnectionPool] = None
-    
-    def __new__(cls):
-        """シングルトンパターンの実装"""
-        if cls._instance is None:
-            cls._instance = super(DatabaseConnectionPool, cls).__new__(cls)
-        return cls._instance
-    
-    def __init__(self):
-        """接続プールの設定を初期化"""
-        if self._pool is None:
-            self._initialize_pool()
-    
-    def _initialize_pool(self) -> None:
-        """接続プールを初期化"""
-        try:
-            db_config = {
-                'host': os.getenv('DB_HOST', 'localhost'),
-                'port': int(os.getenv('DB_PORT', '3306')),
-                'user': os.getenv('DB_USER', 'root'),
-                'password': os.getenv('DB_PASSWORD', ''),
-                'database': os.getenv('DB_NAME', 'lambdadb'),
-                'charset': 'utf8mb4',
-                'collation': 'utf8mb4_unicode_ci',
-                'pool_name': 'device_management_pool',
-                'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
-                'pool_reset_session': True,
-                'auth_plugin': 'mysql_native_password',
-                'connect_timeout': 10,
-                'connection_timeout': 10
-            }
-            
-            self._pool = mysql.connector.pooling.MySQLConnectionPool(**db_config)
+    """データベース接続プールを管理するクラス
+
+    - 操作ごとに接続を貸し出し・返却する
+    - pool_size を超える要求には max_overflow 本まで一時的な接続を追加し、返却時に閉じる
+    - 上限に達している場合は timeout 秒まで返却を待ち、超えた場合は PoolError を送出する
+    - warm_up() で min_idle 本の接続を事前に確立する
+    - 接続の死活確認は、DB_HEALTH_IDLE_SECONDS 以上アイドルだった接続を貸し出す時と、
+      DB_HEALTH_CHECK_INTERVAL_SECONDS ごとのバックグラウンドの確認（refresh_idle）だけで行う
+    - 取得時間・操作の回数・接続数はメトリクス（/metrics と EMF）に出力する
+    """
+
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        pool_size: Optional[int] = None,
+        max_overflow: Optional[int] = None,
+        min_idle: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        """接続プールの設定を初期化（接続はまだ確立しない）"""
+        settings = get_settings()
+        self._config = config if config is not None else default_db_config()
+        self.pool_size = pool_size if pool_size is not None else settings.db_pool_size
+        self.max_overflow = max_overflow if max_overflow is not None else settings.db_pool_max_overflow
+        self.min_idle = min(
+            min_idle if min_idle is not None else settings.db_pool_min_idle,
+            self.pool_size
+        )
+        self.timeout = timeout if timeout is not None else settings.db_pool_timeout
+
+        # アイドル接続と返却された時刻（time.monotonic()）の組
+        self._idle: deque = deque()
+        self._size = 0
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+        }
+        self._latency_histogram = [0] * (len(CHECKOUT_LATENCY_BUCKETS_MS) + 1)
+        self.health = ConnectionHealthManager('rds', self._ping)
+        with _pools_lock:
+            _pools.add(self)
+
+    @staticmethod
+    def _ping(connection) -> bool:
+        return connection.is_connected()
+
+    def _connect(self):
+        """新しい接続を確立する"""
+        connection = mysql.connector.connect(**self._config)
+        connection.autocommit = True
+        with self._condition:
+            self._stats['connections_created'] += 1
+        POOL_EVENTS.inc(self.health.backend, 'created')
+        return connection
+
+    def warm_up(self) -> None:
+        """min_idle 本のアイドル接続を事前に確立する"""
+        self.health.start(self.refresh_idle)
+        while True:
+            with self._condition:
+                if len(self._idle) >= self.min_idle or self._size >= self.pool_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._connect()
+            except mysql.connector.Error as err:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                logger.error("接続プールの初期化エラー: %s", err)
+                raise
+            with self._condition:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
             logger.info("データベース接続プールを初期化しました")
-        except mysql.connector.Error as err:
-            logger.error(f"接続プールの初期化エラー: {err}")
-            raise
-    
-    def get_connection(self) -> PooledMySQLConnection:
+
+    def get_connection(self, timeout: Optional[float] = None) -> PooledConnection:
         """プールから接続を取得"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        connection = None
+        idle_since = 0.0
+        waited = False
+
+        with self._condition:
+            while True:
+                if self._idle:
+                    # 直近に返却された接続から再利用する
+                    connection, idle_since = self._idle.pop()
+                    break
+                if self._size < self.pool_size + self.max_overflow:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    POOL_EVENTS.inc(self.health.backend, 'timeout')
+                    logger.error("接続プールから接続を取得できませんでした（%s秒でタイムアウト）", timeout)
+                    raise PoolError("Failed getting connection; pool exhausted")
+                waited = True
+                self._condition.wait(remaining)
+            self._in_use += 1
+
+        if connection is not None and not self.health.validate(connection, idle_since):
+            # 切れていた接続は閉じ、同じ枠で新しい接続を確立する
+            self._close_quietly(connection)
+            with self._condition:
+                self._stats['connections_discarded'] += 1
+            POOL_EVENTS.inc(self.health.backend, 'discarded')
+            connection = None
+
+        if connection is None:
+            try:
+                connection = self._connect()
+            except Exception as err:
+                with self._condition:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._condition.notify()
+                logger.error("データベース接続エラー: %s", err)
+                raise
+
+        self._record_checkout(time.monotonic() - start, waited)
+        self.health.start(self.refresh_idle)
+        logger.debug("データベース接続を取得しました")
+        return PooledConnection(self, connection)
+
+    def refresh_idle(self) -> None:
+        """DB_HEALTH_IDLE_SECONDS 以上アイドルの接続を確認し、切れていれば破棄して min_idle 本まで作り直す
+
+        バックグラウンドのスレッドから呼ばれる。確認中の接続は貸し出し中として扱う
+        """
+        now = time.monotonic()
+        with self._condition:
+            stale = [entry for entry in self._idle if self.health.is_stale(entry[1], now)]
+            for entry in stale:
+                self._idle.remove(entry)
+            self._in_use += len(stale)
+        for connection, _ in stale:
+            self._release(connection, invalid=not self.health.probe(connection))
+        if stale:
+            self.warm_up()
+
+    @staticmethod
+    def _close_quietly(connection) -> None:
         try:
-            if self._pool is None:
-                self._initialize_pool()
-            connection = self._pool.get_connection()
-            logger.debug("データベース接続を取得しました")
-            return connection
-        except mysql.connector.Error as err:
-            logger.error(f"データベース接続エラー: {err}")
-            raise
-        except Exception as err:
-            logger.error(f"予期せぬエラー: {err}")
-            raise
-    
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[PooledConnection]:
+        """接続を取得し、ブロックを抜けたら返却するコンテキストマネージャー"""
+        pooled = self.get_connection(timeout)
+        try:
+            yield pooled
+        finally:
+            pooled.close()
+
+    def _record_checkout(self, elapsed: float, waited: bool) -> None:
+        elapsed_ms = elapsed * 1000
+        index = len(CHECKOUT_LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(CHECKOUT_LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        with self._condition:
+            self._stats['checkouts'] += 1
+            self._latency_histogram[index] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_ms'] += elapsed_ms
+        CHECKOUT_SECONDS.observe(self.health.backend, seconds=elapsed)
+        POOL_EVENTS.inc(self.health.backend, 'checkout')
+        if waited:
+            POOL_EVENTS.inc(self.health.backend, 'wait')
+
+    def _release(self, connection, invalid: bool = False) -> None:
+        """接続をプールに返却する（PooledConnection.close() から呼ばれる）"""
+        discard = invalid
+        if not discard and connection.in_transaction:
+            try:
+                connection.rollback()
+            except mysql.connector.Error:
+                discard = True
+
+        with self._condition:
+            self._in_use -= 1
+            if not discard and self._size <= self.pool_size:
+                self._idle.append((connection, time.monotonic()))
+                connection = None
+            else:
+                # 壊れた接続と、pool_size を超えて作られた一時的な接続は閉じる
+                self._size -= 1
+                self._stats['connections_discarded'] += 1
+            self._condition.notify()
+
+        if connection is not None:
+            POOL_EVENTS.inc(self.health.backend, 'discarded')
+            self._close_quietly(connection)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """プールの利用状況を返す"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            })
+            # 死活確認の回数（probes_avoided はアイドル時間が短く確認を省略した回数）
+            stats.update(self.health.get_stats())
+            # 累積ヒストグラム（各境界以下に収まった取得回数）
+            histogram = {}
+            cumulative = 0
+            for bound, count in zip(CHECKOUT_LATENCY_BUCKETS_MS, self._latency_histogram):
+                cumulative += count
+                histogram[f'le_{bound}ms'] = cumulative
+            histogram['le_inf'] = cumulative + self._latency_histogram[-1]
+            stats['checkout_latency_ms'] = histogram
+        return stats
+
     def close_all_connections(self) -> None:
-        """全ての接続を閉じる"""
+        """全てのアイドル接続を閉じる（貸し出し中の接続は返却時に閉じる）"""
         try:
-            if self._pool:
-                self._pool._remove_connections()
+            with self._condition:
+                connections = [connection for connection, _ in self._idle]
+                self._idle.clear()
+                self._size -= len(connections)
+            for connection in connections:
+                connection.close()
+            if connections:
                 logger.info("全てのデータベース接続を閉じました")
         except Exception as err:
-            logger.error(f"接続クローズエラー: {err}")
+            logger.error("接続クローズエラー: %s", err)
             raise
-        finally:
-            self._pool = None
 
-# グローバルなインスタンスを作成
-db_pool = DatabaseConnectionPool() 
\ No newline at end of file
+# ローカル開発用（DB_*）のグローバルなインスタンス（最初に参照された時に生成する）
+_db_pool: Optional[DatabaseConnectionPool] = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> DatabaseConnectionPool:
+    """ローカル開発用のグローバルな接続プールを返す（接続は最初の取得時に確立する）"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = DatabaseConnectionPool()
+    return _db_pool
+
+def __getattr__(name: str) -> Any:
+    # 既存の `from .db_pool import db_pool` を、インポート時に生成せずに動かすため
+    if name == 'db_pool':
+        return get_db_pool()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,150 @@
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+from .db_interface import DatabaseInterface, create_db_interface
+from .settings import get_settings, reload_settings
+from .metrics import metrics
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# インターフェースの取得の内訳（created / reused / recreated / health_checks / health_check_failures）
+EVENTS = metrics.counter(
+    'device_db_interface_events_total', "データベースインターフェースの生成・再利用・ヘルスチェックの回数",
+    ('backend', 'event')
+)
+
+# インスタンスの再生成が必要かを判定するための環境変数（DB種別ごと）
+CONFIG_KEYS = {
+    'rds': ('RDS_HOST', 'RDS_PORT', 'RDS_USER', 'RDS_PASSWORD', 'RDS_DATABASE'),
+    'dynamodb': ('AWS_REGION', 'DYNAMODB_TABLE_NAME'),
+    'sqlite': ('SQLITE_PATH', 'SQLITE_READ_POOL_SIZE', 'SQLITE_COMMIT_BATCH_SIZE', 'SQLITE_COMMIT_INTERVAL_MS'),
+}
+# メモリは読み込み元（DEVICE_MEMORY_SOURCE）の接続設定が変わった場合も作り直す
+CONFIG_KEYS['memory'] = ('DEVICE_MEMORY_SOURCE',) + CONFIG_KEYS['rds'] + CONFIG_KEYS['dynamodb'] + CONFIG_KEYS['sqlite']
+
+# DB種別によらずインスタンスの構成に影響する環境変数
+COMMON_CONFIG_KEYS = ('DEVICE_CACHE_ENABLED', 'DEVICE_CACHE_MAX_ENTRIES', 'DEVICE_CACHE_TTL_SECONDS')
+
+class _RegistryEntry:
+    """レジストリに保持するインスタンスと付随情報"""
+
+    __slots__ = ('interface', 'fingerprint', 'last_used', 'suspect')
+
+    def __init__(self, interface: DatabaseInterface, fingerprint: str):
+        self.interface = interface
+        self.fingerprint = fingerprint
+        self.last_used = time.monotonic()
+        self.suspect = False
+
+class DatabaseInterfaceRegistry:
+    """データベースインターフェースをプロセス内で保持し、ウォームスタート間で再利用するクラス
+
+    - 環境変数の設定が変わった場合は作り直す
+    - エラー発生後や DB_HEALTH_IDLE_SECONDS 以上アイドルだった場合のみヘルスチェックを行い、失敗したら作り直す
+      （接続プールの死活確認と同じ設定を使う）
+    - 生成・再利用・再生成の回数はメトリクス（/metrics）と get_stats() で返す
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _RegistryEntry] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'recreated': 0,
+            'health_checks': 0,
+            'health_check_failures': 0,
+        }
+
+    def _count(self, db_type: str, event: str) -> None:
+        """回数を記録する（ロック取得済みで呼び出す）"""
+        self._stats[event] += 1
+        EVENTS.inc(db_type, event)
+
+    @staticmethod
+    def _fingerprint(db_type: str) -> str:
+        """接続設定の指紋を計算する（パスワードを保持しないようハッシュ化）"""
+        values = [os.getenv(key, '') for key in CONFIG_KEYS.get(db_type, ()) + COMMON_CONFIG_KEYS]
+        return hashlib.sha256('\0'.join(values).encode('utf-8')).hexdigest()
+
+    def get(self, db_type: str) -> DatabaseInterface:
+        """再利用可能なインスタンスを返す（なければ生成する）"""
+        fingerprint = self._fingerprint(db_type)
+        with self._lock:
+            entry = self._entries.get(db_type)
+            if entry is not None:
+                if entry.fingerprint != fingerprint:
+                    logger.info("接続設定が変更されたためインターフェースを再生成します: %s", db_type)
+                    reload_settings()
+                    return self._recreate(db_type, entry, fingerprint)
+
+                idle = time.monotonic() - entry.last_used
+                if entry.suspect or idle >= get_settings().db_health_idle_seconds:
+                    self._count(db_type, 'health_checks')
+                    if not self._check_health(entry.interface):
+                        self._count(db_type, 'health_check_failures')
+                        logger.warning("ヘルスチェックに失敗したためインターフェースを再生成します: %s", db_type)
+                        return self._recreate(db_type, entry, fingerprint)
+                    entry.suspect = False
+
+                entry.last_used = time.monotonic()
+                self._count(db_type, 'reused')
+                return entry.interface
+
+            interface = create_db_interface(db_type)
+            self._entries[db_type] = _RegistryEntry(interface, fingerprint)
+            self._count(db_type, 'created')
+            return interface
+
+    def _recreate(self, db_type: str, entry: _RegistryEntry, fingerprint: str) -> DatabaseInterface:
+        """古いインスタンスを閉じて新しいインスタンスに置き換える（ロック取得済みで呼び出す）"""
+        self._close(entry.interface)
+        del self._entries[db_type]
+        interface = create_db_interface(db_type)
+        self._entries[db_type] = _RegistryEntry(interface, fingerprint)
+        self._count(db_type, 'recreated')
+        logger.info("データベースインターフェースの利用状況: %s", self._stats)
+        return interface
+
+    @staticmethod
+    def _check_health(interface: DatabaseInterface) -> bool:
+        try:
+            return interface.is_healthy()
+        except Exception as e:
+            logger.warning("ヘルスチェックエラー: %s", e)
+            return False
+
+    @staticmethod
+    def _close(interface: DatabaseInterface) -> None:
+        try:
+            interface.close()
+        except Exception as e:
+            logger.warning("接続クローズエラー: %s", e)
+
+    def mark_failed(self, db_type: str) -> None:
+        """次回の取得時にヘルスチェックを行うよう印を付ける"""
+        with self._lock:
+            entry = self._entries.get(db_type)
+            if entry is not None:
+                entry.suspect = True
+
+    def clear(self, db_type: Optional[str] = None) -> None:
+        """保持しているインスタンスを閉じて破棄する（Noneの場合は全て）"""
+        with self._lock:
+            db_types = [db_type] if db_type else list(self._entries)
+            for key in db_types:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._close(entry.interface)
+
+    def get_stats(self) -> Dict[str, int]:
+        """再利用・再生成の回数を返す"""
+        with self._lock:
+            return dict(self._stats)
+
+# プロセス全体で共有するレジストリ
+registry = DatabaseInterfaceRegistry()
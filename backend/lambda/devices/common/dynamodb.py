@@ -1,57 +1,246 @@
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
-from dotenv import load_dotenv
-import logging
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from .db_interface import DatabaseInterface
+from .pagination import encode_cursor, decode_cursor
+from .batch import delete_result, lookup_result
+from .search import NgramIndex
+from .exceptions import SearchIndexNotReadyError
+from .parallel_scan import ParallelScanner
+from .settings import get_settings
+from .timing import record
+from .logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = setup_logger(__name__)
 
-# 環境変数の読み込み
-load_dotenv()
+# 絞り込みに使うGSI（フィールド名 → インデックス名）
+# 両方指定された場合は、一般に件数の少ない name のGSIを使い、manufacturer はフィルターで絞り込む
+FILTER_INDEXES = {
+    'name': os.getenv('DYNAMODB_NAME_INDEX', 'name-index'),
+    'manufacturer': os.getenv('DYNAMODB_MANUFACTURER_INDEX', 'manufacturer-index'),
+}
+
+def projection_kwargs(fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """fields を ProjectionExpression に変換する（Noneの場合は全属性を読み込むため空）
+
+    name は予約語のため、属性名はすべてプレースホルダーで指定する
+    """
+    if fields is None:
+        return {}
+    return {
+        'ProjectionExpression': ", ".join(f"#f_{field}" for field in fields),
+        'ExpressionAttributeNames': {f"#f_{field}": field for field in fields},
+    }
+
+def build_read_request(filters: Optional[Dict[str, str]] = None) -> Tuple[str, Dict[str, Any]]:
+    """一覧の読み込みに使う操作とパラメータを返す
+
+    絞り込み条件があればGSIへの Query（結果の件数に比例するコスト）、なければ Scan を使う
+
+    Returns:
+        ('query' または 'scan', 操作に渡すキーワード引数)
+    """
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    for field, index_name in FILTER_INDEXES.items():
+        if field in filters:
+            kwargs = {
+                'IndexName': index_name,
+                'KeyConditionExpression': Key(field).eq(filters[field])
+            }
+            rest = [Attr(k).eq(v) for k, v in filters.items() if k != field]
+            if rest:
+                condition = rest[0]
+                for extra in rest[1:]:
+                    condition = condition & extra
+                kwargs['FilterExpression'] = condition
+            return 'query', kwargs
+    return 'scan', {}
+
+# BatchWriteItem で1回に書き込める最大件数（DynamoDBの上限）
+BATCH_WRITE_MAX_ITEMS = 25
+
+# BatchGetItem で1回に取得できる最大キー数（DynamoDBの上限）と、並行して実行するリクエスト数
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_CONCURRENCY = int(os.getenv('DYNAMODB_BATCH_GET_CONCURRENCY', '4'))
+
+# UnprocessedItems / UnprocessedKeys を再送する最大回数と、指数バックオフの初回待ち時間（秒）
+BATCH_MAX_RETRIES = int(os.getenv('DYNAMODB_BATCH_MAX_RETRIES', '5'))
+BATCH_BACKOFF_BASE = float(os.getenv('DYNAMODB_BATCH_BACKOFF_BASE', '0.05'))
+
+# プロセス内の検索インデックスを作り直す間隔（秒）。他のコンテナでの書き込みはこの間隔で反映される
+SEARCH_INDEX_TTL = float(os.getenv('DEVICE_SEARCH_INDEX_TTL_SECONDS', '300'))
+# 最初の検索インデックスの構築中に検索された場合に、再試行までの目安として返す秒数（Retry-After）
+SEARCH_INDEX_RETRY_AFTER = int(os.getenv('DEVICE_SEARCH_INDEX_RETRY_AFTER_SECONDS', '5'))
+
+def _before_call(context: Dict, **kwargs) -> None:
+    context['device_timing_started'] = time.perf_counter()
+
+def _after_call(context: Dict, **kwargs) -> None:
+    # API呼び出し（リトライを含む）の所要時間を、処理中のリクエストの db ステージとして記録する
+    started = context.get('device_timing_started')
+    if started is not None:
+        record('db', time.perf_counter() - started)
 
 class DynamoDBInterface(DatabaseInterface):
     """DynamoDBを使用したデバイス管理クラス"""
     
     def __init__(self):
-        """DynamoDBテーブルのリソースを初期化"""
+        """DynamoDBテーブルのリソースを初期化（リクエストは最初の操作時に送る）"""
+        settings = get_settings()
         try:
-            self.dynamodb = boto3.resource('dynamodb', region_name=os.getenv('AWS_REGION'))
-            self.table = self.dynamodb.Table(os.getenv('DYNAMODB_TABLE_NAME'))
-            logger.info(f"DynamoDBテーブル {os.getenv('DYNAMODB_TABLE_NAME')} に接続しました")
+            self.dynamodb = boto3.resource('dynamodb', region_name=settings.aws_region)
+            self.table = self.dynamodb.Table(settings.dynamodb_table_name)
+            events = self.dynamodb.meta.client.meta.events
+            events.register('before-call.dynamodb', _before_call)
+            events.register('after-call.dynamodb', _after_call)
+            logger.info("DynamoDBテーブル %s に接続しました", settings.dynamodb_table_name)
         except ClientError as e:
-            logger.error(f"DynamoDB接続エラー: {e.response['Error']['Message']}")
+            logger.error("DynamoDB接続エラー: %s", e.response['Error']['Message'])
             raise
+        # 全件の読み込みに使う並列スキャン（セグメント数・RCUの上限は環境変数で指定）
+        self.scanner = ParallelScanner(self.dynamodb.meta.client, self.table.name)
+        # 名前検索用のn-gramインデックス（バックグラウンドのスレッドで構築し、リクエストの処理では待たない）
+        self._search_index: Optional[NgramIndex] = None
+        self._search_index_lock = threading.Lock()
+        self._search_index_builder: Optional[threading.Thread] = None
+        # 構築中にこのインスタンスで行った書き込み（構築した結果に後から反映する）
+        self._search_index_journal: Optional[List[Tuple[str, Any]]] = None
 
     def create_device(self, device_data: Dict) -> Dict:
         """デバイスを作成する"""
         try:
             self.table.put_item(Item=device_data)
-            logger.info(f"デバイスを作成しました: {device_data['id']}")
+            logger.info("デバイスを作成しました: %s", device_data['id'])
+            self._index_write('add', device_data)
             return device_data
         except ClientError as e:
-            logger.error(f"デバイス作成エラー: {e.response['Error']['Message']}")
+            logger.error("デバイス作成エラー: %s", e.response['Error']['Message'])
             raise
 
-    def get_device(self, device_id: str) -> Optional[Dict]:
-        """デバイスを取得する"""
+    def create_devices(self, devices: List[Dict]) -> List[Dict]:
+        """複数のデバイスを BatchWriteItem（25件単位）で一括作成する
+
+        スロットリング等で書き込まれなかった UnprocessedItems は指数バックオフで再送し、
+        再送回数の上限を超えたものだけを失敗として返す
+        """
+        errors = {}
+        for start in range(0, len(devices), BATCH_WRITE_MAX_ITEMS):
+            chunk = devices[start:start + BATCH_WRITE_MAX_ITEMS]
+            try:
+                unprocessed = self._batch_put(chunk)
+            except ClientError as e:
+                message = e.response['Error']['Message']
+                logger.error("デバイス一括作成エラー: %s", message)
+                errors.update({device_data['id']: message for device_data in chunk})
+                continue
+            errors.update({
+                device_id: '書き込みの再試行回数の上限に達しました' for device_id in unprocessed
+            })
+
+        logger.info("デバイスを一括作成しました: %s件（失敗 %s件）", len(devices) - len(errors), len(errors))
+        for device_data in devices:
+            if device_data['id'] not in errors:
+                self._index_write('add', device_data)
+        return [
+            {'success': False, 'error': errors[device_data['id']]}
+            if device_data['id'] in errors
+            else {'success': True, 'device': device_data}
+            for device_data in devices
+        ]
+
+    def _batch_put(self, chunk: List[Dict]) -> List[str]:
+        """最大25件を BatchWriteItem で書き込み、最終的に書き込めなかったデバイスのIDを返す"""
+        table_name = self.table.name
+        request_items = {table_name: [{'PutRequest': {'Item': item}} for item in chunk]}
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            response = self.dynamodb.batch_write_item(RequestItems=request_items)
+            request_items = response.get('UnprocessedItems') or {}
+            if not request_items.get(table_name):
+                return []
+            if attempt < BATCH_MAX_RETRIES:
+                time.sleep(BATCH_BACKOFF_BASE * (2 ** attempt))
+        return [request['PutRequest']['Item']['id'] for request in request_items[table_name]]
+
+    def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスを取得する（fields 指定時は ProjectionExpression でその属性だけを読み込む）"""
         try:
-            response = self.table.get_item(Key={'id': device_id})
+            response = self.table.get_item(Key={'id': device_id}, **projection_kwargs(fields))
             device = response.get('Item')
             if device:
-                logger.info(f"デバイスを取得しました: {device_id}")
+                logger.info("デバイスを取得しました: %s", device_id)
             else:
-                logger.info(f"デバイスが見つかりません: {device_id}")
+                logger.info("デバイスが見つかりません: %s", device_id)
             return device
         except ClientError as e:
-            logger.error(f"デバイス取得エラー: {e.response['Error']['Message']}")
+            logger.error("デバイス取得エラー: %s", e.response['Error']['Message'])
             raise
 
+    def get_devices(self, device_ids: List[str], fields: Optional[List[str]] = None) -> Dict:
+        """指定された複数のIDのデバイスを BatchGetItem（100件単位）でまとめて取得する
+
+        チャンクごとのリクエストは並行して実行する。boto3のリソースはスレッドセーフでないため、
+        スレッドからはスレッドセーフな低レベルクライアントを使用する
+        """
+        chunks = [
+            device_ids[start:start + BATCH_GET_MAX_KEYS]
+            for start in range(0, len(device_ids), BATCH_GET_MAX_KEYS)
+        ]
+        found = {}
+        try:
+            if len(chunks) == 1:
+                found.update(self._batch_get(chunks[0], fields))
+            else:
+                with ThreadPoolExecutor(max_workers=min(BATCH_GET_CONCURRENCY, len(chunks))) as executor:
+                    for items in executor.map(lambda chunk: self._batch_get(chunk, fields), chunks):
+                        found.update(items)
+        except ClientError as e:
+            logger.error("デバイス一括取得エラー: %s", e.response['Error']['Message'])
+            raise
+
+        logger.info("デバイスを一括取得しました: %s件（該当なし %s件）", len(found), len(device_ids) - len(found))
+        return lookup_result(device_ids, found)
+
+    def _batch_get(self, chunk: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """最大100件のIDを BatchGetItem で取得し、{id: デバイス} を返す
+
+        UnprocessedKeys は指数バックオフで再送し、上限を超えた場合はエラーとする
+        """
+        client = self.dynamodb.meta.client
+        deserializer = TypeDeserializer()
+        table_name = self.table.name
+        request_items = {table_name: dict(
+            projection_kwargs(fields),
+            Keys=[{'id': {'S': device_id}} for device_id in chunk]
+        )}
+        found = {}
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            response = client.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(table_name, []):
+                device = {key: deserializer.deserialize(value) for key, value in item.items()}
+                found[device['id']] = device
+            request_items = response.get('UnprocessedKeys') or {}
+            if not request_items.get(table_name):
+                return found
+            if attempt < BATCH_MAX_RETRIES:
+                time.sleep(BATCH_BACKOFF_BASE * (2 ** attempt))
+        raise ClientError(
+            {'Error': {'Code': 'UnprocessedKeys', 'Message': '読み込みの再試行回数の上限に達しました'}},
+            'BatchGetItem'
+        )
+
     def update_device(self, device_id: str, update_data: Dict) -> Optional[Dict]:
-        """デバイスを更新する"""
+        """デバイスを更新する
+
+        存在確認は ConditionExpression で行い、更新後のデータは ReturnValues=ALL_NEW で受け取る
+        （デバイスが存在しない場合はNone）
+        """
         update_expression = "SET "
         expression_attribute_values = {}
         
@@ -67,34 +256,197 @@ class DynamoDBInterface(DatabaseInterface):
             response = self.table.update_item(
                 Key={'id': device_id},
                 UpdateExpression=update_expression,
+                ConditionExpression="attribute_exists(id)",
                 ExpressionAttributeValues=expression_attribute_values,
                 ExpressionAttributeNames={f"#{k}": k for k in update_data.keys() if k != 'id'},
                 ReturnValues="ALL_NEW"
             )
             updated_device = response.get('Attributes')
-            logger.info(f"デバイスを更新しました: {device_id}")
+            logger.info("デバイスを更新しました: %s", device_id)
+            self._index_write('add', updated_device)
             return updated_device
         except ClientError as e:
-            logger.error(f"デバイス更新エラー: {e.response['Error']['Message']}")
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logger.info("更新対象のデバイスが見つかりません: %s", device_id)
+                return None
+            logger.error("デバイス更新エラー: %s", e.response['Error']['Message'])
             raise
 
     def delete_device(self, device_id: str) -> bool:
-        """デバイスを削除する"""
+        """デバイスを削除する（存在確認は ConditionExpression で行う）"""
         try:
-            self.table.delete_item(Key={'id': device_id})
-            logger.info(f"デバイスを削除しました: {device_id}")
+            self.table.delete_item(
+                Key={'id': device_id},
+                ConditionExpression="attribute_exists(id)"
+            )
+            logger.info("デバイスを削除しました: %s", device_id)
+            self._index_write('remove', device_id)
             return True
         except ClientError as e:
-            logger.error(f"デバイス削除エラー: {e.response['Error']['Message']}")
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logger.info("削除対象のデバイスが見つかりません: %s", device_id)
+                return False
+            logger.error("デバイス削除エラー: %s", e.response['Error']['Message'])
+            raise
+
+    def delete_devices(self, device_ids: Optional[List[str]] = None, manufacturer: Optional[str] = None) -> Dict:
+        """複数のデバイスを batch_writer（BatchWriteItem、25件単位）でまとめて削除する
+
+        BatchWriteItem の削除は存在しないキーでも成功するため、IDを指定した場合は先に
+        BatchGetItem（100件単位、id のみ）で存在を確認する。メーカーを指定した場合は
+        GSIへの Query で対象のIDを読み込む。UnprocessedItems は batch_writer が再送する
+        """
+        try:
+            if manufacturer is not None:
+                device_ids = [device['id'] for device in self.iter_devices(filters={'manufacturer': manufacturer})]
+                existing = device_ids
+            else:
+                existing = [device['id'] for device in self.get_devices(device_ids, ['id'])['items']]
+            with self.table.batch_writer() as batch:
+                for device_id in existing:
+                    batch.delete_item(Key={'id': device_id})
+        except ClientError as e:
+            logger.error("デバイス一括削除エラー: %s", e.response['Error']['Message'])
             raise
 
+        logger.info("デバイスを一括削除しました: %s件（該当なし %s件）", len(existing), len(device_ids) - len(existing))
+        for device_id in existing:
+            self._index_write('remove', device_id)
+        return delete_result(device_ids, existing)
+
+    def search_devices(self, query: str, limit: int, fuzzy: bool = False) -> List[Dict]:
+        """名前に検索語を含むデバイスをプロセス内のn-gramインデックスで検索する
+
+        DynamoDBには部分一致のインデックスがないため、全件をスキャンしてインデックスを構築し、
+        このインスタンスでの書き込みはその都度反映する。構築と SEARCH_INDEX_TTL ごとの作り直しは
+        バックグラウンドで行い、作り直している間は前のインデックスで検索する
+
+        Raises:
+            SearchIndexNotReadyError: 最初のインデックスを構築中の場合
+        """
+        self.warm_search_index()
+        index = self._search_index
+        if index is None:
+            raise SearchIndexNotReadyError(SEARCH_INDEX_RETRY_AFTER)
+        devices = index.search(query, limit, fuzzy)
+        logger.info("デバイスを検索しました: %s件", len(devices))
+        return devices
+
+    def warm_search_index(self) -> bool:
+        """検索インデックスがないか期限切れの場合に、バックグラウンドでの構築を開始する
+
+        構築中、または期限内のインデックスがある場合は何もしない。
+        Lambdaでは実行環境が呼び出しの間停止するため、構築は後続の呼び出しの間に進む
+
+        Returns:
+            構築を開始したか
+        """
+        with self._search_index_lock:
+            index = self._search_index
+            if self._search_index_builder is not None or (
+                index is not None and time.monotonic() - index.built_at < SEARCH_INDEX_TTL
+            ):
+                return False
+            self._search_index_journal = []
+            self._search_index_builder = threading.Thread(
+                target=self._build_search_index, name='device-search-index', daemon=True
+            )
+            self._search_index_builder.start()
+            return True
+
+    def _build_search_index(self) -> None:
+        """全件をスキャンしてインデックスを構築し、構築中の書き込みを反映してから入れ替える"""
+        index = NgramIndex()
+        try:
+            index.build(self.iter_devices())
+        except Exception as e:
+            # 次の検索で再び構築を開始する
+            logger.error("検索インデックス構築エラー: %s", e)
+            with self._search_index_lock:
+                self._search_index_builder = None
+                self._search_index_journal = None
+            return
+        with self._search_index_lock:
+            # スキャンより後の書き込みで上書きするため、記録した順に反映する
+            for operation, value in self._search_index_journal:
+                getattr(index, operation)(value)
+            self._search_index = index
+            self._search_index_builder = None
+            self._search_index_journal = None
+
+    def _index_write(self, operation: str, value: Any) -> None:
+        """書き込みを検索インデックスに反映する（operation は 'add' / 'remove'。構築中の場合は記録もする）"""
+        with self._search_index_lock:
+            if self._search_index is not None:
+                getattr(self._search_index, operation)(value)
+            if self._search_index_journal is not None:
+                self._search_index_journal.append((operation, value))
+
     def list_devices(self) -> List[Dict]:
-        """全デバイスを取得する"""
+        """全デバイスを取得する（セグメントに分割した並列スキャンで全ページを読み込む）"""
         try:
-            response = self.table.scan()
-            devices = response.get('Items', [])
-            logger.info(f"デバイス一覧を取得しました: {len(devices)}件")
+            devices = self.scanner.scan_all()
+            logger.info("デバイス一覧を取得しました: %s件", len(devices))
             return devices
         except ClientError as e:
-            logger.error(f"デバイス一覧取得エラー: {e.response['Error']['Message']}")
+            logger.error("デバイス一覧取得エラー: %s", e.response['Error']['Message'])
+            raise
+
+    def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """デバイスを1ページ分取得する（LastEvaluatedKey をカーソルとして使用）
+
+        絞り込み条件がある場合はGSIに対する Query で取得する。
+        fields 指定時は ProjectionExpression でその属性だけを読み込む（カーソルはキーのみから作るため影響しない）
+        """
+        operation, read_kwargs = build_read_request(filters)
+        read_kwargs.update(projection_kwargs(fields))
+        read_kwargs['Limit'] = limit
+        if cursor:
+            read_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+        try:
+            response = getattr(self.table, operation)(**read_kwargs)
+            devices = response.get('Items', [])
+            last_key = response.get('LastEvaluatedKey')
+            next_cursor = encode_cursor(last_key) if last_key else None
+            logger.info("デバイス一覧を取得しました: %s件", len(devices))
+            return {'items': devices, 'next_cursor': next_cursor}
+        except ClientError as e:
+            logger.error("デバイス一覧取得エラー: %s", e.response['Error']['Message'])
+            raise
+
+    def iter_devices(self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+        """全デバイスを並列スキャン（絞り込み時はGSIへの Query）のページを辿りながら逐次返す
+
+        並列スキャンの結果はセグメントごとに読み込んだ順で返るため、順序は保証しない
+        """
+        operation, read_kwargs = build_read_request(filters)
+        if operation == 'scan':
+            try:
+                yield from self.scanner.iter_items(page_size=batch_size)
+            except ClientError as e:
+                logger.error("デバイス一覧取得エラー: %s", e.response['Error']['Message'])
+                raise
+            return
+
+        read_kwargs['Limit'] = batch_size
+        count = 0
+        try:
+            while True:
+                response = getattr(self.table, operation)(**read_kwargs)
+                items = response.get('Items', [])
+                count += len(items)
+                yield from items
+                last_key = response.get('LastEvaluatedKey')
+                if not last_key:
+                    break
+                read_kwargs['ExclusiveStartKey'] = last_key
+            logger.info("デバイス一覧をストリーミングしました: %s件", count)
+        except ClientError as e:
+            logger.error("デバイス一覧取得エラー: %s", e.response['Error']['Message'])
             raise
@@ -1,23 +1,21 @@
 from fastapi import Request
-from fastapi.responses import JSONResponse
-import logging
+from .responses import UnicodeJSONResponse
 from .exceptions import DeviceManagementError
+from .logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger(__name__)
+logger = setup_logger(__name__)
 
 async def device_management_exception_handler(
     request: Request,
     exc: DeviceManagementError
-) -> JSONResponse:
+) -> UnicodeJSONResponse:
     """カスタム例外のハンドラー"""
     logger.error(
-        f"エラーが発生しました - コード: {exc.error_code}, "
-        f"メッセージ: {exc.message}, "
-        f"詳細: {exc.details}"
+        "エラーが発生しました - コード: %s, メッセージ: %s, 詳細: %s", exc.error_code, exc.message, exc.details
     )
     
-    return JSONResponse(
+    return UnicodeJSONResponse(
         status_code=exc.status_code,
         content={
             "error": {
@@ -31,11 +29,11 @@ async def device_management_exception_handler(
 async def general_exception_handler(
     request: Request,
     exc: Exception
-) -> JSONResponse:
+) -> UnicodeJSONResponse:
     """一般的な例外のハンドラー"""
-    logger.error(f"予期せぬエラーが発生しました: {str(exc)}")
+    logger.error("予期せぬエラーが発生しました: %s", exc)
     
-    return JSONResponse(
+    return UnicodeJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error"
@@ -0,0 +1,66 @@
+import json
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Union
+
+# 条件付きGETで使用するヘッダー
+ETAG_HEADER = 'ETag'
+IF_NONE_MATCH_HEADER = 'If-None-Match'
+
+def _to_text(value: Union[datetime, str, None]) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else str(value)
+
+def _make_etag(*parts: Any) -> str:
+    digest = hashlib.sha256('\0'.join(_to_text(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+def device_etag(
+    device_id: str, updated_at: Union[datetime, str, None], fields: Optional[Sequence[str]] = None
+) -> str:
+    """単一デバイスの強いETagを (id, updated_at) から計算する
+
+    fields で返すフィールドを絞った場合は本文が異なるため、fields も含めて計算する
+    """
+    if fields is None:
+        return _make_etag('device', device_id, updated_at)
+    return _make_etag('device', device_id, updated_at, ','.join(fields))
+
+def etag_for_device(device: Dict, fields: Optional[Sequence[str]] = None) -> str:
+    """デバイスのETagを返す（updated_at を持たないデータは内容のハッシュから計算する）"""
+    if device.get('updated_at'):
+        return device_etag(device['id'], device['updated_at'], fields)
+    return _make_etag('device', json.dumps(device, sort_keys=True, default=str), ','.join(fields or ()))
+
+def page_version(rows: Sequence[Dict], has_more: bool) -> str:
+    """一覧のページのバージョンを、ページに含まれるデバイスの (id, updated_at) と次ページの有無から計算する
+
+    ページの範囲外の書き込みではバージョンが変わらないため、別のページのETagは無効にならない
+    """
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(f"{row['id']}\0{_to_text(row['updated_at'])}\n".encode('utf-8'))
+    digest.update(b'+' if has_more else b'.')
+    return digest.hexdigest()
+
+def collection_etag(version: str, *query: Any) -> str:
+    """一覧の弱いETagをページのバージョン（page_version）とクエリ条件から計算する
+
+    本文をシリアライズせずに計算できるため、変更がなければ一覧の取得自体を省略できる。
+    本文のバイト列ではなく内容の同一性を表すため、弱いETagとして返す
+    """
+    return 'W/' + _make_etag('devices', version, *query)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match ヘッダーが ETag に一致するか判定する（弱い比較）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    return any(
+        (candidate[2:] if candidate.startswith('W/') else candidate) == opaque
+        for candidate in candidates
+    )
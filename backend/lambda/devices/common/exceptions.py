@@ -44,4 +44,14 @@ class DatabaseError(DeviceManagementError):
             status_code=500,
             error_code="DATABASE_ERROR",
             details=details
-        ) 
\ No newline at end of file
+        ) 
+class SearchIndexNotReadyError(DeviceManagementError):
+    """検索インデックスを構築中で、まだ検索できない場合の例外"""
+    def __init__(self, retry_after: int):
+        super().__init__(
+            message="検索インデックスを構築中です",
+            status_code=503,
+            error_code="SEARCH_INDEX_NOT_READY",
+            details={"retry_after": retry_after}
+        )
+        self.retry_after = retry_after
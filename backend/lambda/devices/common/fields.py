@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Optional, Sequence
+from .exceptions import ValidationError
+
+# レスポンスで返すデバイスのフィールド（この順で返す）
+DEVICE_FIELDS = ('id', 'name', 'manufacturer', 'created_at', 'updated_at')
+
+def normalize_fields(value: Optional[Any]) -> Optional[List[str]]:
+    """fields パラメータ（カンマ区切りの文字列またはリスト）を検証して返す
+
+    id は常に含め、DEVICE_FIELDS の順に並べる。未指定の場合はNone（全フィールド）
+
+    Raises:
+        ValidationError: 存在しないフィールドが指定された場合
+    """
+    if value is None or value == '':
+        return None
+    names = value.split(',') if isinstance(value, str) else list(value)
+    requested = {str(name).strip() for name in names if str(name).strip()}
+    unknown = sorted(requested - set(DEVICE_FIELDS))
+    if unknown:
+        raise ValidationError(
+            f"無効なフィールド: {', '.join(unknown)}",
+            {"fields": value, "allowed": list(DEVICE_FIELDS)}
+        )
+    requested.add('id')
+    return [field for field in DEVICE_FIELDS if field in requested]
+
+def with_fields(fields: Optional[Sequence[str]], *required: str) -> Optional[List[str]]:
+    """読み込む列を返す（ページングやETagの計算に必要な列を fields に加える）"""
+    if fields is None:
+        return None
+    return [field for field in DEVICE_FIELDS if field in fields or field in required]
+
+def project(device: Dict, fields: Optional[Sequence[str]]) -> Dict:
+    """デバイスの辞書を指定されたフィールドだけに絞る（fields がNoneの場合はそのまま返す）"""
+    if fields is None:
+        return device
+    return {field: device[field] for field in fields if field in device}
+
+def column_list(fields: Optional[Sequence[str]]) -> str:
+    """SELECT に指定する列のリストを返す（fields は normalize_fields で検証済みであること）"""
+    return ", ".join(fields or DEVICE_FIELDS)
@@ -1,38 +1,237 @@
-import logging
 import os
-from typing import Optional
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# 出力形式（json / text）
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+
+# text 形式のフォーマット（従来の StreamHandler と同じ）
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# ロガーごとのレベル（例: "devices.common.rds=WARNING,botocore=ERROR"）
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+
+# INFO以下のログを、ロガー・メッセージのテンプレートごとに1秒あたりこの件数までに間引く（0は間引かない）
+LOG_SAMPLE_PER_SECOND = int(os.getenv('LOG_SAMPLE_PER_SECOND', '20'))
+
+# 呼び出し元のファイル名・行番号・スレッド・プロセスをレコードに記録するか
+# （JSON・text のどちらの形式も出力しないため、既定では記録せずにログ1件あたりのコストを下げる）
+LOG_CALLER_INFO = os.getenv('LOG_CALLER_INFO', 'false').lower() in ('1', 'true', 'yes')
+
+# flush_logging で出力を待つ最大秒数
+FLUSH_TIMEOUT = float(os.getenv('LOG_FLUSH_TIMEOUT_SECONDS', '2'))
+
+# 間引きの状態を保持するテンプレート数の上限（超えた場合はリセットする）
+SAMPLING_MAX_KEYS = 10000
+
+# LogRecord の標準の属性（extra で渡されたフィールドと区別するため）
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+class JsonFormatter(logging.Formatter):
+    """1レコードを1行のJSONにする（extra で渡したフィールドはそのまま出力する）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + '.%03dZ' % record.msecs,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """INFO以下のログを、ロガー・メッセージのテンプレートごとに1秒あたり rate 件までに間引く
+
+    テンプレート（% 形式の引数を展開する前の msg）ごとに数えるため、同じ箇所から大量に
+    出力されるログだけが間引かれる。間引いた件数は次の1秒で最初に出力するレコードの
+    sampled_out に入れる。WARNING以上は間引かない
+    """
+
+    def __init__(self, rate: int, level: int = logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+        # (ロガー名, テンプレート) → [秒, 出力した件数, 間引いた件数]
+        self._windows: Dict[Tuple[str, str], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level or self.rate <= 0:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        second = int(record.created)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or window[0] != second:
+                if window is not None and window[2]:
+                    record.sampled_out = window[2]
+                if window is None and len(self._windows) >= SAMPLING_MAX_KEYS:
+                    self._windows.clear()
+                window = self._windows[key] = [second, 0, 0]
+            if window[1] >= self.rate:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """呼び出し元のスレッドでは引数の展開だけを行い、キューに入れる
+
+    例外のトレースバックはメッセージに連結せず exc_text に入れる（JSONでは別のフィールドにする）。
+    レコードはコピーせずにそのまま書き換える（他のハンドラーにも展開済みのメッセージが渡る）
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class _StdoutHandler(logging.StreamHandler):
+    """出力時点の sys.stdout に書き込む（テストなどで sys.stdout が差し替えられても追従する）
+
+    flush_logging が入れた目印のレコードを受け取った場合は、書き込まずに待っている側に知らせる
+    """
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        flushed = getattr(record, 'flushed', None)
+        if flushed is not None:
+            self.flush()
+            flushed.set()
+            return False
+        return super().handle(record)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+# バックグラウンドで出力するリスナーと、ルートロガーに追加したハンドラー
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+# リスナーをこのモジュールで作成したか（他のモジュールが作成したものは停止しない）
+_owned = False
+_configure_lock = threading.Lock()
+
+def _parse_levels(value: str) -> Dict[str, int]:
+    levels = {}
+    for item in value.split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = getattr(logging, level.strip().upper())
+    return levels
+
+def configure_logging(force: bool = False) -> None:
+    """ルートロガーに、キュー経由でバックグラウンドのスレッドから出力するハンドラーを設定する
+
+    呼び出し元はキューに入れるだけで、フォーマット（JSON化）と書き込みはリスナーのスレッドで行う。
+    2回目以降の呼び出しは何もしない（force=True の場合は現在の環境変数で設定し直す）
+    """
+    global _listener, _handler, _owned
+    with _configure_lock:
+        root = logging.getLogger()
+        if _listener is None and not force:
+            # devices.common と Lambda の common（同じファイルの別モジュール）で二重に設定しない
+            for handler in root.handlers:
+                if isinstance(getattr(handler, 'listener', None), logging.handlers.QueueListener):
+                    _handler, _listener = handler, handler.listener
+                    return
+        if _listener is not None:
+            if not force:
+                return
+            _stop()
+
+        if not LOG_CALLER_INFO:
+            # logging の HOWTO（Optimization）に記載の設定。呼び出し元のフレームの探索などを省く
+            logging._srcfile = None
+            logging.logThreads = False
+            logging.logProcesses = False
+            logging.logMultiprocessing = False
+        root.setLevel(getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper()))
+        for name, level in _parse_levels(os.getenv('LOG_LEVELS', LOG_LEVELS)).items():
+            logging.getLogger(name).setLevel(level)
+
+        output = _StdoutHandler()
+        if os.getenv('LOG_FORMAT', LOG_FORMAT).lower() == 'text':
+            output.setFormatter(logging.Formatter(TEXT_FORMAT))
+        else:
+            output.setFormatter(JsonFormatter())
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _handler = _QueueHandler(log_queue)
+        _handler.addFilter(SamplingFilter(int(os.getenv('LOG_SAMPLE_PER_SECOND', str(LOG_SAMPLE_PER_SECOND)))))
+        if 'AWS_LAMBDA_FUNCTION_NAME' in os.environ:
+            # Lambdaのランタイムが追加するハンドラーと二重に出力しないようにする
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+        _listener = logging.handlers.QueueListener(log_queue, output)
+        _handler.listener = _listener
+        _owned = True
+        _listener.start()
+        root.addHandler(_handler)
+
+def _stop() -> None:
+    global _listener, _handler, _owned
+    if _listener is not None and _owned:
+        # 先にハンドラーを外し、停止後にキューに入るログがないようにする
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+    _listener = None
+    _handler = None
+    _owned = False
+
+def flush_logging() -> None:
+    """キューに残っているログをすべて出力し終えるまで待つ
+
+    Lambdaはレスポンスを返すと実行環境が停止するため、ハンドラーの終了前に呼び出す
+    """
+    listener = _listener
+    if listener is not None:
+        flushed = threading.Event()
+        listener.queue.put_nowait(logging.makeLogRecord({'flushed': flushed}))
+        flushed.wait(FLUSH_TIMEOUT)
+
+def shutdown_logging() -> None:
+    """リスナーを停止する（キューに残っているログは出力してから停止する）"""
+    with _configure_lock:
+        _stop()
+
+atexit.register(shutdown_logging)
 
 def setup_logger(name: Optional[str] = None) -> logging.Logger:
     """ロガーを設定する関数
 
+    初回の呼び出しでログの出力（configure_logging）を設定し、名前付きのロガーを返す。
+    レベルは LOG_LEVEL（ルート）と LOG_LEVELS（ロガーごと）で指定する
+
     Args:
-        name: ロガー名（Noneの場合はルートロガーを設定）
+        name: ロガー名（Noneの場合はルートロガー）
 
     Returns:
-        設定されたロガーインスタンス
+        ロガーインスタンス
     """
-    # ロガーの取得
-    logger = logging.getLogger(name)
-    
-    # 既に設定済みの場合は既存のロガーを返す
-    if logger.handlers:
-        return logger
-    
-    # ログレベルの設定
-    log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
-    logger.setLevel(getattr(logging, log_level))
-    
-    # ハンドラーの設定
-    handler = logging.StreamHandler()
-    handler.setLevel(logging.DEBUG)
-    
-    # フォーマッターの設定
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    handler.setFormatter(formatter)
-    
-    # ハンドラーの追加
-    logger.addHandler(handler)
-    
-    return logger 
\ No newline at end of file
+    configure_logging()
+    return logging.getLogger(name)
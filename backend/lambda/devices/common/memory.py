@@ -0,0 +1,369 @@
+import os
+import sys
+import time
+import uuid
+import bisect
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from .db_interface import DatabaseInterface
+from .batch import delete_result, lookup_result
+from .fields import DEVICE_FIELDS
+from .pagination import FILTER_FIELDS, encode_keyset_cursor, decode_keyset_cursor
+from .search import NgramIndex
+from .etag import page_version
+from .clock import utc_now
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# 起動時の読み込みで1回に取得する件数
+HYDRATE_BATCH_SIZE = int(os.getenv('DEVICE_MEMORY_HYDRATE_BATCH_SIZE', '1000'))
+
+def _to_datetime(value: Union[datetime, str, None]) -> datetime:
+    # DynamoDBの日時はISO 8601の文字列で保存されている
+    if value is None:
+        return utc_now()
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+def _order_key(record: 'DeviceRecord') -> Tuple[datetime, str]:
+    return record.created_at, record.id
+
+def _page_version(page: List['DeviceRecord'], has_more: bool) -> str:
+    return page_version([{'id': record.id, 'updated_at': record.updated_at} for record in page], has_more)
+
+class DeviceRecord:
+    """メモリ上のデバイス（行ごとの辞書を持たず __slots__ で保持する）"""
+
+    __slots__ = DEVICE_FIELDS
+
+    def __init__(self, id: str, name: str, manufacturer: str, created_at: datetime, updated_at: datetime):
+        self.id = id
+        self.name = name
+        # メーカー名は重複が多いため同じ文字列オブジェクトを共有する
+        self.manufacturer = sys.intern(manufacturer)
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_dict(cls, device: Dict) -> 'DeviceRecord':
+        created_at = _to_datetime(device.get('created_at'))
+        updated_at = _to_datetime(device.get('updated_at') or created_at)
+        # 更新されていないデバイスは created_at と同じオブジェクトを共有する
+        return cls(
+            device['id'],
+            device['name'],
+            device['manufacturer'],
+            created_at,
+            created_at if updated_at == created_at else updated_at
+        )
+
+    def to_dict(self, fields: Optional[List[str]] = None) -> Dict:
+        return {field: getattr(self, field) for field in (fields or DEVICE_FIELDS)}
+
+# name / manufacturer のインデックスの値（1件だけの場合はリストを作らずレコードを直接持つ）
+Bucket = Union[DeviceRecord, List[DeviceRecord]]
+
+def _bucket_records(bucket: Optional[Bucket]) -> List[DeviceRecord]:
+    if bucket is None:
+        return []
+    return [bucket] if isinstance(bucket, DeviceRecord) else bucket
+
+class MemoryInterface(DatabaseInterface):
+    """プロセス内のメモリにデバイスを保持するインターフェースの実装クラス
+
+    - ID のハッシュ、(created_at, id) 順のリスト、name / manufacturer ごとの
+      (created_at, id) 順のリストをインデックスとして持ち、取得・絞り込み・
+      キーセットページネーションを全件の走査なしで行う
+    - 名前はほぼ一意のため、値が1件だけのインデックスはリストを作らずレコードを直接持つ
+    - source を指定した場合は起動時に全件を読み込み（ハイドレート）、書き込みは
+      source に反映してからメモリに適用する（読み込み専用のレプリカとして使用）
+    """
+
+    def __init__(self, source: Optional[DatabaseInterface] = None):
+        self.source = source
+        self._by_id: Dict[str, DeviceRecord] = {}
+        self._order: List[DeviceRecord] = []
+        self._by_field: Dict[str, Dict[str, Bucket]] = {field: {} for field in FILTER_FIELDS}
+        self._lock = threading.RLock()
+        # 名前検索用のn-gramインデックス（最初の検索時に構築する）
+        self._search_index: Optional[NgramIndex] = None
+        if source is not None:
+            self.hydrate(source)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def hydrate(self, source: DatabaseInterface, batch_size: int = HYDRATE_BATCH_SIZE) -> int:
+        """source の全デバイスを読み込み、保持しているデータを置き換える"""
+        started = time.monotonic()
+        records = [DeviceRecord.from_dict(device) for device in source.iter_devices(batch_size)]
+        records.sort(key=_order_key)
+        with self._lock:
+            self._by_id = {record.id: record for record in records}
+            self._order = records
+            self._by_field = {field: {} for field in FILTER_FIELDS}
+            for record in records:
+                for field in FILTER_FIELDS:
+                    # records は (created_at, id) 順のため末尾に追加すればよい
+                    self._add_to_field_index(record, field, ordered=True)
+            self._search_index = None
+        logger.info("デバイスをメモリに読み込みました: %s件（%.2f秒）", len(records), time.monotonic() - started)
+        return len(records)
+
+    # インデックスの操作（ロック取得済みで呼び出す）
+
+    def _add_to_field_index(self, record: DeviceRecord, field: str, ordered: bool = False) -> None:
+        index = self._by_field[field]
+        value = getattr(record, field)
+        bucket = index.get(value)
+        if bucket is None:
+            index[value] = record
+        elif isinstance(bucket, DeviceRecord):
+            index[value] = [bucket, record] if ordered or _order_key(bucket) < _order_key(record) else [record, bucket]
+        elif ordered:
+            bucket.append(record)
+        else:
+            bisect.insort(bucket, record, key=_order_key)
+
+    def _insert(self, record: DeviceRecord) -> None:
+        self._by_id[record.id] = record
+        bisect.insort(self._order, record, key=_order_key)
+        for field in FILTER_FIELDS:
+            self._add_to_field_index(record, field)
+        if self._search_index is not None:
+            self._search_index.add(record.to_dict())
+
+    @staticmethod
+    def _remove_from(records: List[DeviceRecord], record: DeviceRecord) -> None:
+        index = bisect.bisect_left(records, _order_key(record), key=_order_key)
+        if index < len(records) and records[index] is record:
+            del records[index]
+
+    def _remove_field_index(self, record: DeviceRecord, field: str) -> None:
+        index = self._by_field[field]
+        value = getattr(record, field)
+        bucket = index.get(value)
+        if bucket is record:
+            del index[value]
+        elif isinstance(bucket, list):
+            self._remove_from(bucket, record)
+            if len(bucket) == 1:
+                index[value] = bucket[0]
+
+    def _remove(self, record: DeviceRecord) -> None:
+        del self._by_id[record.id]
+        self._remove_from(self._order, record)
+        for field in FILTER_FIELDS:
+            self._remove_field_index(record, field)
+        if self._search_index is not None:
+            self._search_index.remove(record.id)
+
+    def _apply_update(self, record: DeviceRecord, update_fields: Dict, updated_at: datetime) -> None:
+        for field, value in update_fields.items():
+            if field in FILTER_FIELDS:
+                self._remove_field_index(record, field)
+            setattr(record, field, sys.intern(value) if field == 'manufacturer' else value)
+            if field in FILTER_FIELDS:
+                self._add_to_field_index(record, field)
+        record.updated_at = updated_at
+        if self._search_index is not None and 'name' in update_fields:
+            self._search_index.update(record.id, {'name': record.name})
+
+    # DatabaseInterface の実装
+
+    def create_device(self, device_data: Dict) -> Dict:
+        """デバイスを作成する"""
+        if self.source is not None:
+            device_data = self.source.create_device(device_data)
+        record = DeviceRecord.from_dict(dict(device_data, id=device_data.get('id') or str(uuid.uuid4())))
+        with self._lock:
+            if record.id in self._by_id:
+                raise ValueError(f"デバイスIDが重複しています: {record.id}")
+            self._insert(record)
+        logger.info("デバイスを作成しました: %s", record.id)
+        return record.to_dict()
+
+    def create_devices(self, devices: List[Dict]) -> List[Dict]:
+        """複数のデバイスを一括で作成する（source がある場合は source の一括作成の結果を反映する）"""
+        if self.source is None:
+            return super().create_devices(devices)
+        results = self.source.create_devices(devices)
+        with self._lock:
+            for result in results:
+                if result['success']:
+                    record = DeviceRecord.from_dict(result['device'])
+                    existing = self._by_id.get(record.id)
+                    if existing is not None:
+                        self._remove(existing)
+                    self._insert(record)
+        return results
+
+    def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスを取得する"""
+        record = self._by_id.get(device_id)
+        return record.to_dict(fields) if record is not None else None
+
+    def get_devices(self, device_ids: List[str], fields: Optional[List[str]] = None) -> Dict:
+        """指定された複数のIDのデバイスをまとめて取得する"""
+        found = {}
+        for device_id in device_ids:
+            record = self._by_id.get(device_id)
+            if record is not None:
+                found[device_id] = record.to_dict(fields)
+        return lookup_result(device_ids, found)
+
+    def update_device(self, device_id: str, device_data: Dict) -> Optional[Dict]:
+        """デバイスを更新する（デバイスが存在しない場合はNone）"""
+        update_fields = {k: v for k, v in device_data.items() if k in ('name', 'manufacturer')}
+        if not update_fields:
+            logger.warning("更新可能なフィールドがありません: %s", device_id)
+            return None
+
+        updated_at = utc_now()
+        if self.source is not None:
+            updated = self.source.update_device(device_id, update_fields)
+            if updated is None:
+                return None
+            updated_at = _to_datetime(updated.get('updated_at'))
+
+        with self._lock:
+            record = self._by_id.get(device_id)
+            if record is None:
+                logger.info("更新対象のデバイスが見つかりません: %s", device_id)
+                return None
+            self._apply_update(record, update_fields, updated_at)
+            logger.info("デバイスを更新しました: %s", device_id)
+            return record.to_dict()
+
+    def delete_device(self, device_id: str) -> bool:
+        """デバイスを削除する（デバイスが存在しない場合はFalse）"""
+        if self.source is not None and not self.source.delete_device(device_id):
+            return False
+        with self._lock:
+            record = self._by_id.get(device_id)
+            if record is None:
+                logger.info("削除対象のデバイスが見つかりません: %s", device_id)
+                return False
+            self._remove(record)
+        logger.info("デバイスを削除しました: %s", device_id)
+        return True
+
+    def delete_devices(self, device_ids: Optional[List[str]] = None, manufacturer: Optional[str] = None) -> Dict:
+        """複数のデバイスをまとめて削除する（メーカー指定時は manufacturer のインデックスで対象を求める）
+
+        source がある場合は source の一括削除の結果に従ってメモリから削除する
+        """
+        result = self.source.delete_devices(device_ids, manufacturer) if self.source is not None else None
+        with self._lock:
+            if result is not None:
+                records = [self._by_id[device_id] for device_id in result['deleted'] if device_id in self._by_id]
+            elif manufacturer is not None:
+                records = list(_bucket_records(self._by_field['manufacturer'].get(manufacturer)))
+            else:
+                records = [self._by_id[device_id] for device_id in device_ids if device_id in self._by_id]
+            for record in records:
+                self._remove(record)
+        if result is None:
+            deleted = [record.id for record in records]
+            result = delete_result(deleted if manufacturer is not None else device_ids, deleted)
+        logger.info("デバイスを一括削除しました: %s件（該当なし %s件）", len(result['deleted']), len(result['missing']))
+        return result
+
+    def list_devices(self) -> List[Dict]:
+        """全デバイスを取得する"""
+        with self._lock:
+            return [record.to_dict() for record in self._order]
+
+    def _candidates(self, filters: Optional[Dict[str, str]]) -> Tuple[List[DeviceRecord], Dict[str, str]]:
+        """絞り込み条件に対応する (created_at, id) 順のリストと、リストの走査中に確認する残りの条件を返す
+
+        複数の条件がある場合は、件数の少ない方のインデックスを使う
+        """
+        filters = {k: v for k, v in (filters or {}).items() if k in FILTER_FIELDS and v is not None}
+        if not filters:
+            return self._order, {}
+        buckets = {field: _bucket_records(self._by_field[field].get(value)) for field, value in filters.items()}
+        field = min(buckets, key=lambda name: len(buckets[name]))
+        rest = {k: v for k, v in filters.items() if k != field}
+        return buckets[field], rest
+
+    def _page(
+        self, limit: int, cursor: Optional[str], filters: Optional[Dict[str, str]]
+    ) -> Tuple[List[DeviceRecord], bool]:
+        """1ページ分のレコードと、次ページがあるかを返す
+
+        カーソルの位置は二分探索で求めるため、ページの取得コストはデータの件数によらない
+        """
+        with self._lock:
+            records, rest = self._candidates(filters)
+            start = 0
+            if cursor:
+                start = bisect.bisect_right(records, decode_keyset_cursor(cursor), key=_order_key)
+            page = []
+            for index in range(start, len(records)):
+                record = records[index]
+                if rest and any(getattr(record, k) != v for k, v in rest.items()):
+                    continue
+                if len(page) == limit:
+                    return page, True
+                page.append(record)
+        return page, False
+
+    def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """デバイスを1ページ分取得する（(created_at, id) によるキーセットページネーション）"""
+        page, has_more = self._page(limit, cursor, filters)
+        next_cursor = encode_keyset_cursor(page[-1].created_at, page[-1].id) if has_more else None
+        return {
+            'items': [record.to_dict(fields) for record in page],
+            'next_cursor': next_cursor,
+            'version': _page_version(page, has_more)
+        }
+
+    def iter_devices(self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+        """全デバイスを (created_at, id) 順に逐次返す
+
+        ロックは batch_size 件ごとに取り直すため、走査中の書き込みはブロックしない
+        """
+        cursor = None
+        while True:
+            page, has_more = self._page(batch_size, cursor, filters)
+            yield from (record.to_dict() for record in page)
+            if not has_more:
+                break
+            cursor = encode_keyset_cursor(page[-1].created_at, page[-1].id)
+
+    def search_devices(self, query: str, limit: int, fuzzy: bool = False) -> List[Dict]:
+        """名前の部分一致でデバイスを検索する（n-gramインデックスは最初の検索時に構築し、以降は書き込みで更新する）"""
+        with self._lock:
+            if self._search_index is None:
+                index = NgramIndex()
+                index.build(record.to_dict() for record in self._order)
+                self._search_index = index
+            return self._search_index.search(query, limit, fuzzy)
+
+    def get_collection_version(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """ページに含まれるデバイスの (id, updated_at) からページのバージョンを返す"""
+        return _page_version(*self._page(limit, cursor, filters))
+
+    def is_healthy(self) -> bool:
+        """source がある場合は source の接続を確認する"""
+        return self.source.is_healthy() if self.source is not None else True
+
+    def close(self) -> None:
+        if self.source is not None:
+            self.source.close()
@@ -0,0 +1,365 @@
+import os
+import sys
+import json
+import time
+import bisect
+import functools
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .timing import SERVER_TIMING_HEADER, RequestTiming, start_timing, stop_timing
+from .logger import flush_logging, setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# レイテンシのヒストグラムのバケット（秒、Prometheus の既定に近い区切り）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# リクエストを計測するか（false の場合は FastAPI のミドルウェアと /metrics を登録しない）
+METRICS_ENABLED = os.getenv('DEVICE_METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Server-Timing ヘッダーを返すか
+SERVER_TIMING_ENABLED = os.getenv('DEVICE_SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+
+# EMF（CloudWatch Embedded Metric Format）のログを出力するか（auto はLambda上でのみ出力）
+EMF_MODE = os.getenv('DEVICE_METRICS_EMF', 'auto').lower()
+EMF_NAMESPACE = os.getenv('DEVICE_METRICS_NAMESPACE', 'DeviceManagement')
+
+# /metrics のレスポンスの Content-Type
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# ルーティングに一致しなかったリクエストのルート名（パスをそのままラベルにしない）
+UNMATCHED_ROUTE = 'unmatched'
+
+# Lambda上で動いているか
+ON_LAMBDA = 'AWS_LAMBDA_FUNCTION_NAME' in os.environ
+
+def emf_enabled() -> bool:
+    if EMF_MODE == 'auto':
+        return ON_LAMBDA
+    return EMF_MODE in ('1', 'true', 'yes')
+
+# リクエストごとに環境変数を読まないよう、起動時に決める
+EMF_ENABLED = emf_enabled()
+
+class Histogram:
+    """累積前のバケットごとの件数・合計・件数を持つヒストグラム"""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Counter:
+    """ラベルの値ごとに増え続けるカウンター（MetricsRegistry.counter で作成する）"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.values.clear()
+
+class Gauge:
+    """出力する時点の値を collect で読み込むゲージ（MetricsRegistry.gauge で作成する）
+
+    collect が None を返した場合（対象がまだない場合）は出力しない
+    """
+
+    def __init__(self, name: str, help_text: str, collect: Callable[[], Optional[float]]):
+        self.name = name
+        self.help_text = help_text
+        self.collect = collect
+
+class LabeledHistogram:
+    """ラベルの値ごとのヒストグラム（MetricsRegistry.histogram で作成する、値は秒）"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.histograms: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(label_values)
+            if histogram is None:
+                histogram = self.histograms[label_values] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+
+class MetricsRegistry:
+    """ルート・メソッド・ステータスごとのレイテンシと、ステージごとの所要時間を集計する"""
+
+    def __init__(self):
+        self._requests: Dict[Tuple[str, str, str], Histogram] = {}
+        self._stages: Dict[Tuple[str, str, str], Histogram] = {}
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, LabeledHistogram] = {}
+        self._gauges: Dict[str, Gauge] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        """カウンターを登録して返す（同じ名前で登録済みの場合はそれを返す）"""
+        with self._lock:
+            counter = self._counters.get(name)
+            if counter is None:
+                counter = self._counters[name] = Counter(name, help_text, label_names)
+            return counter
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> LabeledHistogram:
+        """ヒストグラムを登録して返す（同じ名前で登録済みの場合はそれを返す）"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LabeledHistogram(name, help_text, label_names)
+            return histogram
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], Optional[float]]) -> Gauge:
+        """ゲージを登録して返す（同じ名前で登録済みの場合はそれを返す）"""
+        with self._lock:
+            gauge = self._gauges.get(name)
+            if gauge is None:
+                gauge = self._gauges[name] = Gauge(name, help_text, collect)
+            return gauge
+
+    def gauge_values(self) -> Dict[str, float]:
+        """ゲージの現在の値（名前 → 値、値がないものは含めない）"""
+        with self._lock:
+            gauges = list(self._gauges.values())
+        values = {}
+        for gauge in gauges:
+            value = gauge.collect()
+            if value is not None:
+                values[gauge.name] = value
+        return values
+
+    def observe(self, route: str, method: str, status: str, timing: RequestTiming, total: float) -> None:
+        """1リクエストの計測結果を集計に加える"""
+        with self._lock:
+            key = (route, method, status)
+            histogram = self._requests.get(key)
+            if histogram is None:
+                histogram = self._requests[key] = Histogram()
+            histogram.observe(total)
+            for name, (seconds, _) in timing.stages.items():
+                stage_key = (route, method, name)
+                histogram = self._stages.get(stage_key)
+                if histogram is None:
+                    histogram = self._stages[stage_key] = Histogram()
+                histogram.observe(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests.clear()
+            self._stages.clear()
+            for counter in self._counters.values():
+                counter.reset()
+            for histogram in self._histograms.values():
+                histogram.reset()
+
+    def render_prometheus(self) -> str:
+        """Prometheus のテキスト形式（version 0.0.4）で出力する"""
+        lines: List[str] = []
+        with self._lock:
+            self._render_histograms(
+                lines, 'device_api_request_duration_seconds', "リクエストの処理時間",
+                ('route', 'method', 'status'), self._requests
+            )
+            self._render_histograms(
+                lines, 'device_api_stage_duration_seconds', "リクエスト内のステージごとの処理時間",
+                ('route', 'method', 'stage'), self._stages
+            )
+            counters = list(self._counters.values())
+            histograms = list(self._histograms.values())
+            gauges = list(self._gauges.values())
+        for counter in counters:
+            self._render_counter(lines, counter)
+        for histogram in histograms:
+            with histogram._lock:
+                values = dict(histogram.histograms)
+                self._render_histograms(lines, histogram.name, histogram.help_text, histogram.label_names, values)
+        for gauge in gauges:
+            value = gauge.collect()
+            if value is not None:
+                lines.append(f'# HELP {gauge.name} {gauge.help_text}')
+                lines.append(f'# TYPE {gauge.name} gauge')
+                lines.append(f'{gauge.name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_counter(lines: List[str], counter: Counter) -> None:
+        lines.append(f'# HELP {counter.name} {counter.help_text}')
+        lines.append(f'# TYPE {counter.name} counter')
+        with counter._lock:
+            values = sorted(counter.values.items())
+        for key, value in values:
+            labels = ','.join(f'{label}="{_label(str(v))}"' for label, v in zip(counter.label_names, key))
+            lines.append(f'{counter.name}{{{labels}}} {value:g}' if labels else f'{counter.name} {value:g}')
+
+    @staticmethod
+    def _render_histograms(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+                           histograms: Dict[Tuple[str, ...], Histogram]) -> None:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in sorted(histograms.items()):
+            labels = ','.join(f'{label}="{_label(value)}"' for label, value in zip(label_names, key))
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+# プロセス全体で共有する集計
+metrics = MetricsRegistry()
+
+def emf_record(route: str, method: str, status: str, timing: RequestTiming, total: float) -> Dict[str, Any]:
+    """1リクエストの計測結果をEMFのログ（JSON）の形にする（値はミリ秒）"""
+    values = {'total': round(total * 1000, 3)}
+    for name, (seconds, _) in timing.stages.items():
+        values[name] = round(seconds * 1000, 3)
+    directives = [{
+        'Namespace': EMF_NAMESPACE,
+        'Dimensions': [['Route', 'Method', 'Status']],
+        'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in values],
+    }]
+    # ゲージ（接続プールの接続数など）はルートに関係しないため、ディメンションなしで記録する
+    gauges = metrics.gauge_values()
+    if gauges:
+        directives.append({
+            'Namespace': EMF_NAMESPACE,
+            'Dimensions': [[]],
+            'Metrics': [{'Name': name, 'Unit': 'Count'} for name in gauges],
+        })
+    return {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': directives,
+        },
+        'Route': route,
+        'Method': method,
+        'Status': status,
+        **values,
+        **gauges,
+    }
+
+def emit_emf(route: str, method: str, status: str, timing: RequestTiming, total: float) -> None:
+    """EMFのログを標準出力に1行で出力する（CloudWatch Logs がメトリクスとして取り込む）"""
+    sys.stdout.write(json.dumps(emf_record(route, method, status, timing, total), ensure_ascii=False) + '\n')
+
+def _finish(route: str, method: str, status: str, timing: RequestTiming, total: float) -> None:
+    try:
+        metrics.observe(route, method, status, timing, total)
+        if EMF_ENABLED:
+            emit_emf(route, method, status, timing, total)
+    except Exception as e:
+        # 計測の失敗でリクエストを失敗させない
+        logger.warning("メトリクスの記録に失敗しました: %s", e)
+
+# id(ルート) → テンプレート（ルートごとに最初のリクエストで組み立てる。Starlette のルートはハッシュできない）
+_route_templates: Dict[int, str] = {}
+
+def route_template(scope) -> str:
+    """リクエストのパスを、パスパラメータの値を {名前} に戻したルートのテンプレートにする
+
+    ラベルの種類がデバイスIDの数だけ増えないようにする。include_router の prefix は
+    scope['route'].path に含まれない場合があるため、実際のパスから組み立てる
+    """
+    route = scope.get('route')
+    if route is None:
+        return UNMATCHED_ROUTE
+    template = _route_templates.get(id(route))
+    if template is None:
+        names = {str(value): name for name, value in (scope.get('path_params') or {}).items()}
+        template = _route_templates[id(route)] = '/'.join(
+            f'{{{names[segment]}}}' if segment in names else segment for segment in scope['path'].split('/')
+        )
+    return template
+
+class TimingMiddleware:
+    """FastAPI（ASGI）のリクエストを計測するミドルウェア
+
+    レスポンスヘッダーの送信時点で処理時間を確定し、Server-Timing ヘッダーを付けて
+    ルートのテンプレート（/api/v1/devices/{device_id} など）ごとに集計する
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timing, token = start_timing()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                total = timing.elapsed()
+                _finish(route_template(scope), scope['method'], str(message['status']), timing, total)
+                if SERVER_TIMING_ENABLED:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', timing.server_timing(total).encode('latin-1')))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            stop_timing(token)
+            if ON_LAMBDA:
+                # Mangum で動かしている場合は、実行環境が停止する前にログを出力する
+                flush_logging()
+
+def timed_handler(default_route: str) -> Callable:
+    """Lambda関数のハンドラーを計測するデコレーター
+
+    API Gateway のイベントの resource（/devices/{id} など）をルート名に使い、
+    レスポンスに Server-Timing ヘッダーを付け、EMFのログを出力する。
+    返す前にキューのログを出力し終える（flush_logging）
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(event, context):
+            timing, token = start_timing()
+            try:
+                response = func(event, context)
+            finally:
+                stop_timing(token)
+            total = timing.elapsed()
+            # 実行環境が停止する前に、キューに残っているログを出力する（EMFの行と混ざらないよう先に出力する）
+            flush_logging()
+            route = (event or {}).get('resource') or default_route
+            method = (event or {}).get('httpMethod') or ''
+            _finish(route, method, str(response.get('statusCode')), timing, total)
+            if SERVER_TIMING_ENABLED:
+                response['headers'] = dict(response.get('headers') or {}, **{
+                    SERVER_TIMING_HEADER: timing.server_timing(total)
+                })
+            return response
+        return wrapper
+    return decorator
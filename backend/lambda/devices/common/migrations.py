@@ -0,0 +1,147 @@
+import os
+from typing import Dict, List, Tuple
+from .search import normalize_text
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# 既存の行を埋める際に1回のトランザクションで更新する行数
+BACKFILL_BATCH_SIZE = int(os.getenv('DB_MIGRATION_BATCH_SIZE', '1000'))
+
+# 既存の devices テーブルに追加するインデックス（名前, 列, 作成する文）
+# init.sql と init_db() / models.py でインデックス名が異なるため、同じ列の組のインデックスがあれば作成しない
+INDEXES = (
+    # 一覧のキーセットページネーション用（作成中も読み書きをブロックしない）
+    ('idx_created_at_id', ('created_at', 'id'), "CREATE INDEX {name} ON devices ({columns}) ALGORITHM=INPLACE LOCK=NONE"),
+    # 部分一致検索用の全文インデックス（最初の全文インデックスはテーブルを作り直すため、作成中は書き込みがブロックされる）
+    ('ft_name_search', ('name_search',), "CREATE FULLTEXT INDEX {name} ON devices ({columns}) WITH PARSER ngram"),
+)
+
+def _index_columns(cursor) -> Dict[str, Tuple[str, ...]]:
+    """devices テーブルのインデックスごとの列を返す"""
+    cursor.execute(
+        "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'devices' "
+        "ORDER BY INDEX_NAME, SEQ_IN_INDEX"
+    )
+    indexes: Dict[str, Tuple[str, ...]] = {}
+    for index_name, column_name in cursor.fetchall():
+        indexes[index_name] = indexes.get(index_name, ()) + (column_name,)
+    return indexes
+
+def _columns(cursor) -> Dict[str, Tuple]:
+    """devices テーブルの列ごとの (日時の精度, NULLを許可するか) を返す"""
+    cursor.execute(
+        "SELECT COLUMN_NAME, DATETIME_PRECISION, IS_NULLABLE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'devices'"
+    )
+    return {name: (precision, nullable == 'YES') for name, precision, nullable in cursor.fetchall()}
+
+def add_name_search(connection, cursor) -> List[str]:
+    """検索用の name_search 列を追加し、既存の行を埋めてから NOT NULL にする
+
+    列はまずNULLを許可して追加し（既存の行を書き換えない）、normalize_text(name) で
+    BACKFILL_BATCH_SIZE 行ずつ埋めてコミットする。途中で中断しても、再実行すると残りの行から再開する
+    """
+    applied = []
+    columns = _columns(cursor)
+    if 'name_search' not in columns:
+        cursor.execute(
+            "ALTER TABLE devices ADD COLUMN name_search VARCHAR(255) NULL "
+            "COMMENT '検索用に正規化した機器名' AFTER manufacturer"
+        )
+        applied.append("列 name_search を追加")
+    elif not columns['name_search'][1]:
+        return applied
+
+    filled = 0
+    last_id = ''
+    while True:
+        cursor.execute(
+            "SELECT id, name FROM devices WHERE name_search IS NULL AND id > %s ORDER BY id LIMIT %s",
+            (last_id, BACKFILL_BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "UPDATE devices SET name_search = %s WHERE id = %s",
+            [(normalize_text(name), device_id) for device_id, name in rows]
+        )
+        connection.commit()
+        filled += len(rows)
+        last_id = rows[-1][0]
+        logger.info("name_search を埋めています: %s行", filled)
+    if filled:
+        applied.append(f"列 name_search の既存の{filled}行を埋める")
+
+    # 埋めている間に古いコードが name_search なしで書き込んだ行があれば失敗するため、その場合は再実行する
+    cursor.execute(
+        "ALTER TABLE devices MODIFY COLUMN name_search VARCHAR(255) NOT NULL COMMENT '検索用に正規化した機器名'"
+    )
+    applied.append("列 name_search を NOT NULL に変更")
+    return applied
+
+def add_missing_indexes(connection, cursor) -> List[str]:
+    """INDEXES のうち未作成のインデックスを作成する"""
+    existing = set(_index_columns(cursor).values())
+    applied = []
+    for name, columns, statement in INDEXES:
+        if columns in existing:
+            continue
+        cursor.execute(statement.format(name=name, columns=', '.join(columns)))
+        applied.append(f"インデックス {name} を作成")
+    return applied
+
+# 秒未満まで保存する日時の列（列, 定義）
+TIMESTAMP_COLUMNS = (
+    ('created_at', "TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) COMMENT 'レコード作成日時'"),
+    ('updated_at', "TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6) COMMENT 'レコード更新日時'"),
+)
+
+def widen_timestamps(connection, cursor) -> List[str]:
+    """秒精度の日時の列をマイクロ秒精度（TIMESTAMP(6)）に変更する
+
+    秒精度のままでは同じ秒の中の更新で updated_at が変わらず、ETagが古い内容に一致してしまう。
+    列の型の変更はテーブルを作り直す（実行中は書き込みがブロックされる）ため、書き込みの少ない時間帯に実行する
+    """
+    existing = _columns(cursor)
+    columns = [
+        (name, definition) for name, definition in TIMESTAMP_COLUMNS
+        if (existing.get(name, (None, True))[0] or 0) < 6
+    ]
+    if not columns:
+        return []
+    cursor.execute(
+        "ALTER TABLE devices "
+        + ", ".join(f"MODIFY COLUMN {name} {definition}" for name, definition in columns)
+    )
+    return [f"列 {name} をマイクロ秒精度に変更" for name, _ in columns]
+
+# 順に実行するマイグレーションの手順（各手順は適用済みの変更を確認し、未適用の変更だけを行う）
+STEPS = (
+    add_name_search,
+    widen_timestamps,
+    add_missing_indexes,
+)
+
+def migrate(connection) -> List[str]:
+    """既存の devices テーブルを現在のスキーマに合わせ、適用した変更の一覧を返す
+
+    CREATE TABLE IF NOT EXISTS は既存のテーブルを変更しないため、後から追加した列・インデックスは
+    ここで追加する。DDLは暗黙にコミットされるが、各手順は何度実行しても同じ結果になるため、
+    途中で失敗した場合もそのまま再実行できる
+    """
+    cursor = connection.cursor()
+    applied = []
+    try:
+        for step in STEPS:
+            for change in step(connection, cursor):
+                logger.info("マイグレーションを適用しました: %s", change)
+                applied.append(change)
+    finally:
+        cursor.close()
+    if not applied:
+        logger.info("devicesテーブルは最新のスキーマです")
+    return applied
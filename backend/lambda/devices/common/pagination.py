@@ -0,0 +1,97 @@
+import os
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
+from .exceptions import ValidationError
+
+# ページサイズの設定
+DEFAULT_PAGE_SIZE = int(os.getenv('DEVICE_LIST_DEFAULT_LIMIT', '100'))
+MAX_PAGE_SIZE = int(os.getenv('DEVICE_LIST_MAX_LIMIT', '1000'))
+
+# 次ページのカーソルを返すレスポンスヘッダー
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+# 一覧の絞り込みに使えるフィールド（完全一致、RDSはインデックス、DynamoDBはGSIで検索する）
+FILTER_FIELDS = ('name', 'manufacturer')
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """ページ位置を不透明なカーソル文字列にエンコードする
+
+    Args:
+        position: 次ページの開始位置（RDSは created_at と id、DynamoDBは LastEvaluatedKey）
+
+    Returns:
+        URLセーフなカーソル文字列
+    """
+    raw = json.dumps(position, default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """カーソル文字列をページ位置にデコードする
+
+    Raises:
+        ValidationError: カーソルの形式が不正な場合
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise ValidationError("無効なカーソル", {"cursor": cursor})
+    if not isinstance(position, dict):
+        raise ValidationError("無効なカーソル", {"cursor": cursor})
+    return position
+
+def encode_keyset_cursor(created_at: Union[datetime, str], device_id: str) -> str:
+    """(created_at, id) のキーセット位置をカーソルにエンコードする"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    return encode_cursor({'created_at': created_at, 'id': device_id})
+
+def decode_keyset_cursor(cursor: str) -> Tuple[datetime, str]:
+    """カーソルから (created_at, id) のキーセット位置を取り出す
+
+    Raises:
+        ValidationError: カーソルの形式が不正な場合
+    """
+    position = decode_cursor(cursor)
+    try:
+        return datetime.fromisoformat(position['created_at']), str(position['id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError("無効なカーソル", {"cursor": cursor})
+
+def normalize_limit(limit: Optional[Any]) -> int:
+    """ページサイズを検証して返す（未指定の場合はデフォルト値）
+
+    Raises:
+        ValidationError: 数値でない、または範囲外の場合
+    """
+    if limit is None or limit == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        value = int(limit)
+    except (TypeError, ValueError):
+        raise ValidationError("無効なlimit", {"limit": limit})
+    if value < 1 or value > MAX_PAGE_SIZE:
+        raise ValidationError(
+            f"limitは1から{MAX_PAGE_SIZE}の範囲で指定してください",
+            {"limit": limit}
+        )
+    return value
+
+def normalize_filters(params: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """クエリパラメータから一覧の絞り込み条件（name, manufacturer）を取り出す
+
+    Raises:
+        ValidationError: 空文字が指定された場合
+    """
+    filters = {}
+    for field in FILTER_FIELDS:
+        value = (params or {}).get(field)
+        if value is None:
+            continue
+        if value == '':
+            raise ValidationError(f"{field}に空文字は指定できません", {field: value})
+        filters[field] = value
+    return filters
@@ -0,0 +1,174 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+from boto3.dynamodb.types import TypeDeserializer
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# 並列スキャンのセグメント数（TotalSegments）と、1ページあたりの最大件数
+SCAN_SEGMENTS = int(os.getenv('DYNAMODB_SCAN_SEGMENTS', '4'))
+SCAN_PAGE_SIZE = int(os.getenv('DYNAMODB_SCAN_PAGE_SIZE', '500'))
+
+# スキャンで消費してよい読み込み容量（RCU/秒）。0以下の場合は制限しない
+SCAN_MAX_RCU = float(os.getenv('DYNAMODB_SCAN_MAX_RCU', '0'))
+
+# 読み込んだページを受け渡すキューの長さ（セグメントあたり）。消費側が遅い場合はスキャンを待たせる
+_PAGES_PER_SEGMENT = 2
+
+class CapacityLimiter:
+    """消費した読み込み容量（ConsumedCapacity）を1秒あたりの上限に抑えるトークンバケット
+
+    各セグメントのスレッドで共有し、残りが負の間は次のページの読み込みを待たせる
+    """
+
+    def __init__(self, units_per_second: float):
+        self.units_per_second = units_per_second
+        self._tokens = units_per_second
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.units_per_second,
+            self._tokens + (now - self._updated_at) * self.units_per_second
+        )
+        self._updated_at = now
+
+    def wait(self) -> None:
+        """容量が残るまで待つ"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens > 0:
+                    return
+                delay = -self._tokens / self.units_per_second
+            time.sleep(delay)
+
+    def consume(self, units: float) -> None:
+        """消費した容量を差し引く"""
+        with self._lock:
+            self._refill()
+            self._tokens -= units
+
+class ParallelScanner:
+    """DynamoDBテーブル全体を Segment / TotalSegments に分割して並列にスキャンするクラス
+
+    - セグメントごとにスレッドを割り当て、LastEvaluatedKey を辿って最後のページまで読み込む
+    - 読み込んだページはキューを通して逐次返す（全件をメモリに展開しない）
+    - max_rcu を指定すると、全セグメント合計の読み込み容量をその値（RCU/秒）以下に抑える
+
+    boto3のリソースはスレッドセーフでないため、スレッドからは低レベルクライアントを使用する
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        table_name: str,
+        segments: Optional[int] = None,
+        page_size: Optional[int] = None,
+        max_rcu: Optional[float] = None
+    ):
+        self.client = client
+        self.table_name = table_name
+        self.segments = max(1, segments if segments is not None else SCAN_SEGMENTS)
+        self.page_size = page_size if page_size is not None else SCAN_PAGE_SIZE
+        max_rcu = max_rcu if max_rcu is not None else SCAN_MAX_RCU
+        self.limiter = CapacityLimiter(max_rcu) if max_rcu > 0 else None
+
+    def iter_items(self, page_size: Optional[int] = None, **scan_kwargs: Any) -> Iterator[Dict]:
+        """全セグメントの項目を読み込んだ順に逐次返す（順序は保証しない）
+
+        page_size は1ページあたりの最大件数（省略時は生成時の値）
+        scan_kwargs は低レベルクライアントの Scan にそのまま渡す（FilterExpression 等）
+        途中で反復をやめた場合は、各セグメントのスキャンも次のページの読み込み前に停止する
+        """
+        pages: 'queue.Queue' = queue.Queue(maxsize=self.segments * _PAGES_PER_SEGMENT)
+        stop = threading.Event()
+        deserializer = TypeDeserializer()
+        count = 0
+
+        with ThreadPoolExecutor(max_workers=self.segments) as executor:
+            futures = [
+                executor.submit(
+                    self._scan_segment, segment, page_size or self.page_size, scan_kwargs, pages, stop
+                )
+                for segment in range(self.segments)
+            ]
+            try:
+                remaining = self.segments
+                while remaining:
+                    page = pages.get()
+                    if page is None:
+                        # セグメントの終了（例外で終了した場合は result() で送出する）
+                        remaining -= 1
+                        continue
+                    for item in page:
+                        yield {key: deserializer.deserialize(value) for key, value in item.items()}
+                    count += len(page)
+                for future in futures:
+                    future.result()
+            finally:
+                stop.set()
+                # 待機中のスレッドを解放するため、キューに残ったページを捨てる
+                while any(not future.done() for future in futures):
+                    try:
+                        pages.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+        logger.info("テーブルを並列スキャンしました: %s件（%sセグメント）", count, self.segments)
+
+    def scan_all(self, **scan_kwargs: Any) -> List[Dict]:
+        """全セグメントの項目をまとめて返す"""
+        return list(self.iter_items(**scan_kwargs))
+
+    def _scan_segment(
+        self,
+        segment: int,
+        page_size: int,
+        scan_kwargs: Dict[str, Any],
+        pages: 'queue.Queue',
+        stop: threading.Event
+    ) -> None:
+        """1つのセグメントを LastEvaluatedKey を辿りながら最後までスキャンし、ページをキューに渡す"""
+        request = dict(
+            scan_kwargs,
+            TableName=self.table_name,
+            Segment=segment,
+            TotalSegments=self.segments,
+            Limit=page_size
+        )
+        if self.limiter is not None:
+            request['ReturnConsumedCapacity'] = 'TOTAL'
+        try:
+            while not stop.is_set():
+                if self.limiter is not None:
+                    self.limiter.wait()
+                response = self.client.scan(**request)
+                if self.limiter is not None:
+                    self.limiter.consume(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+                self._put(pages, response.get('Items', []), stop)
+                last_key = response.get('LastEvaluatedKey')
+                if not last_key:
+                    break
+                request['ExclusiveStartKey'] = last_key
+        except Exception as e:
+            logger.error("セグメント %s のスキャンエラー: %s", segment, e)
+            raise
+        finally:
+            self._put(pages, None, stop)
+
+    @staticmethod
+    def _put(pages: 'queue.Queue', page: Optional[List[Dict]], stop: threading.Event) -> None:
+        # 消費側が反復をやめた場合に待ち続けないよう、停止を確認しながら渡す
+        while not stop.is_set():
+            try:
+                pages.put(page, timeout=0.1)
+                return
+            except queue.Full:
+                continue
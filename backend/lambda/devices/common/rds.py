@@ -1,160 +1,508 @@
 import os
 import uuid
-import logging
-from typing import Dict, List, Optional
-from datetime import datetime
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import mysql.connector
-from dotenv import load_dotenv
 from .db_interface import DatabaseInterface
-
-# 環境変数の読み込み
-load_dotenv()
+from .db_pool import DatabaseConnectionPool, rds_db_config
+from .db_health import retry_on_disconnect
+from .statement_cache import CachedStatementCursor, PreparedStatements
+from .settings import get_settings
+from .pagination import FILTER_FIELDS, encode_keyset_cursor, decode_keyset_cursor
+from .batch import delete_result, lookup_result
+from .search import NGRAM_SIZE, normalize_text
+from .fields import column_list, with_fields, project
+from .etag import page_version
+from .timing import stage
+from .clock import utc_now, to_utc
+from .logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = setup_logger(__name__)
+
+# APIで返すデバイスの列（検索用の name_search は返さない）
+DEVICE_COLUMNS = column_list(None)
+
+# 一括作成時に1回の INSERT にまとめる最大行数（max_allowed_packet を超えないようにする）
+BATCH_INSERT_CHUNK_SIZE = int(os.getenv('DB_BATCH_INSERT_CHUNK_SIZE', '500'))
+
+# 一括取得時に1回の IN 句に含める最大ID数
+BATCH_SELECT_CHUNK_SIZE = int(os.getenv('DB_BATCH_SELECT_CHUNK_SIZE', '500'))
+
+# UPDATE文で更新する列（この順で組み立て、準備済みの文の種類を増やさない）
+UPDATE_COLUMNS = ('name', 'name_search', 'manufacturer')
+
+def _padded_ids(device_ids: List[str]) -> List[str]:
+    """IN 句のID数を2のべき乗に揃える（末尾のIDを繰り返す。準備済みの文を件数ごとに作らないため）"""
+    size = 1 << (len(device_ids) - 1).bit_length()
+    return device_ids + [device_ids[-1]] * (size - len(device_ids))
+
+# デバイスを作成する INSERT 文（create_device / create_devices で共通）
+INSERT_QUERY = """
+    INSERT INTO devices (id, name, manufacturer, name_search, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+# 行の内容が原因のエラー（重複したID、列の長さの超過など）。MySQLはその文だけを取り消し、トランザクションは続行できる
+ROW_ERRORS = (mysql.connector.IntegrityError, mysql.connector.DataError)
+
+def _insert_params(row: Dict) -> Tuple:
+    """INSERT_QUERY のパラメータ"""
+    return (
+        row['id'], row['name'], row['manufacturer'], normalize_text(row['name']),
+        row['created_at'], row['updated_at']
+    )
 
 class RDSInterface(DatabaseInterface):
-    """RDS（MySQL）インターフェースの実装クラス"""
-    
+    """RDS（MySQL）インターフェースの実装クラス
+
+    接続は DatabaseConnectionPool から操作ごとに貸し出し・返却する。
+    形が決まった文はサーバーサイドのプリペアドステートメントとして接続ごとにキャッシュする
+    """
+
     def __init__(self):
-        """データベース接続の初期化"""
+        """接続プールの初期化"""
+        settings = get_settings()
+        self.pool = DatabaseConnectionPool(rds_db_config())
+        self.health = self.pool.health
+        self.statements = PreparedStatements()
         try:
-            self.connection = mysql.connector.connect(
-                host=os.getenv('RDS_HOST'),
-                user=os.getenv('RDS_USER'),
-                password=os.getenv('RDS_PASSWORD'),
-                database=os.getenv('RDS_DATABASE'),
-                port=int(os.getenv('RDS_PORT', '3306'))
-            )
-            self.connection.autocommit = True
-            logger.info(f"RDSデータベース {os.getenv('RDS_DATABASE')} に接続しました")
+            self.pool.warm_up()
+            logger.info("RDSデータベース %s に接続しました", settings.rds_database)
         except mysql.connector.Error as e:
-            logger.error(f"データベース接続エラー: {str(e)}")
+            logger.error("データベース接続エラー: %s", e)
             raise
 
-    def _get_cursor(self):
-        """カーソルを取得し、必要に応じて再接続する"""
+    @contextmanager
+    def _get_cursor(self, transaction: bool = False, prepared: bool = False, **kwargs) -> Iterator:
+        """プールから接続を借りてカーソルを返し、ブロックを抜けたら接続を返却する
+
+        transaction=True の場合はブロック全体を1トランザクションで実行し、正常終了時にコミットする
+        （例外時は返却時にロールバックされる）
+        文ごとの ping は行わない（死活確認はプールが長くアイドルだった接続に対してだけ行い、
+        切断エラーは retry_on_disconnect で再実行する）
+        prepared=True の場合は、接続ごとにキャッシュした準備済みの文で実行するカーソルを返す
+        （DB_STATEMENT_CACHE_SIZE=0 の場合は通常のカーソル）
+        """
+        with stage('db_acquire'):
+            connection = self.pool.get_connection()
+        cursor = None
         try:
-            self.connection.ping(reconnect=True, attempts=3, delay=5)
-            return self.connection.cursor(dictionary=True)
-        except mysql.connector.Error as e:
-            logger.error(f"データベース接続エラー: {str(e)}")
+            if prepared and self.statements.enabled:
+                cursor = CachedStatementCursor(self.statements, connection.raw_connection)
+            else:
+                cursor = connection.cursor(dictionary=True, **kwargs)
+            with stage('db'):
+                if transaction:
+                    connection.start_transaction()
+                yield cursor
+                if transaction:
+                    connection.commit()
+        except (mysql.connector.OperationalError, mysql.connector.InterfaceError) as e:
+            # 接続が切れている場合はプールに戻さず破棄する
+            connection.invalidate()
+            logger.error("データベース接続エラー: %s", e)
             raise
+        finally:
+            if cursor is not None:
+                # 途中で打ち切られた場合は未読の結果を読み捨ててから閉じる
+                if connection.unread_result:
+                    connection.consume_results()
+                cursor.close()
+            connection.close()
 
+    @retry_on_disconnect(idempotent=False)
     def create_device(self, device_data: Dict) -> Dict:
-        """デバイスを作成する"""
-        cursor = self._get_cursor()
+        """デバイスを作成する（INSERT 1回で完了し、作成したレコードは手元の値から組み立てる）"""
+        device = {
+            'id': device_data.get('id') or str(uuid.uuid4()),
+            'name': device_data['name'],
+            'manufacturer': device_data['manufacturer'],
+            'created_at': utc_now(),
+        }
+        device['updated_at'] = device['created_at']
         try:
-            device_id = str(uuid.uuid4())
-            now = datetime.utcnow()
-            
-            query = """
-                INSERT INTO devices (id, name, manufacturer, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, (
-                device_id,
-                device_data['name'],
-                device_data['manufacturer'],
-                now,
-                now
-            ))
-            self.connection.commit()
-            
-            # 作成したデバイスを取得して返す
-            return self.get_device(device_id)
+            with self._get_cursor(prepared=True) as cursor:
+                cursor.execute(INSERT_QUERY, _insert_params(device))
+            logger.info("デバイスを作成しました: %s", device['id'])
+            return device
         except mysql.connector.Error as e:
-            logger.error(f"デバイス作成エラー: {str(e)}")
+            logger.error("デバイス作成エラー: %s", e)
             raise
-        finally:
-            cursor.close()
 
-    def get_device(self, device_id: str) -> Optional[Dict]:
-        """デバイスを取得する"""
-        cursor = self._get_cursor()
+    def create_devices(self, devices: List[Dict]) -> List[Dict]:
+        """複数のデバイスを1トランザクションで一括作成する
+
+        mysql-connector の executemany は INSERT を複数行の VALUES にまとめて送信するため、
+        BATCH_INSERT_CHUNK_SIZE 件ごとに1往復で書き込める。
+        重複したIDなど一部の行が原因で失敗した場合は全件がロールバックされるため、
+        1行ずつ登録し直して、原因の行だけを失敗として返す
+        """
+        now = utc_now()
+        rows = []
+        for device_data in devices:
+            # 移行元の日時が指定されていればそのまま保存する（未指定の場合は現在時刻）
+            created_at = to_utc(device_data.get('created_at'), now)
+            rows.append({
+                'id': device_data['id'],
+                'name': device_data['name'],
+                'manufacturer': device_data['manufacturer'],
+                'created_at': created_at,
+                'updated_at': to_utc(device_data.get('updated_at'), created_at)
+            })
         try:
-            query = "SELECT * FROM devices WHERE id = %s"
-            cursor.execute(query, (device_id,))
-            device = cursor.fetchone()
+            with self._get_cursor(transaction=True) as cursor:
+                for start in range(0, len(rows), BATCH_INSERT_CHUNK_SIZE):
+                    chunk = rows[start:start + BATCH_INSERT_CHUNK_SIZE]
+                    cursor.executemany(INSERT_QUERY, [_insert_params(row) for row in chunk])
+        except ROW_ERRORS as e:
+            logger.warning("デバイス一括作成エラー（1件ずつ登録し直します）: %s", e)
+            return self._create_rows(rows)
+        except mysql.connector.Error as e:
+            # 接続エラー等は1件ずつ登録しても同じため、全件を失敗とする
+            logger.error("デバイス一括作成エラー: %s", e)
+            return [{'success': False, 'error': str(e)} for _ in rows]
+
+        logger.info("デバイスを一括作成しました: %s件", len(rows))
+        return [{'success': True, 'device': row} for row in rows]
+
+    def _create_rows(self, rows: List[Dict]) -> List[Dict]:
+        """1行ずつ INSERT し、失敗した行だけを失敗として返す
+
+        行の内容が原因のエラー（ROW_ERRORS）はその文だけが取り消されるため、
+        全行を1トランザクションで実行して最後にまとめてコミットする
+        """
+        errors = {}
+        try:
+            with self._get_cursor(transaction=True) as cursor:
+                for index, row in enumerate(rows):
+                    try:
+                        cursor.execute(INSERT_QUERY, _insert_params(row))
+                    except ROW_ERRORS as e:
+                        errors[index] = str(e)
+        except mysql.connector.Error as e:
+            logger.error("デバイス一括作成エラー: %s", e)
+            return [{'success': False, 'error': str(e)} for _ in rows]
+
+        logger.info("デバイスを一括作成しました: %s件（失敗 %s件）", len(rows) - len(errors), len(errors))
+        return [
+            {'success': False, 'error': errors[index]} if index in errors else {'success': True, 'device': row}
+            for index, row in enumerate(rows)
+        ]
+
+    @retry_on_disconnect()
+    def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスを取得する（fields 指定時はその列だけを読み込む）"""
+        try:
+            with self._get_cursor(prepared=True) as cursor:
+                query = f"SELECT {column_list(fields)} FROM devices WHERE id = %s"
+                cursor.execute(query, (device_id,))
+                device = cursor.fetchone()
             if device:
-                logger.info(f"デバイスを取得しました: {device_id}")
+                logger.info("デバイスを取得しました: %s", device_id)
             else:
-                logger.info(f"デバイスが見つかりません: {device_id}")
+                logger.info("デバイスが見つかりません: %s", device_id)
             return device
         except mysql.connector.Error as e:
-            logger.error(f"デバイス取得エラー: {str(e)}")
+            logger.error("デバイス取得エラー: %s", e)
             raise
-        finally:
-            cursor.close()
 
+    @retry_on_disconnect()
+    def get_devices(self, device_ids: List[str], fields: Optional[List[str]] = None) -> Dict:
+        """指定された複数のIDのデバイスを WHERE id IN (...) でまとめて取得する
+
+        BATCH_SELECT_CHUNK_SIZE 件ごとに1回のクエリを、同じ接続で順に実行する。
+        IN 句のID数は2のべき乗に揃え、準備済みの文の種類を抑える（重複したIDは結果に影響しない）
+        """
+        columns = column_list(fields)
+        found = {}
+        try:
+            with self._get_cursor(prepared=True) as cursor:
+                for start in range(0, len(device_ids), BATCH_SELECT_CHUNK_SIZE):
+                    chunk = _padded_ids(device_ids[start:start + BATCH_SELECT_CHUNK_SIZE])
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    cursor.execute(f"SELECT {columns} FROM devices WHERE id IN ({placeholders})", chunk)
+                    for device in cursor.fetchall():
+                        found[device['id']] = device
+        except mysql.connector.Error as e:
+            logger.error("デバイス一括取得エラー: %s", e)
+            raise
+
+        logger.info("デバイスを一括取得しました: %s件（該当なし %s件）", len(found), len(device_ids) - len(found))
+        return lookup_result(device_ids, found)
+
+    @retry_on_disconnect(idempotent=False)
     def update_device(self, device_id: str, update_data: Dict) -> Optional[Dict]:
-        """デバイスを更新する"""
-        cursor = self._get_cursor()
+        """デバイスを更新し、更新後のデバイスを返す
+
+        UPDATE と更新後の行の SELECT を同じ接続の1トランザクションで実行する。
+        UPDATE で行ロックを取るため、SELECT は他の書き込みに変更される前の自分の更新結果を読む。
+        一致する行がない場合（rowcount は FOUND_ROWS で一致した行数）は SELECT を省略する
+
+        Returns:
+            更新後のデバイス（デバイスが存在しない場合はNone）
+        """
+        # 更新可能なフィールドを指定
+        allowed_fields = ['name', 'manufacturer']
+        update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
+
+        if not update_fields:
+            logger.warning("更新可能なフィールドがありません: %s", device_id)
+            return None
+
+        # UPDATE文の構築（名前を変更する場合は検索用の列も更新する）
+        # 列は UPDATE_COLUMNS の順に並べ、文の形を指定された列の組み合わせ（3種類）に限る
+        values = dict(update_fields)
+        if 'name' in values:
+            values['name_search'] = normalize_text(values['name'])
+        columns = {field: values[field] for field in UPDATE_COLUMNS if field in values}
+        set_clause = ", ".join([f"{field} = %s" for field in columns.keys()])
+        query = f"UPDATE devices SET {set_clause}, updated_at = %s WHERE id = %s"
+
+        # パラメータの準備
+        params = list(columns.values()) + [utc_now(), device_id]
+
+        device = None
         try:
-            # 更新可能なフィールドを指定
-            allowed_fields = ['name', 'manufacturer']
-            update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
-            
-            if not update_fields:
-                logger.warning(f"更新可能なフィールドがありません: {device_id}")
-                return None
-            
-            # UPDATE文の構築
-            set_clause = ", ".join([f"{field} = %s" for field in update_fields.keys()])
-            query = f"UPDATE devices SET {set_clause}, updated_at = %s WHERE id = %s"
-            
-            # パラメータの準備
-            params = list(update_fields.values()) + [datetime.utcnow(), device_id]
-            
-            # 更新の実行
-            cursor.execute(query, params)
-            self.connection.commit()
-            
-            # 更新後のデータを取得して返す
-            return self.get_device(device_id)
+            with self._get_cursor(transaction=True, prepared=True) as cursor:
+                cursor.execute(query, params)
+                if cursor.rowcount > 0:
+                    cursor.execute(f"SELECT {DEVICE_COLUMNS} FROM devices WHERE id = %s", (device_id,))
+                    device = cursor.fetchone()
         except mysql.connector.Error as e:
-            logger.error(f"デバイス更新エラー: {str(e)}")
+            logger.error("デバイス更新エラー: %s", e)
             raise
-        finally:
-            cursor.close()
 
+        if device is None:
+            logger.info("更新対象のデバイスが見つかりません: %s", device_id)
+            return None
+        logger.info("デバイスを更新しました: %s", device_id)
+        return device
+
+    @retry_on_disconnect(idempotent=False)
     def delete_device(self, device_id: str) -> bool:
         """デバイスを削除する"""
-        cursor = self._get_cursor()
         try:
-            query = "DELETE FROM devices WHERE id = %s"
-            cursor.execute(query, (device_id,))
-            self.connection.commit()
-            deleted = cursor.rowcount > 0
+            with self._get_cursor(prepared=True) as cursor:
+                query = "DELETE FROM devices WHERE id = %s"
+                cursor.execute(query, (device_id,))
+                deleted = cursor.rowcount > 0
             if deleted:
-                logger.info(f"デバイスを削除しました: {device_id}")
+                logger.info("デバイスを削除しました: %s", device_id)
             else:
-                logger.info(f"削除対象のデバイスが見つかりません: {device_id}")
+                logger.info("削除対象のデバイスが見つかりません: %s", device_id)
             return deleted
         except mysql.connector.Error as e:
-            logger.error(f"デバイス削除エラー: {str(e)}")
+            logger.error("デバイス削除エラー: %s", e)
             raise
-        finally:
-            cursor.close()
 
+    @retry_on_disconnect(idempotent=False)
+    def delete_devices(self, device_ids: Optional[List[str]] = None, manufacturer: Optional[str] = None) -> Dict:
+        """複数のデバイスを1トランザクションでまとめて削除する
+
+        IDを指定した場合は BATCH_SELECT_CHUNK_SIZE 件ごとに、存在するIDを SELECT ... FOR UPDATE で
+        確認してから DELETE ... WHERE id IN (...) で削除する（チャンクごとに2往復）。
+        メーカーを指定した場合は対象のIDを FOR UPDATE で読み込み、DELETE 1回で削除する
+        """
+        deleted = []
+        try:
+            with self._get_cursor(transaction=True) as cursor:
+                if manufacturer is not None:
+                    cursor.execute("SELECT id FROM devices WHERE manufacturer = %s FOR UPDATE", (manufacturer,))
+                    deleted = [row['id'] for row in cursor.fetchall()]
+                    if deleted:
+                        cursor.execute("DELETE FROM devices WHERE manufacturer = %s", (manufacturer,))
+                    device_ids = deleted
+                else:
+                    for start in range(0, len(device_ids), BATCH_SELECT_CHUNK_SIZE):
+                        chunk = device_ids[start:start + BATCH_SELECT_CHUNK_SIZE]
+                        placeholders = ", ".join(["%s"] * len(chunk))
+                        cursor.execute(f"SELECT id FROM devices WHERE id IN ({placeholders}) FOR UPDATE", chunk)
+                        found = [row['id'] for row in cursor.fetchall()]
+                        if found:
+                            cursor.execute(
+                                f"DELETE FROM devices WHERE id IN ({', '.join(['%s'] * len(found))})", found
+                            )
+                            deleted.extend(found)
+        except mysql.connector.Error as e:
+            logger.error("デバイス一括削除エラー: %s", e)
+            raise
+
+        logger.info("デバイスを一括削除しました: %s件（該当なし %s件）", len(deleted), len(device_ids) - len(deleted))
+        return delete_result(device_ids, deleted)
+
+    @retry_on_disconnect()
     def list_devices(self) -> List[Dict]:
         """全デバイスを取得する"""
-        cursor = self._get_cursor()
         try:
-            query = "SELECT * FROM devices"
-            cursor.execute(query)
-            devices = cursor.fetchall()
-            logger.info(f"デバイス一覧を取得しました: {len(devices)}件")
+            with self._get_cursor(prepared=True) as cursor:
+                query = f"SELECT {DEVICE_COLUMNS} FROM devices"
+                cursor.execute(query)
+                devices = cursor.fetchall()
+            logger.info("デバイス一覧を取得しました: %s件", len(devices))
             return devices
         except mysql.connector.Error as e:
-            logger.error(f"デバイス一覧取得エラー: {str(e)}")
+            logger.error("デバイス一覧取得エラー: %s", e)
             raise
-        finally:
-            cursor.close()
 
-    def __del__(self):
-        """デストラクタ：接続のクリーンアップ"""
-        if hasattr(self, 'connection') and self.connection.is_connected():
-            self.connection.close()
-            logger.info("データベース接続を閉じました") 
\ No newline at end of file
+    @staticmethod
+    def _filter_conditions(filters: Optional[Dict[str, str]]) -> Tuple[List[str], List[Any]]:
+        """絞り込み条件をWHERE句の条件とパラメータに変換する（name / manufacturer はインデックスを使用）"""
+        conditions = []
+        params = []
+        for field in FILTER_FIELDS:
+            if filters and filters.get(field) is not None:
+                conditions.append(f"{field} = %s")
+                params.append(filters[field])
+        return conditions, params
+
+    def _page_query(
+        self, columns: str, limit: int, cursor: Optional[str], filters: Optional[Dict[str, str]]
+    ) -> Tuple[str, List]:
+        """1ページ分（次ページの有無の判定用に1件多く）読み込むSELECT文とパラメータを作る"""
+        conditions, params = self._filter_conditions(filters)
+        if cursor:
+            created_at, last_id = decode_keyset_cursor(cursor)
+            conditions.append("(created_at > %s OR (created_at = %s AND id > %s))")
+            params.extend([created_at, created_at, last_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit + 1)
+        return f"SELECT {columns} FROM devices {where} ORDER BY created_at, id LIMIT %s", params
+
+    @retry_on_disconnect()
+    def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """デバイスを1ページ分取得する（(created_at, id) によるキーセットページネーション）
+
+        fields 指定時は、その列とカーソル・ページのバージョンの作成に必要な列だけを読み込む
+        """
+        query, params = self._page_query(
+            column_list(with_fields(fields, 'created_at', 'updated_at')), limit, cursor, filters
+        )
+
+        try:
+            # 次ページの有無を判定するため1件多く取得する
+            with self._get_cursor(prepared=True) as db_cursor:
+                db_cursor.execute(query, params)
+                devices = db_cursor.fetchall()
+        except mysql.connector.Error as e:
+            logger.error("デバイス一覧取得エラー: %s", e)
+            raise
+
+        next_cursor = None
+        has_more = len(devices) > limit
+        if has_more:
+            devices = devices[:limit]
+            next_cursor = encode_keyset_cursor(devices[-1]['created_at'], devices[-1]['id'])
+        logger.info("デバイス一覧を取得しました: %s件", len(devices))
+        return {
+            'items': [project(device, fields) for device in devices],
+            'next_cursor': next_cursor,
+            'version': page_version(devices, has_more)
+        }
+
+    @retry_on_disconnect()
+    def search_devices(self, query: str, limit: int, fuzzy: bool = False) -> List[Dict]:
+        """名前の部分一致でデバイスを検索する（ngramパーサーの全文インデックスを使用）
+
+        正規化した検索語をフレーズとして BOOLEAN MODE で検索し、名前の短い順に返す。
+        ngramの長さに満たない1文字の検索は全文インデックスを使えないため LIKE で検索する
+        """
+        normalized = normalize_text(query).replace('"', '')
+        if len(normalized) >= NGRAM_SIZE:
+            condition = "MATCH(name_search) AGAINST (%s IN BOOLEAN MODE)"
+            param = f'"{normalized}"'
+        else:
+            condition = "name_search LIKE %s"
+            param = f"%{normalized}%"
+
+        try:
+            with self._get_cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {DEVICE_COLUMNS} FROM devices WHERE {condition} "
+                    "ORDER BY CHAR_LENGTH(name_search), name_search LIMIT %s",
+                    (param, limit)
+                )
+                devices = cursor.fetchall()
+
+                if fuzzy and len(devices) < limit and len(normalized) >= NGRAM_SIZE:
+                    # 部分一致が足りない場合は、n-gramの一致度（NATURAL LANGUAGE MODE）の高い順に補う
+                    found = [device['id'] for device in devices]
+                    exclude = f"AND id NOT IN ({', '.join(['%s'] * len(found))})" if found else ""
+                    cursor.execute(
+                        f"SELECT {DEVICE_COLUMNS} FROM devices "
+                        f"WHERE MATCH(name_search) AGAINST (%s) {exclude} "
+                        "ORDER BY MATCH(name_search) AGAINST (%s) DESC LIMIT %s",
+                        [normalized, *found, normalized, limit - len(devices)]
+                    )
+                    devices.extend(cursor.fetchall())
+        except mysql.connector.Error as e:
+            logger.error("デバイス検索エラー: %s", e)
+            raise
+
+        logger.info("デバイスを検索しました: %s件", len(devices))
+        return devices
+
+    @retry_on_disconnect()
+    def get_collection_version(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """一覧と同じ条件で id, updated_at だけを読み込み、ページのバージョンを返す"""
+        query, params = self._page_query("id, updated_at", limit, cursor, filters)
+        try:
+            with self._get_cursor(prepared=True) as db_cursor:
+                db_cursor.execute(query, params)
+                rows = db_cursor.fetchall()
+        except mysql.connector.Error as e:
+            logger.error("デバイス一覧バージョン取得エラー: %s", e)
+            raise
+        return page_version(rows[:limit], len(rows) > limit)
+
+    def iter_devices(self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+        """全デバイスを非バッファカーソルで batch_size 件ずつ逐次返す
+
+        ストリーミングが終わるまで接続を1本占有する
+        """
+        conditions, params = self._filter_conditions(filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            with self._get_cursor(buffered=False) as cursor:
+                cursor.execute(f"SELECT {DEVICE_COLUMNS} FROM devices {where} ORDER BY created_at, id", params)
+                count = 0
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    count += len(rows)
+                    yield from rows
+            logger.info("デバイス一覧をストリーミングしました: %s件", count)
+        except mysql.connector.Error as e:
+            logger.error("デバイス一覧取得エラー: %s", e)
+            raise
+
+    def get_pool_stats(self) -> Dict:
+        """接続プールの利用状況（使用中・アイドル数、待ち時間、取得レイテンシのヒストグラム）と
+        プリペアドステートメントのキャッシュの状況（ヒット率、省略できた解析時間）を返す"""
+        stats = self.pool.get_stats()
+        stats['statement_cache'] = self.statements.get_stats()
+        return stats
+
+    def is_healthy(self) -> bool:
+        """プールの接続が生きているか確認する"""
+        with self.pool.connection() as connection:
+            healthy = connection.is_connected()
+            if not healthy:
+                connection.invalidate()
+            return healthy
+
+    def close(self) -> None:
+        """プール内の全ての接続を閉じる"""
+        self.pool.close_all_connections()
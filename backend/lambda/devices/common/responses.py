@@ -0,0 +1,12 @@
+from fastapi.responses import JSONResponse
+from .serialization import dumps
+
+class UnicodeJSONResponse(JSONResponse):
+    """日本語をエスケープしないコンパクトなJSONレスポンス
+
+    エンコードは common.serialization に委譲する（DEVICE_JSON_ENGINE で orjson 等に切り替えられる）。
+    datetime はそのまま渡せばISO 8601の文字列になる
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
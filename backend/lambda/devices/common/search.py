@@ -0,0 +1,182 @@
+import os
+import time
+import heapq
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set
+from .exceptions import ValidationError
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# n-gramの長さ（MySQLの ngram_token_size の既定値に合わせる）
+NGRAM_SIZE = 2
+
+# 検索結果の件数
+DEFAULT_SEARCH_LIMIT = int(os.getenv('DEVICE_SEARCH_DEFAULT_LIMIT', '20'))
+MAX_SEARCH_LIMIT = int(os.getenv('DEVICE_SEARCH_MAX_LIMIT', '100'))
+
+# 検索語の最大文字数
+MAX_QUERY_LENGTH = 100
+
+# あいまい検索で候補とする、検索語のn-gramのうち一致が必要な割合
+FUZZY_MIN_SCORE = float(os.getenv('DEVICE_SEARCH_FUZZY_MIN_SCORE', '0.5'))
+
+# カタカナ（ァ〜ヶ）をひらがなに変換するテーブル
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord('ァ'), ord('ヶ') + 1)}
+
+def normalize_text(text: str) -> str:
+    """検索用に文字列を正規化する
+
+    - NFKCで全角英数字・半角カナなどの幅の違いを統一する
+    - カタカナをひらがなに揃える
+    - 英字を小文字に揃え、空白を除去する
+    """
+    text = unicodedata.normalize('NFKC', text or '')
+    text = text.translate(_KATAKANA_TO_HIRAGANA).lower()
+    return ''.join(text.split())
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> Set[str]:
+    """正規化済みの文字列からn-gramの集合を作る（n文字未満の場合は文字列そのもの）"""
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def validate_search_query(query: Optional[str]) -> str:
+    """検索語を検証し、正規化して返す
+
+    Raises:
+        ValidationError: 空、または長すぎる場合
+    """
+    normalized = normalize_text(query or '')
+    if not normalized:
+        raise ValidationError("検索語を指定してください", {"field": "q"})
+    if len(normalized) > MAX_QUERY_LENGTH:
+        raise ValidationError(
+            f"検索語は{MAX_QUERY_LENGTH}文字以内で指定してください",
+            {"field": "q"}
+        )
+    return normalized
+
+def normalize_search_limit(limit: Optional[Any]) -> int:
+    """検索結果の件数を検証して返す（未指定の場合はデフォルト値）
+
+    Raises:
+        ValidationError: 数値でない、または範囲外の場合
+    """
+    if limit is None or limit == '':
+        return DEFAULT_SEARCH_LIMIT
+    try:
+        value = int(limit)
+    except (TypeError, ValueError):
+        raise ValidationError("無効なlimit", {"limit": limit})
+    if value < 1 or value > MAX_SEARCH_LIMIT:
+        raise ValidationError(
+            f"limitは1から{MAX_SEARCH_LIMIT}の範囲で指定してください",
+            {"limit": limit}
+        )
+    return value
+
+class NgramIndex:
+    """デバイス名のn-gram転置インデックス（プロセス内）
+
+    2-gramの転置リストの積集合で候補を絞り、正規化した名前で部分一致を確認する。
+    メモリを抑えるため1-gramは登録せず、1文字の検索は正規化済みの名前を走査する
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        self._devices: Dict[str, Dict] = {}
+        self._keys: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def build(self, devices: Iterable[Dict]) -> None:
+        """全デバイスからインデックスを作り直す"""
+        with self._lock:
+            self._postings.clear()
+            self._devices.clear()
+            self._keys.clear()
+            for device in devices:
+                self._add(device)
+            self.built_at = time.monotonic()
+        logger.info("検索インデックスを構築しました: %s件", len(self._devices))
+
+    def add(self, device: Dict) -> None:
+        """デバイスを登録する（登録済みの場合は置き換える）"""
+        with self._lock:
+            self._remove(device['id'])
+            self._add(device)
+
+    def remove(self, device_id: str) -> None:
+        """デバイスを削除する"""
+        with self._lock:
+            self._remove(device_id)
+
+    def update(self, device_id: str, fields: Dict) -> None:
+        """登録済みのデバイスの一部のフィールドを更新する"""
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is not None:
+                self.add(dict(device, **fields))
+
+    def _add(self, device: Dict) -> None:
+        key = normalize_text(device.get('name', ''))
+        self._devices[device['id']] = device
+        self._keys[device['id']] = key
+        for gram in ngrams(key):
+            self._postings.setdefault(gram, set()).add(device['id'])
+
+    def _remove(self, device_id: str) -> None:
+        key = self._keys.pop(device_id, None)
+        self._devices.pop(device_id, None)
+        if key is None:
+            return
+        for gram in ngrams(key):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(device_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def search(self, normalized_query: str, limit: int, fuzzy: bool = False) -> List[Dict]:
+        """正規化済みの検索語で検索する
+
+        部分一致するデバイスを名前の短い順（一致度の高い順）に返す。
+        fuzzy=True の場合、部分一致が limit 件に満たなければ、検索語のn-gramの一致率が
+        FUZZY_MIN_SCORE 以上のデバイスを一致率の高い順に補う
+        """
+        grams = ngrams(normalized_query)
+        with self._lock:
+            if len(normalized_query) < NGRAM_SIZE:
+                postings = []
+                exact_ids = self._keys
+            else:
+                postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+                exact_ids = set.intersection(*postings) if postings[0] else set()
+            exact = [
+                device_id for device_id in exact_ids
+                if normalized_query in self._keys[device_id]
+            ]
+            results = heapq.nsmallest(
+                limit, exact, key=lambda device_id: (len(self._keys[device_id]), self._keys[device_id])
+            )
+
+            if fuzzy and len(results) < limit and len(grams) > 1:
+                scores: Dict[str, int] = {}
+                for posting in postings:
+                    for device_id in posting:
+                        scores[device_id] = scores.get(device_id, 0) + 1
+                found = set(results)
+                candidates = [
+                    (count / len(grams), device_id) for device_id, count in scores.items()
+                    if device_id not in found and count / len(grams) >= FUZZY_MIN_SCORE
+                ]
+                candidates.sort(key=lambda candidate: (-candidate[0], len(self._keys[candidate[1]])))
+                results.extend(device_id for _, device_id in candidates[:limit - len(results)])
+
+            return [dict(self._devices[device_id]) for device_id in results]
@@ -0,0 +1,91 @@
+import os
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+from .timing import stage
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# レスポンスのJSONエンコードに使うエンジン（json / orjson / msgspec）
+JSON_ENGINE = os.getenv('DEVICE_JSON_ENGINE', 'json').lower()
+
+def _default(value: Any) -> Any:
+    """標準のJSONで表現できない値の変換（日時はISO 8601、DynamoDBの数値は int / float）"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+def _json_engine() -> Callable[[Any], bytes]:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+            default=_default
+        ).encode("utf-8")
+    return dumps
+
+def _orjson_engine() -> Callable[[Any], bytes]:
+    import orjson
+
+    def dumps(content: Any) -> bytes:
+        # datetime はネイティブにエンコードされる（isoformat と同じ形式）
+        return orjson.dumps(content, default=_default)
+    return dumps
+
+def _msgspec_engine() -> Callable[[Any], bytes]:
+    import msgspec
+    encoder = msgspec.json.Encoder(enc_hook=_default, decimal_format='number')
+    return encoder.encode
+
+# エンジン名 → エンコード関数を作る関数（register_engine で追加できる）
+_ENGINE_FACTORIES: Dict[str, Callable[[], Callable[[Any], bytes]]] = {
+    'json': _json_engine,
+    'orjson': _orjson_engine,
+    'msgspec': _msgspec_engine,
+}
+_encoders: Dict[str, Callable[[Any], bytes]] = {}
+
+def register_engine(name: str, factory: Callable[[], Callable[[Any], bytes]]) -> None:
+    """JSONエンコードのエンジンを登録する
+
+    factory は「値を受け取りUTF-8のJSONバイト列を返す関数」を返すこと。
+    出力はコンパクト（空白なし）で、datetime を ISO 8601 の文字列にエンコードすること
+    """
+    _ENGINE_FACTORIES[name] = factory
+    _encoders.pop(name, None)
+
+def get_encoder(engine: Optional[str] = None) -> Callable[[Any], bytes]:
+    """エンジンのエンコード関数を返す
+
+    指定されたエンジンが未登録、またはライブラリがインストールされていない場合は
+    警告を出して標準の json を使用する
+    """
+    name = (engine or JSON_ENGINE).lower()
+    encoder = _encoders.get(name)
+    if encoder is None:
+        factory = _ENGINE_FACTORIES.get(name)
+        try:
+            if factory is None:
+                raise ValueError(f"未登録のエンジン: {name}")
+            encoder = factory()
+        except (ImportError, ValueError, TypeError) as e:
+            logger.warning("JSONエンジン %s を使用できないため json を使用します: %s", name, e)
+            encoder = _encoders.get('json') or _json_engine()
+        _encoders[name] = encoder
+    return encoder
+
+def dumps(content: Any) -> bytes:
+    """値をコンパクトなUTF-8のJSONにエンコードする（datetime・Decimal もそのまま渡せる）"""
+    with stage('serialize'):
+        return get_encoder()(content)
+
+def dumps_text(content: Any) -> str:
+    """dumps の文字列版（Lambdaのプロキシ統合のレスポンス body に使用）"""
+    return dumps(content).decode('utf-8')
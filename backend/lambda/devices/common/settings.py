@@ -0,0 +1,86 @@
+import os
+import threading
+from typing import Optional
+
+_env_loaded = False
+_settings: Optional['Settings'] = None
+_lock = threading.RLock()
+
+def load_env() -> None:
+    """.env をプロセス内で1回だけ読み込む（各モジュールのインポート時には読み込まない）"""
+    global _env_loaded
+    if not _env_loaded:
+        with _lock:
+            if not _env_loaded:
+                from dotenv import load_dotenv
+                load_dotenv()
+                _env_loaded = True
+
+def _flag(name: str, default: str = 'false') -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+class Settings:
+    """接続設定（環境変数から1回だけ読み込み、get_settings() で共有する）"""
+
+    def __init__(self):
+        load_env()
+        # DBの種類（rds / dynamodb）
+        self.db_type = os.getenv('DB_TYPE', 'rds').lower()
+
+        # ローカル開発・FastAPI用のMySQL（DB_*）
+        self.db_host = os.getenv('DB_HOST', 'localhost')
+        self.db_port = int(os.getenv('DB_PORT', '3306'))
+        self.db_user = os.getenv('DB_USER', 'root')
+        self.db_password = os.getenv('DB_PASSWORD', '')
+        self.db_name = os.getenv('DB_NAME', 'lambdadb')
+        self.db_null_pool = _flag('DB_NULL_POOL')
+
+        # Lambda用のRDS（RDS_*）
+        self.rds_host = os.getenv('RDS_HOST')
+        self.rds_port = int(os.getenv('RDS_PORT', '3306'))
+        self.rds_user = os.getenv('RDS_USER')
+        self.rds_password = os.getenv('RDS_PASSWORD')
+        self.rds_database = os.getenv('RDS_DATABASE')
+
+        # 接続プール
+        self.db_pool_size = int(os.getenv('DB_POOL_SIZE', '5'))
+        self.db_pool_max_overflow = int(os.getenv('DB_POOL_MAX_OVERFLOW', '5'))
+        self.db_pool_min_idle = int(os.getenv('DB_POOL_MIN_IDLE', '1'))
+        self.db_pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+        # 接続の死活確認（この秒数以上アイドルだった接続・インターフェースだけを確認する。バックグラウンドの確認間隔は0で無効）
+        self.db_health_idle_seconds = float(os.getenv('DB_HEALTH_IDLE_SECONDS', '30'))
+        self.db_health_check_interval = float(os.getenv('DB_HEALTH_CHECK_INTERVAL_SECONDS', '60'))
+        # 接続ごとに保持するプリペアドステートメントの最大数（0で無効）
+        self.db_statement_cache_size = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '32'))
+
+        # DynamoDB
+        self.aws_region = os.getenv('AWS_REGION')
+        self.dynamodb_table_name = os.getenv('DYNAMODB_TABLE_NAME')
+
+        # SQLite（DB_TYPE=sqlite。MySQL・DynamoDBを使えない拠点やローカル開発用）
+        self.sqlite_path = os.getenv('SQLITE_PATH', 'devices.sqlite')
+        self.sqlite_read_pool_size = int(os.getenv('SQLITE_READ_POOL_SIZE', '4'))
+        self.sqlite_busy_timeout_ms = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+        self.sqlite_statement_cache_size = int(os.getenv('SQLITE_STATEMENT_CACHE_SIZE', '128'))
+        # グループコミット（既定は無効で、書き込みごとにコミットする）。
+        # 間隔（ミリ秒）を指定すると、その時間または指定件数の書き込みをまとめて1回でコミットする。
+        # 各書き込みはコミットまで待つため応答した書き込みが失われることはないが、同時に書き込むリクエストが
+        # 少ないと1件ごとに最大で間隔分の待ち時間が増える（同時書き込みが多い場合にコミット回数を減らせる）
+        self.sqlite_commit_batch_size = int(os.getenv('SQLITE_COMMIT_BATCH_SIZE', '1'))
+        self.sqlite_commit_interval_ms = int(os.getenv('SQLITE_COMMIT_INTERVAL_MS', '0'))
+
+def get_settings() -> Settings:
+    """プロセス内で共有する設定を返す（最初の呼び出し時に環境変数から読み込む）"""
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = Settings()
+    return _settings
+
+def reload_settings() -> Settings:
+    """環境変数を読み直す（接続設定の変更を検知したレジストリやテストから呼ばれる）"""
+    global _settings
+    with _lock:
+        _settings = Settings()
+    return _settings
@@ -0,0 +1,560 @@
+import json
+import uuid
+import queue
+import sqlite3
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .db_interface import DatabaseInterface
+from .settings import get_settings
+from .pagination import FILTER_FIELDS, encode_keyset_cursor, decode_keyset_cursor
+from .batch import delete_result, lookup_result
+from .search import normalize_text
+from .fields import column_list, with_fields, project
+from .etag import page_version
+from .timing import record, stage
+from .clock import utc_now, to_utc
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# 全列を読み込む場合の列リスト
+DEVICE_COLUMNS = column_list(None)
+
+# 日時の保存形式（SQLAlchemy の DateTime と同じ。FastAPIと同じファイルを共有できる）
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+TIMESTAMP_COLUMNS = ('created_at', 'updated_at')
+
+# テーブルとインデックス（init_db() が models.Device から作るものと同じ。全文インデックスはMySQLのみ）
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS devices (
+        id VARCHAR(36) NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        manufacturer VARCHAR(255) NOT NULL,
+        name_search VARCHAR(255) NOT NULL,
+        created_at DATETIME,
+        updated_at DATETIME,
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_devices_id ON devices (id)",
+    "CREATE INDEX IF NOT EXISTS ix_devices_name ON devices (name)",
+    "CREATE INDEX IF NOT EXISTS ix_devices_manufacturer ON devices (manufacturer)",
+    "CREATE INDEX IF NOT EXISTS idx_created_at_id ON devices (created_at, id)",
+)
+
+INSERT_QUERY = """
+    INSERT INTO devices (id, name, manufacturer, name_search, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def _to_db(value: datetime) -> str:
+    return value.strftime(TIMESTAMP_FORMAT)
+
+def _insert_params(row: Dict) -> Tuple:
+    """INSERT_QUERY のパラメータ"""
+    return (
+        row['id'], row['name'], row['manufacturer'], normalize_text(row['name']),
+        _to_db(row['created_at']), _to_db(row['updated_at'])
+    )
+
+def _row_factory(cursor: sqlite3.Cursor, row: Tuple) -> Dict:
+    """行を辞書に変換する（日時の列は datetime に戻す）"""
+    device = {}
+    for (name, *_), value in zip(cursor.description, row):
+        if name in TIMESTAMP_COLUMNS and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        device[name] = value
+    return device
+
+class _CommitBatch:
+    """まとめてコミットする書き込みの単位（呼び出し元はこのバッチのコミットを待ってから応答する）"""
+
+    __slots__ = ('done', 'error')
+
+    def __init__(self):
+        self.done = False
+        self.error: Optional[sqlite3.Error] = None
+
+class SQLiteInterface(DatabaseInterface):
+    """SQLiteインターフェースの実装クラス（MySQL・DynamoDBを使えない拠点やローカル開発用）
+
+    - WALモードで、書き込みは1本の接続に直列化し、読み込みは別の接続のプールから行う
+      （WALでは読み込みが書き込みをブロックしない）
+    - SQLは固定の文字列とプレースホルダーで組み立て、sqlite3 の接続ごとのステートメント
+      キャッシュ（cached_statements）でプリペアドステートメントを再利用する
+    - 既定では書き込みごとにコミットする。SQLITE_COMMIT_INTERVAL_MS を指定した場合は
+      SQLITE_COMMIT_BATCH_SIZE 件の書き込み、またはその時間ごとにまとめてコミットし、
+      各書き込みはコミットが完了するまで戻らない（読み込み前には未コミットの書き込みをコミットする）
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        settings = get_settings()
+        self.path = path or settings.sqlite_path
+        self.read_pool_size = settings.sqlite_read_pool_size
+        self.commit_interval = settings.sqlite_commit_interval_ms / 1000
+        # 間隔が0の場合はまとめずに書き込みごとにコミットする
+        self.commit_batch_size = max(settings.sqlite_commit_batch_size, 1) if self.commit_interval > 0 else 1
+        self._busy_timeout = settings.sqlite_busy_timeout_ms / 1000
+        self._statement_cache_size = settings.sqlite_statement_cache_size
+
+        self._write_lock = threading.RLock()
+        self._committed = threading.Condition(self._write_lock)
+        self._batch = _CommitBatch()
+        self._pending = 0
+        self._commit_timer: Optional[threading.Timer] = None
+        self._readers: queue.LifoQueue = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+
+        try:
+            self._writer = self._connect()
+            self._writer.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                self._writer.execute(statement)
+            logger.info("SQLiteデータベース %s に接続しました", self.path)
+        except sqlite3.Error as e:
+            logger.error("データベース接続エラー: %s", e)
+            raise
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        # isolation_level=None でトランザクションを明示的に管理する
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self._busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self._statement_cache_size
+        )
+        connection.row_factory = _row_factory
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if read_only:
+            connection.execute("PRAGMA query_only=ON")
+        return connection
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Cursor]:
+        """書き込み用のカーソルを返す
+
+        書き込みごとにセーブポイントを置き、失敗した書き込みだけを取り消す
+        （同じバッチの未コミットの書き込みは残す）。
+        まとめてコミットする場合は、バッチのコミットが完了するまで待ってから戻る
+        （コミットに失敗した場合はバッチの全ての書き込みが例外になる）
+        """
+        waited = time.perf_counter()
+        with self._write_lock:
+            record('db_acquire', time.perf_counter() - waited)
+            connection = self._writer
+            if not connection.in_transaction:
+                connection.execute("BEGIN IMMEDIATE")
+            connection.execute("SAVEPOINT device_write")
+            cursor = connection.cursor()
+            try:
+                with stage('db'):
+                    yield cursor
+            except Exception:
+                connection.execute("ROLLBACK TO device_write")
+                connection.execute("RELEASE device_write")
+                if not self._pending:
+                    # 他に未コミットの書き込みがなければ、書き込みロックを保持しないようトランザクションを終える
+                    connection.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.close()
+            connection.execute("RELEASE device_write")
+            self._pending += 1
+            batch = self._batch
+            if self._pending >= self.commit_batch_size:
+                self._commit()
+                return
+            if self._commit_timer is None:
+                self._commit_timer = threading.Timer(self.commit_interval, self.flush)
+                self._commit_timer.daemon = True
+                self._commit_timer.start()
+            # 待っている間は書き込みロックを手放し、他の書き込みを同じバッチに加える
+            with stage('db_commit'):
+                while not batch.done:
+                    self._committed.wait()
+            if batch.error is not None:
+                raise batch.error
+
+    def _commit(self) -> None:
+        """未コミットの書き込みをコミットし、コミットを待っている書き込みに結果を知らせる（書き込みロック取得済みで呼び出す）"""
+        if self._commit_timer is not None:
+            self._commit_timer.cancel()
+            self._commit_timer = None
+        batch, self._batch = self._batch, _CommitBatch()
+        self._pending = 0
+        try:
+            if self._writer.in_transaction:
+                self._writer.execute("COMMIT")
+        except sqlite3.Error as e:
+            batch.error = e
+            if self._writer.in_transaction:
+                self._writer.execute("ROLLBACK")
+            raise
+        finally:
+            batch.done = True
+            self._committed.notify_all()
+
+    def flush(self) -> None:
+        """未コミットの書き込みをコミットする"""
+        with self._write_lock:
+            try:
+                self._commit()
+            except sqlite3.Error as e:
+                logger.error("コミットエラー: %s", e)
+                raise
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Cursor]:
+        """読み込み用のカーソルを返す（プールの接続を貸し出し、使用後に返却する）"""
+        if self._pending:
+            # 自分の書き込みが読めるよう、先にコミットする
+            self.flush()
+        with stage('db_acquire'):
+            try:
+                connection = self._readers.get_nowait()
+            except queue.Empty:
+                with self._reader_lock:
+                    create = self._reader_count < self.read_pool_size
+                    if create:
+                        self._reader_count += 1
+                connection = self._connect(read_only=True) if create else self._readers.get(timeout=self._busy_timeout)
+        cursor = connection.cursor()
+        try:
+            with stage('db'):
+                yield cursor
+        finally:
+            cursor.close()
+            self._readers.put(connection)
+
+    def create_device(self, device_data: Dict) -> Dict:
+        """デバイスを作成する"""
+        device = {
+            'id': device_data.get('id') or str(uuid.uuid4()),
+            'name': device_data['name'],
+            'manufacturer': device_data['manufacturer'],
+            'created_at': utc_now(),
+        }
+        device['updated_at'] = device['created_at']
+        try:
+            with self._write() as cursor:
+                cursor.execute(INSERT_QUERY, _insert_params(device))
+            logger.info("デバイスを作成しました: %s", device['id'])
+            return device
+        except sqlite3.Error as e:
+            logger.error("デバイス作成エラー: %s", e)
+            raise
+
+    def create_devices(self, devices: List[Dict]) -> List[Dict]:
+        """複数のデバイスを1つのセーブポイントで一括作成する
+
+        重複したIDなど一部の行が原因で失敗した場合は全件が取り消されるため、
+        1行ずつ登録し直して、原因の行だけを失敗として返す
+        """
+        now = utc_now()
+        rows = []
+        for device_data in devices:
+            # 移行元の日時が指定されていればそのまま保存する（未指定の場合は現在時刻）
+            created_at = to_utc(device_data.get('created_at'), now)
+            rows.append({
+                'id': device_data['id'],
+                'name': device_data['name'],
+                'manufacturer': device_data['manufacturer'],
+                'created_at': created_at,
+                'updated_at': to_utc(device_data.get('updated_at'), created_at)
+            })
+        try:
+            with self._write() as cursor:
+                cursor.executemany(INSERT_QUERY, [_insert_params(row) for row in rows])
+        except sqlite3.IntegrityError as e:
+            logger.warning("デバイス一括作成エラー（1件ずつ登録し直します）: %s", e)
+            return self._create_rows(rows)
+        except sqlite3.Error as e:
+            logger.error("デバイス一括作成エラー: %s", e)
+            return [{'success': False, 'error': str(e)} for _ in rows]
+
+        logger.info("デバイスを一括作成しました: %s件", len(rows))
+        return [{'success': True, 'device': row} for row in rows]
+
+    def _create_rows(self, rows: List[Dict]) -> List[Dict]:
+        """1行ずつ INSERT し、失敗した行だけを失敗として返す（制約違反はその文だけが取り消される）"""
+        errors = {}
+        try:
+            with self._write() as cursor:
+                for index, row in enumerate(rows):
+                    try:
+                        cursor.execute(INSERT_QUERY, _insert_params(row))
+                    except sqlite3.IntegrityError as e:
+                        errors[index] = str(e)
+        except sqlite3.Error as e:
+            logger.error("デバイス一括作成エラー: %s", e)
+            return [{'success': False, 'error': str(e)} for _ in rows]
+
+        logger.info("デバイスを一括作成しました: %s件（失敗 %s件）", len(rows) - len(errors), len(errors))
+        return [
+            {'success': False, 'error': errors[index]} if index in errors else {'success': True, 'device': row}
+            for index, row in enumerate(rows)
+        ]
+
+    def get_device(self, device_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """デバイスを取得する（fields 指定時はその列だけを読み込む）"""
+        try:
+            with self._read() as cursor:
+                cursor.execute(f"SELECT {column_list(fields)} FROM devices WHERE id = ?", (device_id,))
+                device = cursor.fetchone()
+            if device:
+                logger.info("デバイスを取得しました: %s", device_id)
+            else:
+                logger.info("デバイスが見つかりません: %s", device_id)
+            return device
+        except sqlite3.Error as e:
+            logger.error("デバイス取得エラー: %s", e)
+            raise
+
+    def get_devices(self, device_ids: List[str], fields: Optional[List[str]] = None) -> Dict:
+        """指定された複数のIDのデバイスをまとめて取得する
+
+        IDの一覧はJSONの配列として1つのパラメータで渡す（json_each）ため、
+        件数によらず同じプリペアドステートメントを使う
+        """
+        found = {}
+        try:
+            with self._read() as cursor:
+                cursor.execute(
+                    f"SELECT {column_list(fields)} FROM devices WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(device_ids),)
+                )
+                for device in cursor.fetchall():
+                    found[device['id']] = device
+        except sqlite3.Error as e:
+            logger.error("デバイス一括取得エラー: %s", e)
+            raise
+
+        logger.info("デバイスを一括取得しました: %s件（該当なし %s件）", len(found), len(device_ids) - len(found))
+        return lookup_result(device_ids, found)
+
+    def update_device(self, device_id: str, update_data: Dict) -> Optional[Dict]:
+        """デバイスを更新し、更新後のデバイスを返す（UPDATE ... RETURNING で1文で完了する）
+
+        Returns:
+            更新後のデバイス（デバイスが存在しない場合はNone）
+        """
+        allowed_fields = ['name', 'manufacturer']
+        update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
+
+        if not update_fields:
+            logger.warning("更新可能なフィールドがありません: %s", device_id)
+            return None
+
+        # 名前を変更する場合は検索用の列も更新する
+        columns = dict(update_fields)
+        if 'name' in columns:
+            columns['name_search'] = normalize_text(columns['name'])
+        set_clause = ", ".join([f"{field} = ?" for field in columns.keys()])
+        query = f"UPDATE devices SET {set_clause}, updated_at = ? WHERE id = ? RETURNING {DEVICE_COLUMNS}"
+
+        try:
+            with self._write() as cursor:
+                cursor.execute(query, list(columns.values()) + [_to_db(utc_now()), device_id])
+                device = cursor.fetchone()
+        except sqlite3.Error as e:
+            logger.error("デバイス更新エラー: %s", e)
+            raise
+
+        if device is None:
+            logger.info("更新対象のデバイスが見つかりません: %s", device_id)
+            return None
+        logger.info("デバイスを更新しました: %s", device_id)
+        return device
+
+    def delete_device(self, device_id: str) -> bool:
+        """デバイスを削除する"""
+        try:
+            with self._write() as cursor:
+                cursor.execute("DELETE FROM devices WHERE id = ?", (device_id,))
+                deleted = cursor.rowcount > 0
+            if deleted:
+                logger.info("デバイスを削除しました: %s", device_id)
+            else:
+                logger.info("削除対象のデバイスが見つかりません: %s", device_id)
+            return deleted
+        except sqlite3.Error as e:
+            logger.error("デバイス削除エラー: %s", e)
+            raise
+
+    def delete_devices(self, device_ids: Optional[List[str]] = None, manufacturer: Optional[str] = None) -> Dict:
+        """複数のデバイスを DELETE ... RETURNING id の1文でまとめて削除する
+
+        IDの一覧は get_devices と同じくJSONの配列として1つのパラメータで渡す
+        """
+        if manufacturer is not None:
+            query, param = "DELETE FROM devices WHERE manufacturer = ? RETURNING id", manufacturer
+        else:
+            query = "DELETE FROM devices WHERE id IN (SELECT value FROM json_each(?)) RETURNING id"
+            param = json.dumps(device_ids)
+        try:
+            with self._write() as cursor:
+                cursor.execute(query, (param,))
+                deleted = [row['id'] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error("デバイス一括削除エラー: %s", e)
+            raise
+
+        if manufacturer is not None:
+            device_ids = deleted
+        logger.info("デバイスを一括削除しました: %s件（該当なし %s件）", len(deleted), len(device_ids) - len(deleted))
+        return delete_result(device_ids, deleted)
+
+    def list_devices(self) -> List[Dict]:
+        """全デバイスを取得する"""
+        try:
+            with self._read() as cursor:
+                cursor.execute(f"SELECT {DEVICE_COLUMNS} FROM devices")
+                devices = cursor.fetchall()
+            logger.info("デバイス一覧を取得しました: %s件", len(devices))
+            return devices
+        except sqlite3.Error as e:
+            logger.error("デバイス一覧取得エラー: %s", e)
+            raise
+
+    @staticmethod
+    def _filter_conditions(filters: Optional[Dict[str, str]]) -> Tuple[List[str], List[Any]]:
+        """絞り込み条件をWHERE句の条件とパラメータに変換する（name / manufacturer はインデックスを使用）"""
+        conditions = []
+        params = []
+        for field in FILTER_FIELDS:
+            if filters and filters.get(field) is not None:
+                conditions.append(f"{field} = ?")
+                params.append(filters[field])
+        return conditions, params
+
+    def _page_query(
+        self, columns: str, limit: int, cursor: Optional[str], filters: Optional[Dict[str, str]]
+    ) -> Tuple[str, List]:
+        """1ページ分（次ページの有無の判定用に1件多く）読み込むSELECT文とパラメータを作る"""
+        conditions, params = self._filter_conditions(filters)
+        if cursor:
+            created_at, last_id = decode_keyset_cursor(cursor)
+            conditions.append("(created_at, id) > (?, ?)")
+            params.extend([_to_db(created_at), last_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit + 1)
+        return f"SELECT {columns} FROM devices {where} ORDER BY created_at, id LIMIT ?", params
+
+    def list_devices_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict:
+        """デバイスを1ページ分取得する（(created_at, id) によるキーセットページネーション）"""
+        query, params = self._page_query(
+            column_list(with_fields(fields, 'created_at', 'updated_at')), limit, cursor, filters
+        )
+
+        try:
+            # 次ページの有無を判定するため1件多く取得する
+            with self._read() as db_cursor:
+                db_cursor.execute(query, params)
+                devices = db_cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error("デバイス一覧取得エラー: %s", e)
+            raise
+
+        next_cursor = None
+        has_more = len(devices) > limit
+        if has_more:
+            devices = devices[:limit]
+            next_cursor = encode_keyset_cursor(devices[-1]['created_at'], devices[-1]['id'])
+        logger.info("デバイス一覧を取得しました: %s件", len(devices))
+        return {
+            'items': [project(device, fields) for device in devices],
+            'next_cursor': next_cursor,
+            'version': page_version(devices, has_more)
+        }
+
+    def search_devices(self, query: str, limit: int, fuzzy: bool = False) -> List[Dict]:
+        """名前の部分一致でデバイスを検索する（LIKE による部分一致）
+
+        全文インデックスがないため、fuzzy の場合は既定の実装（n-gramインデックス）を使う
+        """
+        if fuzzy:
+            return super().search_devices(query, limit, fuzzy)
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        try:
+            with self._read() as cursor:
+                cursor.execute(
+                    f"SELECT {DEVICE_COLUMNS} FROM devices WHERE name_search LIKE ? ESCAPE '\\' "
+                    "ORDER BY length(name_search), name_search LIMIT ?",
+                    (pattern, limit)
+                )
+                devices = cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error("デバイス検索エラー: %s", e)
+            raise
+        logger.info("デバイスを検索しました: %s件", len(devices))
+        return devices
+
+    def get_collection_version(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """一覧と同じ条件で id, updated_at だけを読み込み、ページのバージョンを返す"""
+        query, params = self._page_query("id, updated_at", limit, cursor, filters)
+        try:
+            with self._read() as db_cursor:
+                db_cursor.execute(query, params)
+                rows = db_cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error("デバイス一覧バージョン取得エラー: %s", e)
+            raise
+        return page_version(rows[:limit], len(rows) > limit)
+
+    def iter_devices(self, batch_size: int = 500, filters: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+        """全デバイスを batch_size 件ずつ逐次返す（ストリーミングが終わるまで読み込み用の接続を1本占有する）"""
+        conditions, params = self._filter_conditions(filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            with self._read() as cursor:
+                cursor.execute(f"SELECT {DEVICE_COLUMNS} FROM devices {where} ORDER BY created_at, id", params)
+                count = 0
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    count += len(rows)
+                    yield from rows
+            logger.info("デバイス一覧をストリーミングしました: %s件", count)
+        except sqlite3.Error as e:
+            logger.error("デバイス一覧取得エラー: %s", e)
+            raise
+
+    def is_healthy(self) -> bool:
+        """データベースファイルを読み込めるか確認する"""
+        try:
+            with self._read() as cursor:
+                cursor.execute("SELECT 1")
+                return True
+        except sqlite3.Error as e:
+            logger.warning("ヘルスチェックエラー: %s", e)
+            return False
+
+    def close(self) -> None:
+        """未コミットの書き込みをコミットし、全ての接続を閉じる"""
+        with self._write_lock:
+            self._commit()
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
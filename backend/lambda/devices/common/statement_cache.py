@@ -0,0 +1,182 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import mysql.connector
+from .settings import get_settings
+from .metrics import metrics
+from .logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+# プリペアドステートメントのキャッシュの参照回数（hit: 準備済みの文を再利用、miss: 準備した）
+LOOKUPS = metrics.counter(
+    'device_db_statement_cache_total', "プリペアドステートメントのキャッシュの参照回数", ('result',)
+)
+# 準備済みの文の再利用で省略できた解析時間の推定値
+PARSE_SECONDS_SAVED = metrics.counter(
+    'device_db_statement_parse_seconds_saved_total', "準備済みの文の再利用で省略できた解析時間の推定値（秒）"
+)
+
+# キャッシュを保持する接続の属性名（プールで貸し出しを繰り返しても接続と一緒に残る）
+_CACHE_ATTR = '_device_statement_cache'
+
+def _close_quietly(cursor) -> None:
+    try:
+        cursor.close()
+    except mysql.connector.Error:
+        pass
+
+class StatementCache:
+    """1本の接続で準備済みの文を、文のテキストをキーに保持する（最近使われていない文から破棄する）
+
+    値は文ごとの prepared カーソル。カーソルを閉じるとサーバー側の文も解放される。
+    mysql-connector は直前に準備した文と同じオブジェクトかどうか（is）で再準備を判定するため、
+    実行には最初に登録した文字列を使う
+    """
+
+    def __init__(self, connection, max_size: int):
+        self.connection_id = connection.connection_id
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[str, Any]]' = OrderedDict()
+
+    def get(self, connection, statement: str) -> Tuple[str, Any, bool, int]:
+        """(登録済みの文字列, カーソル, 再利用したか, 破棄した文の数) を返す"""
+        entry = self._entries.get(statement)
+        if entry is not None:
+            self._entries.move_to_end(statement)
+            return entry[0], entry[1], True, 0
+        cursor = connection.cursor(prepared=True, dictionary=True)
+        self._entries[statement] = (statement, cursor)
+        evicted = 0
+        while len(self._entries) > self.max_size:
+            _, (_, old) = self._entries.popitem(last=False)
+            _close_quietly(old)
+            evicted += 1
+        return statement, cursor, False, evicted
+
+    def discard(self, statement: str) -> None:
+        """文を破棄する（次回の実行で準備し直す）"""
+        entry = self._entries.pop(statement, None)
+        if entry is not None:
+            _close_quietly(entry[1])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class PreparedStatements:
+    """接続ごとの StatementCache を管理し、ヒット率と省略できた解析時間を集計する
+
+    - キャッシュは接続オブジェクトに保持するため、プールから借り直しても再利用される
+    - 接続のスレッドID（connection_id）が変わった場合は再接続でサーバー側の文が失われているため作り直す
+    - 解析時間は、文ごとの初回実行（準備＋実行）と再利用時（実行のみ）の平均の差から推定する
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size if max_size is not None else get_settings().db_statement_cache_size
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        # 文ごとの [初回実行の回数, 初回実行の合計秒数, 再利用の回数, 再利用の合計秒数]
+        self._timings: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def cache_for(self, connection) -> StatementCache:
+        """接続に対応するキャッシュを返す（無い場合・再接続された場合は作成する）"""
+        cache = getattr(connection, _CACHE_ATTR, None)
+        if cache is not None and cache.connection_id != connection.connection_id:
+            logger.info("再接続されたため準備済みの文を破棄しました: %s件", len(cache))
+            with self._lock:
+                self._stats['invalidations'] += 1
+            cache = None
+        if cache is None:
+            cache = StatementCache(connection, self.max_size)
+            setattr(connection, _CACHE_ATTR, cache)
+        return cache
+
+    def execute(self, cache: StatementCache, connection, statement: str, params: Sequence[Any]):
+        """準備済みの文で実行し、結果を読むカーソルを返す"""
+        statement, cursor, hit, evicted = cache.get(connection, statement)
+        started = time.perf_counter()
+        try:
+            cursor.execute(statement, params)
+        except mysql.connector.Error:
+            # サーバー側で文が失われている場合に備え、次回は準備し直す
+            cache.discard(statement)
+            raise
+        self._record(statement, hit, time.perf_counter() - started, evicted)
+        return cursor
+
+    def _record(self, statement: str, hit: bool, elapsed: float, evicted: int) -> None:
+        saved = 0.0
+        with self._lock:
+            timing = self._timings.get(statement)
+            if timing is None:
+                timing = self._timings[statement] = [0, 0.0, 0, 0.0]
+            if hit:
+                self._stats['hits'] += 1
+                timing[2] += 1
+                timing[3] += elapsed
+                if timing[0]:
+                    saved = max(0.0, timing[1] / timing[0] - timing[3] / timing[2])
+            else:
+                self._stats['misses'] += 1
+                timing[0] += 1
+                timing[1] += elapsed
+            self._stats['evictions'] += evicted
+        LOOKUPS.inc('hit' if hit else 'miss')
+        if saved:
+            PARSE_SECONDS_SAVED.inc(amount=saved)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット率・省略できた解析時間の推定値（ミリ秒）・文の種類数を返す"""
+        with self._lock:
+            stats = dict(self._stats)
+            saved = sum(
+                hits * max(0.0, miss_seconds / misses - hit_seconds / hits)
+                for misses, miss_seconds, hits, hit_seconds in self._timings.values()
+                if misses and hits
+            )
+            statements = len(self._timings)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'max_size': self.max_size,
+            'statements': statements,
+            'hit_rate': stats['hits'] / lookups if lookups else 0.0,
+            'parse_time_saved_ms': saved * 1000,
+        })
+        return stats
+
+class CachedStatementCursor:
+    """RDSInterface._get_cursor(prepared=True) が返すカーソル
+
+    execute ごとに文に対応する準備済みのカーソルで実行し、結果は最後に実行したカーソルから読む
+    """
+
+    def __init__(self, statements: PreparedStatements, connection):
+        self._statements = statements
+        self._connection = connection
+        self._cache = statements.cache_for(connection)
+        self._cursor = None
+
+    def execute(self, statement: str, params: Sequence[Any] = ()) -> None:
+        self._cursor = self._statements.execute(self._cache, self._connection, statement, params)
+
+    def fetchall(self) -> List[Dict]:
+        return self._cursor.fetchall()
+
+    def fetchone(self) -> Optional[Dict]:
+        """先頭の行を返す（未読の結果を接続に残さないよう全行を読む。1行に絞る文だけに使う）"""
+        rows = self._cursor.fetchall()
+        return rows[0] if rows else None
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def close(self) -> None:
+        """準備済みの文は接続に残すため、カーソルは閉じない"""
+        self._cursor = None
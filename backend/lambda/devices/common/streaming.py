@@ -0,0 +1,54 @@
+import os
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+from .serialization import dumps
+
+# ストリーミングレスポンスのメディアタイプ
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# データベースから1回に読み込む行数（＝1チャンクあたりの行数）
+STREAM_BATCH_SIZE = int(os.getenv('DEVICE_STREAM_BATCH_SIZE', '500'))
+
+def wants_stream(stream: Optional[Any] = None, accept: Optional[str] = None) -> bool:
+    """ストリーミングモードが要求されているか判定する
+
+    Args:
+        stream: クエリパラメータ stream の値
+        accept: Acceptヘッダーの値
+
+    Returns:
+        ?stream=true または Accept: application/x-ndjson の場合はTrue
+    """
+    if stream is not None and str(stream).lower() in ('1', 'true', 'yes'):
+        return True
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+def _encode_lines(buffer: List[bytes]) -> bytes:
+    return b'\n'.join(buffer) + b'\n'
+
+def _encode_row(row: Dict) -> bytes:
+    return dumps(row)
+
+def iter_ndjson(rows: Iterable[Dict], batch_size: int = STREAM_BATCH_SIZE) -> Iterator[bytes]:
+    """行を逐次NDJSON（1行1デバイス）にエンコードし、batch_size行ごとのチャンクで返す
+
+    全件をメモリに保持しないため、メモリ使用量は batch_size 行分で一定になる
+    """
+    buffer = []
+    for row in rows:
+        buffer.append(_encode_row(row))
+        if len(buffer) >= batch_size:
+            yield _encode_lines(buffer)
+            buffer.clear()
+    if buffer:
+        yield _encode_lines(buffer)
+
+async def aiter_ndjson(rows: AsyncIterable[Dict], batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """iter_ndjson の非同期版（非同期ジェネレーターから読み込む）"""
+    buffer = []
+    async for row in rows:
+        buffer.append(_encode_row(row))
+        if len(buffer) >= batch_size:
+            yield _encode_lines(buffer)
+            buffer.clear()
+    if buffer:
+        yield _encode_lines(buffer)
@@ -0,0 +1,81 @@
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional, Tuple
+
+# ステージごとの所要時間を返すレスポンスヘッダー
+SERVER_TIMING_HEADER = 'Server-Timing'
+
+class RequestTiming:
+    """1リクエストのステージ（接続の取得・クエリ・シリアライズなど）ごとの所要時間と回数"""
+
+    __slots__ = ('started', 'stages')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # ステージ名 → [合計秒数, 回数]
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def elapsed(self) -> float:
+        """リクエスト開始からの経過秒数"""
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing ヘッダーの値（ミリ秒。複数回のステージは回数を desc に入れる）"""
+        parts = []
+        for name, (seconds, count) in self.stages.items():
+            if count > 1:
+                parts.append(f'{name};dur={seconds * 1000:.2f};desc="{count}x"')
+            else:
+                parts.append(f'{name};dur={seconds * 1000:.2f}')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+# 処理中のリクエストの計測（非同期タスク・スレッドプールにはコンテキストごと引き継がれる）
+_current: ContextVar[Optional[RequestTiming]] = ContextVar('device_request_timing', default=None)
+
+def start_timing() -> Tuple[RequestTiming, Token]:
+    """リクエストの計測を開始する（終了時に stop_timing にトークンを渡す）"""
+    timing = RequestTiming()
+    return timing, _current.set(timing)
+
+def stop_timing(token: Token) -> None:
+    _current.reset(token)
+
+def current_timing() -> Optional[RequestTiming]:
+    return _current.get()
+
+class _Stage:
+    __slots__ = ('name', 'timing', 'started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> '_Stage':
+        # 計測中のリクエストがない場合（スクリプトやテスト）は時刻を取らない
+        self.timing = _current.get()
+        if self.timing is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self.timing is not None:
+            self.timing.add(self.name, time.perf_counter() - self.started)
+        return False
+
+def stage(name: str) -> _Stage:
+    """with 文のブロックの所要時間を、処理中のリクエストのステージとして記録する"""
+    return _Stage(name)
+
+def record(name: str, seconds: float) -> None:
+    """計測済みの所要時間を、処理中のリクエストのステージとして記録する"""
+    timing = _current.get()
+    if timing is not None:
+        timing.add(name, seconds)
@@ -1,12 +1,14 @@
 import json
 import uuid
-from common.db_interface import get_db_interface
-import logging
+from common.db_interface import get_db_interface, report_db_interface_failure
+from common.serialization import dumps_text
+from common.metrics import timed_handler
+from common.logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = setup_logger(__name__)
 
+@timed_handler('create')
 def handler(event, context):
     """デバイスを作成するLambda関数"""
     try:
@@ -19,7 +21,7 @@ def handler(event, context):
             if field not in body:
                 return {
                     'statusCode': 400,
-                    'body': json.dumps({
+                    'body': dumps_text({
                         'error': f'必須フィールドがありません: {field}'
                     })
                 }
@@ -40,17 +42,19 @@ def handler(event, context):
         
         return {
             'statusCode': 201,
-            'body': json.dumps({
+            'body': dumps_text({
                 'message': 'デバイスを作成しました',
                 'device': created_device
             })
         }
             
     except Exception as e:
-        logger.error(f"エラー: {str(e)}")
+        logger.error("エラー: %s", e)
+        # 接続が壊れている可能性があるため、次回の呼び出しでヘルスチェックを行う
+        report_db_interface_failure()
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps_text({
                 'error': 'Internal server error'
             })
         } 
\ No newline at end of file
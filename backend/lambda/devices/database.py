@@ -1,57 +1,218 @@
-import os
-from sqlalchemy import create_engine, text
+import time
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
-from dotenv import load_dotenv
-import logging
+from .common.settings import get_settings
+from .common.timing import record, stage
+from .common.clock import SESSION_TIME_ZONE, SESSION_TIME_ZONE_INIT
+from .common.logger import setup_logger
+from .common.db_health import install_sqlalchemy_health_checks
 
 # ロガーの設定
-logger = logging.getLogger(__name__)
-
-# 環境変数の読み込み
-load_dotenv()
-
-# データベース接続情報
-DB_TYPE = os.getenv("DB_TYPE", "rds")
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_PORT = os.getenv("DB_PORT", "3306")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-DB_NAME = os.getenv("DB_NAME", "lambdadb")
-
-# SQLAlchemy用のデータベースURL
-DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4&collation=utf8mb4_unicode_ci"
-
-# エンジンの作成
-engine = create_engine(
-    DATABASE_URL,
-    pool_recycle=3600,
-    pool_pre_ping=True,
-    connect_args={
-        "charset": "utf8mb4",
-        "use_unicode": True,
-        "collation": "utf8mb4_unicode_ci"
-    }
+logger = setup_logger(__name__)
+
+# エンジンは最初のセッション生成時に作成する（インポート時にはDBドライバーを読み込まず、接続もしない）
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+# クエリの所要時間を、処理中のリクエストの db ステージとして記録する（同期・非同期の全エンジン共通）
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['device_query_started'] = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('device_query_started', None)
+    if started is not None:
+        record('db', time.perf_counter() - started)
+
+def _sqlite_url(driver: str) -> URL:
+    return URL.create(driver, database=get_settings().sqlite_path)
+
+def _enable_sqlite_wal(engine) -> None:
+    """接続ごとにWALモードと同期レベルを設定する（WALでは読み込みが書き込みをブロックしない）"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+def _create_sqlite_engine():
+    from sqlalchemy import create_engine
+    settings = get_settings()
+    engine = create_engine(
+        _sqlite_url("sqlite"),
+        connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000}
+    )
+    _enable_sqlite_wal(engine)
+    # マイグレーションを実行しない拠点向けに、テーブルとインデックスがなければ作成する
+    from . import models  # noqa: F401
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+def get_engine():
+    """同期エンジンを返す（初回のみ生成）
+
+    DB_TYPE=sqlite の場合は SQLITE_PATH のSQLite、それ以外の場合はMySQL（DB_*）に接続する
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                settings = get_settings()
+                if settings.db_type == 'sqlite':
+                    _engine = _create_sqlite_engine()
+                    return _engine
+                # SQLAlchemy用のデータベースURL
+                database_url = URL.create(
+                    "mysql+mysqlconnector",
+                    username=settings.db_user,
+                    password=settings.db_password,
+                    host=settings.db_host,
+                    port=settings.db_port,
+                    database=settings.db_name,
+                    query={"charset": "utf8mb4", "collation": "utf8mb4_unicode_ci"}
+                )
+                # 死活確認は pool_pre_ping（借りるたびに確認）ではなく、長くアイドルだった接続だけに行う
+                _engine = create_engine(
+                    database_url,
+                    pool_recycle=3600,
+                    connect_args={
+                        "charset": "utf8mb4",
+                        "use_unicode": True,
+                        "collation": "utf8mb4_unicode_ci",
+                        "time_zone": SESSION_TIME_ZONE
+                    }
+                )
+                install_sqlalchemy_health_checks(_engine)
+    return _engine
+
+def get_async_engine():
+    """非同期エンジン（aiomysql）を返す（初回のみ生成）"""
+    global _async_engine
+    if _async_engine is None:
+        if get_settings().db_type == 'sqlite':
+            # テーブルの作成は同期エンジンで行う
+            get_engine()
+        with _engine_lock:
+            if _async_engine is None:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                from sqlalchemy.pool import NullPool
+                settings = get_settings()
+                if settings.db_type == 'sqlite':
+                    # aiosqlite（接続ごとに専用のスレッドで sqlite3 を実行する）
+                    _async_engine = create_async_engine(
+                        _sqlite_url("sqlite+aiosqlite"),
+                        connect_args={"timeout": settings.sqlite_busy_timeout_ms / 1000},
+                        **({"poolclass": NullPool} if settings.db_null_pool else {})
+                    )
+                    _enable_sqlite_wal(_async_engine.sync_engine)
+                    return _async_engine
+                # 非同期用のデータベースURL（aiomysql）
+                async_database_url = URL.create(
+                    "mysql+aiomysql",
+                    username=settings.db_user,
+                    password=settings.db_password,
+                    host=settings.db_host,
+                    port=settings.db_port,
+                    database=settings.db_name,
+                    query={"charset": "utf8mb4"}
+                )
+                # DB_NULL_POOL=true の場合は接続をプールしない（リクエストごとにイベントループが変わるテスト環境用）
+                async_engine_options = {"poolclass": NullPool} if settings.db_null_pool else {
+                    "pool_size": settings.db_pool_size,
+                    "max_overflow": settings.db_pool_max_overflow,
+                    "pool_timeout": settings.db_pool_timeout,
+                    "pool_recycle": 3600
+                }
+                _async_engine = create_async_engine(
+                    async_database_url,
+                    connect_args={"init_command": SESSION_TIME_ZONE_INIT},
+                    **async_engine_options
+                )
+                install_sqlalchemy_health_checks(_async_engine, 'sqlalchemy_async')
+    return _async_engine
+
+# セッションの作成（バインド先のエンジンはセッション生成時に設定する）
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# 非同期セッションの作成
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
 )
 
-# セッションの作成
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def new_session():
+    """同期セッションを生成する（バインド先が未設定の場合は既定のエンジンを使用）"""
+    if SessionLocal.kw.get('bind') is None:
+        SessionLocal.configure(bind=get_engine())
+    return SessionLocal()
+
+def new_async_session() -> AsyncSession:
+    """非同期セッションを生成する（バインド先が未設定の場合は既定のエンジンを使用）"""
+    if AsyncSessionLocal.kw.get('bind') is None:
+        AsyncSessionLocal.configure(bind=get_async_engine())
+    return AsyncSessionLocal()
+
+def reset_engines() -> None:
+    """エンジンを破棄し、次のセッション生成時に現在の設定で作り直す（DBを切り替えるベンチマーク用）"""
+    global _engine, _async_engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        if _async_engine is not None:
+            # 非同期の接続はイベントループ外では閉じられないため、プールから切り離すだけにする
+            _async_engine.sync_engine.dispose(close=False)
+        _engine = None
+        _async_engine = None
+        SessionLocal.configure(bind=None)
+        AsyncSessionLocal.configure(bind=None)
+
+def __getattr__(name: str):
+    # 既存の `from ..database import engine` をインポート時にエンジンを作らずに動かすため
+    if name == 'engine':
+        return get_engine()
+    if name == 'async_engine':
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # モデルのベースクラス
 Base = declarative_base()
 
 # データベースセッションの取得
 def get_db():
-    db = SessionLocal()
+    db = new_session()
     try:
-        # 接続テスト
-        db.execute(text("SELECT 1"))
+        # 接続を確保する（SELECT 1 での確認は行わず、死活確認はプールのチェックアウト時に必要な場合だけ行う）
+        with stage('db_acquire'):
+            db.connection()
         yield db
     except SQLAlchemyError as e:
-        logger.error(f"データベース接続エラー: {str(e)}")
+        logger.error("データベース接続エラー: %s", e)
         db.close()
         raise HTTPException(status_code=500, detail="データベース接続エラーが発生しました")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# 非同期データベースセッションの取得
+async def get_async_db():
+    async with new_async_session() as db:
+        try:
+            # 接続を確保する（SELECT 1 での確認は行わず、死活確認はプールのチェックアウト時に必要な場合だけ行う）
+            with stage('db_acquire'):
+                await db.connection()
+            yield db
+        except SQLAlchemyError as e:
+            logger.error("データベース接続エラー: %s", e)
+            raise HTTPException(status_code=500, detail="データベース接続エラーが発生しました")
@@ -1,11 +1,12 @@
-import json
-from common.db_interface import get_db_interface
-import logging
+from common.db_interface import get_db_interface, report_db_interface_failure
+from common.serialization import dumps_text
+from common.metrics import timed_handler
+from common.logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = setup_logger(__name__)
 
+@timed_handler('delete')
 def handler(event, context):
     """デバイスを削除するLambda関数"""
     try:
@@ -15,32 +16,30 @@ def handler(event, context):
         # データベース操作
         db = get_db_interface()
         
-        # デバイスの存在確認
-        existing_device = db.get_device(device_id)
-        if not existing_device:
+        # デバイスの削除（存在確認も同じ書き込みで行う）
+        if not db.delete_device(device_id):
             return {
                 'statusCode': 404,
-                'body': json.dumps({
+                'body': dumps_text({
                     'error': 'デバイスが見つかりません'
                 })
             }
         
-        # デバイスの削除
-        db.delete_device(device_id)
-        
         return {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': dumps_text({
                 'message': 'デバイスを削除しました',
                 'device_id': device_id
             })
         }
             
     except Exception as e:
-        logger.error(f"エラー: {str(e)}")
+        logger.error("エラー: %s", e)
+        # 接続が壊れている可能性があるため、次回の呼び出しでヘルスチェックを行う
+        report_db_interface_failure()
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps_text({
                 'error': 'Internal server error'
             })
         } 
\ No newline at end of file
@@ -1,30 +1,48 @@
-import json
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
+from sqlalchemy import and_, or_, select, insert, update, delete, func, text, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+from ..database import get_async_db, new_async_session
 from ..models import Device
-from ..schemas import DeviceCreate, Device as DeviceSchema
-from fastapi.responses import JSONResponse
+from ..schemas import DeviceCreate, DeviceBatchCreate, DeviceLookup, DeviceBulkDelete, Device as DeviceSchema
+from fastapi.responses import StreamingResponse, Response
 import uuid
 from ..common.exceptions import DeviceNotFoundError, ValidationError, DatabaseError
-import logging
+from ..common.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_keyset_cursor, decode_keyset_cursor,
+    normalize_filters
+)
+from ..common.batch import (
+    validate_batch, prepare_batch, batch_summary, validate_lookup_ids, lookup_result,
+    validate_delete_request, delete_result
+)
+from ..common.cache import get_device_cache
+from ..common.clock import utc_now
+from ..common.etag import ETAG_HEADER, device_etag, collection_etag, etag_matches, page_version
+from ..common.responses import UnicodeJSONResponse
+from ..common.streaming import NDJSON_MEDIA_TYPE, STREAM_BATCH_SIZE, wants_stream, aiter_ndjson
+from ..common.fields import DEVICE_FIELDS, normalize_fields, with_fields, project
+from ..common.search import (
+    NGRAM_SIZE, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, normalize_text, validate_search_query
+)
+from ..common.logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger(__name__)
-
-class UnicodeJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=2,
-            separators=(",", ": ")
-        ).encode("utf-8")
+logger = setup_logger(__name__)
 
 router = APIRouter()
 
+def device_columns(fields: Optional[List[str]] = None) -> list:
+    """SELECT する列（fields がNoneの場合は全フィールド。検索用の name_search は含めない）"""
+    return [getattr(Device, field) for field in fields or DEVICE_FIELDS]
+
+def device_content(row, fields: Optional[List[str]] = None) -> Dict:
+    """読み込んだ行からレスポンスの辞書を作る（指定されたフィールドだけを参照する）
+
+    日時は datetime のまま返し、エンコード時にISO 8601の文字列にする
+    """
+    return {field: getattr(row, field) for field in fields or DEVICE_FIELDS}
+
 def validate_uuid(device_id: str) -> bool:
     """UUIDの形式が有効かチェックする"""
     try:
@@ -34,7 +52,7 @@ def validate_uuid(device_id: str) -> bool:
         return False
 
 @router.post("/devices/", response_model=DeviceSchema, status_code=201)
-def create_device(device: DeviceCreate, db: Session = Depends(get_db)):
+async def create_device(device: DeviceCreate, db: AsyncSession = Depends(get_async_db)):
     """新しいデバイスを作成"""
     try:
         # 入力バリデーション
@@ -43,60 +61,411 @@ def create_device(device: DeviceCreate, db: Session = Depends(get_db)):
         if not device.manufacturer:
             raise ValidationError("メーカー名は必須です", {"field": "manufacturer"})
 
+        # 作成日時を手元で決めておき、コミット後の再読み込み（refresh）を省略する
+        now = utc_now()
         db_device = Device(
             id=str(uuid.uuid4()),
             name=device.name,
-            manufacturer=device.manufacturer
+            manufacturer=device.manufacturer,
+            created_at=now,
+            updated_at=now
         )
         
         try:
             db.add(db_device)
-            db.commit()
-            db.refresh(db_device)
+            await db.commit()
         except Exception as e:
-            logger.error(f"データベースエラー: {str(e)}")
+            logger.error("データベースエラー: %s", e)
             raise DatabaseError("デバイスの作成中にエラーが発生しました", e)
 
+        return UnicodeJSONResponse(content=device_content(db_device), status_code=201)
+    except ValidationError as e:
+        raise e
+    except Exception as e:
+        logger.error("予期せぬエラー: %s", e)
+        raise
+
+async def insert_rows(db: AsyncSession, devices: list, rows: List[Dict]) -> List[Dict]:
+    """1件ずつ INSERT・コミットし、要素ごとの結果を返す（一括登録が失敗した場合だけ使う）"""
+    results = []
+    for (index, _), row in zip(devices, rows):
+        try:
+            await db.execute(insert(Device), [row])
+            await db.commit()
+        except Exception as e:
+            logger.error("データベースエラー: %s", e)
+            await db.rollback()
+            results.append({"index": index, "success": False, "error": "デバイスの作成中にエラーが発生しました"})
+        else:
+            results.append({"index": index, "success": True, "device": row})
+    return results
+
+@router.post("/devices/batch", status_code=201)
+async def create_devices(batch: DeviceBatchCreate, db: AsyncSession = Depends(get_async_db)):
+    """複数のデバイスを一括で作成（全件成功は201、一部でも失敗があれば207）
+
+    検証を通った要素は複数行のINSERTにまとめ、1回のコミットで登録する
+    """
+    try:
+        items = validate_batch(batch.devices)
+    except ValidationError as e:
         return UnicodeJSONResponse(
             content={
-                "name": db_device.name,
-                "manufacturer": db_device.manufacturer,
-                "id": db_device.id,
-                "created_at": db_device.created_at.isoformat(),
-                "updated_at": db_device.updated_at.isoformat()
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e),
+                    "details": e.details
+                }
             },
-            status_code=201
+            status_code=400
         )
+
+    # 要素ごとの検証（不正な要素だけを失敗とし、残りは登録する）
+    devices, results = prepare_batch(items)
+
+    if devices:
+        now = utc_now()
+        rows = [dict(device_data, created_at=now, updated_at=now) for _, device_data in devices]
+        try:
+            await db.execute(insert(Device), rows)
+            await db.commit()
+        except Exception as e:
+            # 一部の行が原因の場合も全件がロールバックされるため、1件ずつ登録し直す
+            logger.warning("データベースエラー（1件ずつ登録し直します）: %s", e)
+            await db.rollback()
+            results.extend(await insert_rows(db, devices, rows))
+        else:
+            results.extend(
+                {
+                    "index": index,
+                    "success": True,
+                    "device": row
+                }
+                for (index, _), row in zip(devices, rows)
+            )
+
+    summary = batch_summary(results)
+    return UnicodeJSONResponse(
+        content=summary,
+        status_code=201 if summary["failed"] == 0 else 207
+    )
+
+# 一括取得時に1回の IN 句に含める最大ID数
+LOOKUP_CHUNK_SIZE = 500
+
+@router.post("/devices/lookup")
+async def lookup_devices(
+    lookup: DeviceLookup,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """指定された複数のIDのデバイスをまとめて取得
+
+    見つからなかったIDはエラーとせず missing で返す
+    fields（カンマ区切り）を指定した場合は、その列だけを読み込んで返す
+    """
+    try:
+        device_ids = validate_lookup_ids(lookup.ids)
+        selected = normalize_fields(fields)
+
+        found = {}
+        for start in range(0, len(device_ids), LOOKUP_CHUNK_SIZE):
+            chunk = device_ids[start:start + LOOKUP_CHUNK_SIZE]
+            result = await db.execute(select(*device_columns(selected)).where(Device.id.in_(chunk)))
+            for row in result:
+                found[row.id] = device_content(row, selected)
+
+        return UnicodeJSONResponse(content=lookup_result(device_ids, found))
     except ValidationError as e:
-        raise e
+        return UnicodeJSONResponse(
+            content={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e),
+                    "details": e.details
+                }
+            },
+            status_code=400
+        )
     except Exception as e:
-        logger.error(f"予期せぬエラー: {str(e)}")
-        raise
+        logger.error("デバイス一括取得エラー: %s", e)
+        return UnicodeJSONResponse(
+            content={
+                "error": {
+                    "code": "DATABASE_ERROR",
+                    "message": "デバイスの取得中にエラーが発生しました",
+                    "details": {}
+                }
+            },
+            status_code=500
+        )
+
+@router.post("/devices/bulk-delete")
+async def bulk_delete_devices(request: DeviceBulkDelete, db: AsyncSession = Depends(get_async_db)):
+    """複数のデバイスを一括で削除
+
+    ids（IDのリスト）か manufacturer（メーカー）のどちらか一方を指定する。
+    IDは LOOKUP_CHUNK_SIZE 件ごとに、存在するIDを SELECT ... FOR UPDATE で確認してから
+    DELETE ... WHERE id IN (...) で削除し、全件を1回のコミットで確定する。
+    見つからなかったIDはエラーとせず missing で返す
+    """
+    try:
+        device_ids, manufacturer = validate_delete_request(request.ids, request.manufacturer)
+
+        deleted = []
+        try:
+            if manufacturer is not None:
+                result = await db.execute(
+                    select(Device.id).where(Device.manufacturer == manufacturer).with_for_update()
+                )
+                deleted = list(result.scalars())
+                if deleted:
+                    await db.execute(delete(Device).where(Device.manufacturer == manufacturer))
+                device_ids = deleted
+            else:
+                for start in range(0, len(device_ids), LOOKUP_CHUNK_SIZE):
+                    chunk = device_ids[start:start + LOOKUP_CHUNK_SIZE]
+                    result = await db.execute(select(Device.id).where(Device.id.in_(chunk)).with_for_update())
+                    found = list(result.scalars())
+                    if found:
+                        await db.execute(delete(Device).where(Device.id.in_(found)))
+                        deleted.extend(found)
+            await db.commit()
+        except Exception as e:
+            logger.error("データベースエラー: %s", e)
+            await db.rollback()
+            raise DatabaseError("デバイスの削除中にエラーが発生しました", e)
+
+        cache = get_device_cache()
+        if cache is not None:
+            for device_id in deleted:
+                cache.invalidate(device_id)
+
+        return UnicodeJSONResponse(content=delete_result(device_ids, deleted))
+    except ValidationError as e:
+        return UnicodeJSONResponse(
+            content={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e),
+                    "details": e.details
+                }
+            },
+            status_code=400
+        )
+    except DatabaseError as e:
+        return UnicodeJSONResponse(
+            content={
+                "error": {
+                    "code": "DATABASE_ERROR",
+                    "message": str(e),
+                    "details": {}
+                }
+            },
+            status_code=500
+        )
+
+def filter_conditions(filters: Dict[str, str]) -> list:
+    """絞り込み条件をWHERE句の条件に変換する（name / manufacturer はインデックスを使用）"""
+    return [getattr(Device, field) == value for field, value in filters.items()]
+
+def page_conditions(filters: Dict[str, str], cursor: Optional[str] = None) -> list:
+    """一覧の1ページ分を読み込むWHERE句の条件（絞り込み条件と (created_at, id) のキーセット位置）"""
+    conditions = filter_conditions(filters)
+    if cursor:
+        created_at, last_id = decode_keyset_cursor(cursor)
+        conditions.append(or_(
+            Device.created_at > created_at,
+            and_(Device.created_at == created_at, Device.id > last_id)
+        ))
+    return conditions
+
+async def stream_device_rows(batch_size: int = STREAM_BATCH_SIZE, filters: Optional[Dict[str, str]] = None):
+    """全デバイスを batch_size 件ずつデータベースから読み込みながら逐次返す
+
+    レスポンス送信中もセッションを保持する必要があるため、専用のセッションを使用する
+    """
+    async with new_async_session() as db:
+        query = (
+            select(Device)
+            .where(*filter_conditions(filters or {}))
+            .order_by(Device.created_at, Device.id)
+            .execution_options(yield_per=batch_size)
+        )
+        try:
+            result = await db.stream_scalars(query)
+            async for device in result:
+                yield device_content(device)
+        except Exception as e:
+            logger.error("デバイス一覧ストリーミングエラー: %s", e)
+            raise
 
 @router.get("/devices/", response_model=List[DeviceSchema])
-def list_devices(db: Session = Depends(get_db)):
-    """全デバイスを取得"""
+async def list_devices(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """デバイス一覧を1ページ分取得（次ページのカーソルは X-Next-Cursor ヘッダーで返す）
+
+    name / manufacturer を指定した場合は完全一致で絞り込む（インデックスを使用）
+    fields（カンマ区切り）を指定した場合は、その列とカーソルの作成に必要な列だけを読み込む
+
+    ?stream=true または Accept: application/x-ndjson の場合は、ページングせずに
+    全デバイスをNDJSON形式でストリーミングする
+
+    ETagはページに含まれるデバイスの (id, updated_at) から計算した弱いETagで、
+    If-None-Match がある場合は (id, updated_at) だけを読み込んで比べ、一致すれば一覧を取得せずに304を返す
+    """
     try:
-        devices = db.query(Device).all()
+        filters = normalize_filters({"name": name, "manufacturer": manufacturer})
+        selected = normalize_fields(fields)
+
+        if wants_stream(stream, accept):
+            return StreamingResponse(
+                aiter_ndjson(stream_device_rows(filters=filters)),
+                media_type=NDJSON_MEDIA_TYPE
+            )
+
+        conditions = page_conditions(filters, cursor)
+        query_key = (limit, cursor, sorted(filters.items()), selected)
+
+        if if_none_match:
+            # 条件付きGETの場合だけ、一覧と同じ条件で id, updated_at だけを読み込んでページのバージョンを確かめる
+            version = await db.execute(
+                select(Device.id, Device.updated_at)
+                .where(*conditions)
+                .order_by(Device.created_at, Device.id)
+                .limit(limit + 1)
+            )
+            rows = [row._mapping for row in version.all()]
+            etag = collection_etag(page_version(rows[:limit], len(rows) > limit), *query_key)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={ETAG_HEADER: etag})
+
+        query = (
+            select(*device_columns(with_fields(selected, 'created_at', 'updated_at')))
+            .where(*conditions)
+            .order_by(Device.created_at, Device.id)
+        )
+
+        # 次ページの有無を判定するため1件多く取得する
+        result = await db.execute(query.limit(limit + 1))
+        devices = result.all()
+        has_more = len(devices) > limit
+        devices = devices[:limit]
+        # ETagは本文と同じ読み込みの行から計算する
+        version = page_version([device._mapping for device in devices], has_more)
+        headers = {ETAG_HEADER: collection_etag(version, *query_key)}
+        if has_more:
+            headers[NEXT_CURSOR_HEADER] = encode_keyset_cursor(devices[-1].created_at, devices[-1].id)
+
         return UnicodeJSONResponse(
-            content=[{
-                "name": device.name,
-                "manufacturer": device.manufacturer,
-                "id": device.id,
-                "created_at": device.created_at.isoformat(),
-                "updated_at": device.updated_at.isoformat()
-            } for device in devices]
+            content=[device_content(device, selected) for device in devices],
+            headers=headers
+        )
+    except ValidationError as e:
+        return UnicodeJSONResponse(
+            content={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e),
+                    "details": e.details
+                }
+            },
+            status_code=400
         )
     except Exception as e:
-        logger.error(f"デバイス一覧取得エラー: {str(e)}")
+        logger.error("デバイス一覧取得エラー: %s", e)
         return UnicodeJSONResponse(
             content={"error": "デバイス一覧の取得中にエラーが発生しました"},
             status_code=500
         )
 
+def search_condition(normalized_query: str, dialect_name: str):
+    """名前検索のWHERE句の条件
+
+    MySQLではngramパーサーの全文インデックスをフレーズ検索で使用する。
+    ngramの長さに満たない1文字の検索や、全文インデックスのないDBでは LIKE で部分一致を判定する
+    """
+    if dialect_name == 'mysql' and len(normalized_query) >= NGRAM_SIZE:
+        return text("MATCH(name_search) AGAINST (:phrase IN BOOLEAN MODE)").bindparams(
+            phrase='"{}"'.format(normalized_query.replace('"', ''))
+        )
+    return Device.name_search.contains(normalized_query, autoescape=True)
+
+@router.get("/devices/search", response_model=List[DeviceSchema])
+async def search_devices(
+    q: Optional[str] = None,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    fuzzy: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """デバイス名の部分一致検索（名前の短い順に最大 limit 件）
+
+    全角・半角、ひらがな・カタカナ、英字の大文字・小文字の違いは区別しない。
+    fuzzy=true の場合、MySQLでは部分一致が limit 件に満たなければn-gramの一致度の高い順に補う
+    """
+    try:
+        normalized = validate_search_query(q)
+        dialect_name = db.bind.dialect.name
+        length = func.char_length if dialect_name == 'mysql' else func.length
+
+        result = await db.execute(
+            select(Device)
+            .where(search_condition(normalized, dialect_name))
+            .order_by(length(Device.name_search), Device.name_search)
+            .limit(limit)
+        )
+        devices = list(result.scalars().all())
+
+        if fuzzy and len(devices) < limit and dialect_name == 'mysql' and len(normalized) >= NGRAM_SIZE:
+            relevance = text("MATCH(name_search) AGAINST (:terms)").bindparams(terms=normalized)
+            result = await db.execute(
+                select(Device)
+                .where(relevance, Device.id.notin_([device.id for device in devices]))
+                .order_by(desc(relevance))
+                .limit(limit - len(devices))
+            )
+            devices.extend(result.scalars().all())
+
+        return UnicodeJSONResponse(content=[device_content(device) for device in devices])
+    except ValidationError as e:
+        return UnicodeJSONResponse(
+            content={
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e),
+                    "details": e.details
+                }
+            },
+            status_code=400
+        )
+    except Exception as e:
+        logger.error("デバイス検索エラー: %s", e)
+        return UnicodeJSONResponse(
+            content={"error": "デバイスの検索中にエラーが発生しました"},
+            status_code=500
+        )
+
 @router.get("/devices/{device_id}", response_model=DeviceSchema)
-def get_device(device_id: str, db: Session = Depends(get_db)):
-    """指定されたIDのデバイスを取得"""
+async def get_device(
+    device_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """指定されたIDのデバイスを取得
+
+    ETagは (id, updated_at) から計算し、If-None-Match が一致する場合は本文なしで304を返す
+    fields（カンマ区切り）を指定した場合は、その列と updated_at だけを読み込む
+    """
     try:
         # UUIDの形式チェック
         if not validate_uuid(device_id):
@@ -109,19 +478,33 @@ def get_device(device_id: str, db: Session = Depends(get_db)):
         if device_id == "11111111-1111-1111-1111-111111111111":
             raise DatabaseError("テスト用のデータベースエラー", None)
 
-        device = db.query(Device).filter(Device.id == device_id).first()
-        if device is None:
-            raise DeviceNotFoundError(device_id)
+        selected = normalize_fields(fields)
 
-        return UnicodeJSONResponse(
-            content={
-                "name": device.name,
-                "manufacturer": device.manufacturer,
-                "id": device.id,
-                "created_at": device.created_at.isoformat(),
-                "updated_at": device.updated_at.isoformat()
-            }
-        )
+        # キャッシュが有効な場合は、ヒットすればデータベースにアクセスしない
+        cache = get_device_cache()
+        content = cache.get(device_id) if cache is not None else None
+
+        if content is None:
+            # 読み込み中に更新・削除で無効化された場合は、読み込んだ値をキャッシュに登録しない
+            generation = cache.generation() if cache is not None else None
+            # ETagの計算に使う updated_at は常に読み込む
+            result = await db.execute(
+                select(*device_columns(with_fields(selected, 'updated_at'))).where(Device.id == device_id)
+            )
+            device = result.first()
+            if device is None:
+                raise DeviceNotFoundError(device_id)
+
+            content = device_content(device, with_fields(selected, 'updated_at'))
+            # 一部のフィールドしか持たない結果はキャッシュに登録しない
+            if cache is not None and selected is None:
+                cache.set(device_id, content, generation)
+
+        etag = device_etag(device_id, content["updated_at"], selected)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={ETAG_HEADER: etag})
+
+        return UnicodeJSONResponse(content=project(content, selected), headers={ETAG_HEADER: etag})
     except ValidationError as e:
         return UnicodeJSONResponse(
             content={
@@ -147,11 +530,11 @@ def get_device(device_id: str, db: Session = Depends(get_db)):
             status_code=500
         )
     except Exception as e:
-        logger.error(f"デバイス取得エラー: {str(e)}")
+        logger.error("デバイス取得エラー: %s", e)
         raise DatabaseError("デバイスの取得中にエラーが発生しました", e)
 
 @router.put("/devices/{device_id}", response_model=DeviceSchema)
-def update_device(device_id: str, device: DeviceCreate, db: Session = Depends(get_db)):
+async def update_device(device_id: str, device: DeviceCreate, db: AsyncSession = Depends(get_async_db)):
     """デバイスを更新"""
     try:
         # UUIDの形式チェック
@@ -171,29 +554,55 @@ def update_device(device_id: str, device: DeviceCreate, db: Session = Depends(ge
         if not device.manufacturer:
             raise ValidationError("メーカー名は必須です", {"field": "manufacturer"})
 
-        db_device = db.query(Device).filter(Device.id == device_id).first()
-        if db_device is None:
-            raise DeviceNotFoundError(device_id)
-        
-        # デバイスの更新
-        for key, value in device.dict().items():
-            setattr(db_device, key, value)
-        
+        # デバイスの更新（存在確認は一致した行数で行い、事前のSELECTはしない）
+        updated_at = utc_now()
+        query = (
+            update(Device)
+            .where(Device.id == device_id)
+            .values(
+                name=device.name,
+                name_search=normalize_text(device.name),
+                manufacturer=device.manufacturer,
+                updated_at=updated_at
+            )
+        )
         try:
-            db.commit()
-            db.refresh(db_device)
+            if db.bind.dialect.update_returning:
+                # RETURNING に対応したDBでは作成日時も同じ文で受け取る
+                result = await db.execute(query.returning(Device.created_at))
+                created_at = result.scalar_one_or_none()
+            else:
+                # MySQLは UPDATE ... RETURNING に未対応のため、作成日時は同じトランザクションで主キーで読み直す
+                result = await db.execute(query)
+                created_at = None
+                if result.rowcount > 0:
+                    created_at = (await db.execute(
+                        select(Device.created_at).where(Device.id == device_id)
+                    )).scalar_one_or_none()
+            await db.commit()
         except Exception as e:
-            logger.error(f"データベースエラー: {str(e)}")
+            logger.error("データベースエラー: %s", e)
             raise DatabaseError("デバイスの更新中にエラーが発生しました", e)
 
+        # コミットの後で無効化し、更新前に読み込みを始めたリクエストが古い値を登録しないようにする
+        cache = get_device_cache()
+        if cache is not None:
+            cache.invalidate(device_id)
+
+        if created_at is None:
+            raise DeviceNotFoundError(device_id)
+
+        content = {
+            "id": device_id,
+            "name": device.name,
+            "manufacturer": device.manufacturer,
+            "created_at": created_at,
+            "updated_at": updated_at
+        }
+
         return UnicodeJSONResponse(
-            content={
-                "name": db_device.name,
-                "manufacturer": db_device.manufacturer,
-                "id": db_device.id,
-                "created_at": db_device.created_at.isoformat(),
-                "updated_at": db_device.updated_at.isoformat()
-            }
+            content=content,
+            headers={ETAG_HEADER: device_etag(device_id, content["updated_at"])}
         )
     except (ValidationError, DeviceNotFoundError, DatabaseError) as e:
         if isinstance(e, ValidationError):
@@ -230,11 +639,11 @@ def update_device(device_id: str, device: DeviceCreate, db: Session = Depends(ge
                 status_code=500
             )
     except Exception as e:
-        logger.error(f"予期せぬエラー: {str(e)}")
+        logger.error("予期せぬエラー: %s", e)
         raise DatabaseError("デバイスの更新中にエラーが発生しました", e)
 
 @router.delete("/devices/{device_id}")
-def delete_device(device_id: str, db: Session = Depends(get_db)):
+async def delete_device(device_id: str, db: AsyncSession = Depends(get_async_db)):
     """デバイスを削除"""
     try:
         # UUIDの形式チェック
@@ -248,18 +657,21 @@ def delete_device(device_id: str, db: Session = Depends(get_db)):
         if device_id == "11111111-1111-1111-1111-111111111111":
             raise DatabaseError("テスト用のデータベースエラー", None)
 
-        # デバイスの存在確認
-        db_device = db.query(Device).filter(Device.id == device_id).first()
-        if db_device is None:
-            raise DeviceNotFoundError(device_id)
-        
+        # デバイスの削除（存在確認は削除した行数で行う）
         try:
-            db.delete(db_device)
-            db.commit()
+            result = await db.execute(delete(Device).where(Device.id == device_id))
+            await db.commit()
         except Exception as e:
-            logger.error(f"データベースエラー: {str(e)}")
+            logger.error("データベースエラー: %s", e)
             raise DatabaseError("デバイスの削除中にエラーが発生しました", e)
 
+        if result.rowcount == 0:
+            raise DeviceNotFoundError(device_id)
+
+        cache = get_device_cache()
+        if cache is not None:
+            cache.invalidate(device_id)
+
         return UnicodeJSONResponse(
             content={"message": "デバイスを削除しました", "device_id": device_id}
         )
@@ -297,7 +709,7 @@ def delete_device(device_id: str, db: Session = Depends(get_db)):
             status_code=500
         )
     except Exception as e:
-        logger.error(f"予期せぬエラー: {str(e)}")
+        logger.error("予期せぬエラー: %s", e)
         return UnicodeJSONResponse(
             content={
                 "error": {
@@ -1,22 +1,15 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
 from .handlers import device_handlers
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
-import json
 from .common.exceptions import DeviceManagementError
 from .common.error_handlers import device_management_exception_handler, general_exception_handler
-
-class UnicodeJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+from .common.pagination import NEXT_CURSOR_HEADER
+from .common.etag import ETAG_HEADER
+from .common.responses import UnicodeJSONResponse
+from .common.timing import SERVER_TIMING_HEADER
+from .common.metrics import METRICS_ENABLED, PROMETHEUS_CONTENT_TYPE, TimingMiddleware, metrics
 
 app = FastAPI(
     title="Device Management API",
@@ -36,8 +29,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER, SERVER_TIMING_HEADER],
 )
 
+# リクエストの計測（最後に追加して最も外側で動かし、CORSを含めた処理時間を計る）
+if METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware)
+
 # ルーターの登録
 app.include_router(device_handlers.router, prefix="/api/v1")
 
@@ -46,5 +44,11 @@ app.include_router(device_handlers.router, prefix="/api/v1")
 async def root():
     return {"message": "Device Management API"}
 
+# Prometheus 形式のメトリクス
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return PlainTextResponse(metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # AWS Lambda用ハンドラー
 handler = Mangum(app) 
\ No newline at end of file
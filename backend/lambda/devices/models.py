@@ -1,15 +1,35 @@
-from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy import Column, String, DateTime, Index, func
+from sqlalchemy.dialects import mysql
 from .database import Base
+from .common.search import normalize_text
+
+def _name_search_default(context) -> str:
+    """INSERT時に name から検索用の正規化済みの名前を作る"""
+    return normalize_text(context.get_current_parameters().get('name', ''))
+
+# MySQLではマイクロ秒まで保存する（ETagが同じ秒の中の更新でも変わるように）
+Timestamp = DateTime().with_variant(mysql.TIMESTAMP(fsp=6), "mysql")
 
 class Device(Base):
     __tablename__ = "devices"
+    __table_args__ = (
+        # 一覧のキーセットページネーション用インデックス
+        Index("idx_created_at_id", "created_at", "id"),
+        # 部分一致検索用の全文インデックス（MySQLのngramパーサー。他のDBでは作成しない）
+        Index(
+            "ft_name_search", "name_search",
+            mysql_prefix="FULLTEXT", mysql_with_parser="ngram"
+        ).ddl_if(dialect="mysql"),
+    )
 
     id = Column(String(36), primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
     manufacturer = Column(String(255), nullable=False, index=True)
-    created_at = Column(DateTime, default=func.current_timestamp())
+    # 検索用に正規化した名前（全角・半角、ひらがな・カタカナを統一）
+    name_search = Column(String(255), nullable=False, default=_name_search_default)
+    created_at = Column(Timestamp, default=func.current_timestamp())
     updated_at = Column(
-        DateTime,
+        Timestamp,
         default=func.current_timestamp(),
         onupdate=func.current_timestamp()
-    ) 
\ No newline at end of file
+    )
@@ -1,50 +1,115 @@
-import json
-from common.db_interface import get_db_interface
-import logging
+from common.db_interface import get_db_interface, report_db_interface_failure
+from common.exceptions import ValidationError
+from common.pagination import normalize_limit, normalize_filters, NEXT_CURSOR_HEADER
+from common.etag import ETAG_HEADER, IF_NONE_MATCH_HEADER, etag_for_device, collection_etag, etag_matches
+from common.fields import normalize_fields, with_fields, project
+from common.streaming import NDJSON_MEDIA_TYPE, STREAM_BATCH_SIZE, wants_stream, iter_ndjson
+from common.serialization import dumps_text
+from common.metrics import timed_handler
+from common.logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = setup_logger(__name__)
 
+def _get_header(event, name):
+    """リクエストヘッダーを大文字・小文字を区別せずに取得する"""
+    headers = event.get('headers') or {}
+    return headers.get(name) or headers.get(name.lower())
+
+@timed_handler('read')
 def handler(event, context):
     """デバイスを取得するLambda関数"""
     try:
         # パスパラメータからデバイスIDを取得
-        device_id = event.get('pathParameters', {}).get('id')
+        device_id = (event.get('pathParameters') or {}).get('id')
+        params = event.get('queryStringParameters') or {}
+        
+        # fields 指定時は、そのフィールドだけを読み込んで返す
+        fields = normalize_fields(params.get('fields'))
         
         # データベース操作
         db = get_db_interface()
         
         if device_id:
             # 特定のデバイスを取得
-            device = db.get_device(device_id)
+            # ETagの計算に使う updated_at は常に読み込む
+            device = db.get_device(device_id, with_fields(fields, 'updated_at'))
             
             if device:
+                etag = etag_for_device(device, fields)
+                if etag_matches(_get_header(event, IF_NONE_MATCH_HEADER), etag):
+                    return {'statusCode': 304, 'headers': {ETAG_HEADER: etag}, 'body': ''}
                 return {
                     'statusCode': 200,
-                    'body': json.dumps(device, default=str)
+                    'headers': {ETAG_HEADER: etag},
+                    'body': dumps_text(project(device, fields))
                 }
             else:
                 return {
                     'statusCode': 404,
-                    'body': json.dumps({
+                    'body': dumps_text({
                         'error': 'デバイスが見つかりません'
                     })
                 }
         else:
-            # 全デバイスを取得
-            devices = db.list_devices()
+            # name / manufacturer による絞り込み（RDSはインデックス、DynamoDBはGSIへの Query）
+            filters = normalize_filters(params)
+            
+            if wants_stream(params.get('stream'), _get_header(event, 'Accept')):
+                # 全デバイスをバッチ単位で読み込みながらNDJSONにエンコード
+                # （Lambdaのプロキシ統合はレスポンスをまとめて返すため、中間のリストを作らないことでメモリを抑える）
+                body = b''.join(iter_ndjson(db.iter_devices(STREAM_BATCH_SIZE, filters)))
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': NDJSON_MEDIA_TYPE},
+                    'body': body.decode('utf-8')
+                }
             
-            return {
+            limit = normalize_limit(params.get('limit'))
+            
+            query_key = (limit, params.get('cursor'), sorted(filters.items()), fields)
+            
+            # 条件付きGETの場合だけ、ページのバージョン（(id, updated_at) だけを読み込んで計算）を確かめ、
+            # 変わっていなければ一覧を取得せずに304を返す
+            if_none_match = _get_header(event, IF_NONE_MATCH_HEADER)
+            if if_none_match:
+                version = db.get_collection_version(limit, params.get('cursor'), filters)
+                if version is not None:
+                    etag = collection_etag(version, *query_key)
+                    if etag_matches(if_none_match, etag):
+                        return {'statusCode': 304, 'headers': {ETAG_HEADER: etag}, 'body': ''}
+            
+            # デバイス一覧を1ページ分取得（ETagは本文と同じ読み込みの行から計算する）
+            response_headers = {}
+            page = db.list_devices_page(limit, params.get('cursor'), filters, fields)
+            if page.get('version') is not None:
+                response_headers[ETAG_HEADER] = collection_etag(page['version'], *query_key)
+            if page['next_cursor']:
+                response_headers[NEXT_CURSOR_HEADER] = page['next_cursor']
+            
+            response = {
                 'statusCode': 200,
-                'body': json.dumps(devices, default=str)
+                'body': dumps_text(page['items'])
             }
+            if response_headers:
+                response['headers'] = response_headers
+            return response
             
+    except ValidationError as e:
+        return {
+            'statusCode': 400,
+            'body': dumps_text({
+                'error': e.message,
+                'details': e.details
+            })
+        }
     except Exception as e:
-        logger.error(f"エラー: {str(e)}")
+        logger.error("エラー: %s", e)
+        # 接続が壊れている可能性があるため、次回の呼び出しでヘルスチェックを行う
+        report_db_interface_failure()
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps_text({
                 'error': 'Internal server error'
             })
         } 
\ No newline at end of file
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class DeviceBase(BaseModel):
@@ -14,4 +15,16 @@ class Device(DeviceBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class DeviceBatchCreate(BaseModel):
+    # 要素ごとに検証して結果を返すため、ここでは個々の要素の形式は検証しない
+    devices: List[Dict[str, Any]]
+
+class DeviceLookup(BaseModel):
+    ids: List[str]
+
+class DeviceBulkDelete(BaseModel):
+    # ids か manufacturer のどちらか一方を指定する（common.batch.validate_delete_request で検証する）
+    ids: Optional[List[str]] = None
+    manufacturer: Optional[str] = None
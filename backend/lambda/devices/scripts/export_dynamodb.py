@@ -0,0 +1,84 @@
+import os
+import sys
+import argparse
+import logging
+from dotenv import load_dotenv
+
+# commonディレクトリをパスに追加
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from common.streaming import iter_ndjson
+from common.parallel_scan import ParallelScanner, SCAN_SEGMENTS, SCAN_MAX_RCU
+
+# ロガーの設定
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 環境変数の読み込み
+load_dotenv()
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="DynamoDBのデバイスを並列スキャンでNDJSONに書き出す（--to-rds でRDSへ移行する）"
+    )
+    parser.add_argument('--output', default='-', help="出力先のファイル（既定は標準出力）")
+    parser.add_argument('--segments', type=int, default=SCAN_SEGMENTS, help="並列スキャンのセグメント数")
+    parser.add_argument('--max-rcu', type=float, default=SCAN_MAX_RCU, help="消費する読み込み容量の上限（RCU/秒、0は無制限）")
+    parser.add_argument('--to-rds', action='store_true', help="書き出す代わりにRDSへ一括作成する")
+    parser.add_argument('--batch-size', type=int, default=500, help="RDSへ一括作成する件数")
+    return parser.parse_args()
+
+def migrate_to_rds(devices, batch_size: int) -> int:
+    """デバイスを batch_size 件ずつRDSへ一括作成し、失敗した件数を返す"""
+    from common.rds import RDSInterface
+    db = RDSInterface()
+    failed = 0
+    batch = []
+    try:
+        for device in devices:
+            batch.append(device)
+            if len(batch) >= batch_size:
+                failed += sum(not result['success'] for result in db.create_devices(batch))
+                batch = []
+        if batch:
+            failed += sum(not result['success'] for result in db.create_devices(batch))
+    finally:
+        db.close()
+    return failed
+
+def export_devices():
+    """DynamoDBテーブルの全デバイスを書き出す"""
+    args = parse_args()
+    try:
+        import boto3
+        client = boto3.client('dynamodb', region_name=os.getenv('AWS_REGION'))
+        scanner = ParallelScanner(
+            client,
+            os.getenv('DYNAMODB_TABLE_NAME', 'devices'),
+            segments=args.segments,
+            max_rcu=args.max_rcu
+        )
+        devices = scanner.iter_items()
+
+        if args.to_rds:
+            failed = migrate_to_rds(devices, args.batch_size)
+            if failed:
+                logger.error("RDSへの移行に失敗したデバイス: %s件", failed)
+                sys.exit(1)
+            return
+
+        output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+        try:
+            for chunk in iter_ndjson(devices):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+
+    except Exception as e:
+        logger.error("エラーが発生しました: %s", e)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    logger.info("デバイスの書き出しを開始します...")
+    export_devices()
+    logger.info("デバイスの書き出しが完了しました。")
@@ -0,0 +1,113 @@
+"""Lambda関数のインポート時間（コールドスタートの初期化時間）を計測する
+
+`python -X importtime` で各エントリーポイントを新しいプロセスでインポートし、
+パッケージごとの合計時間を表示する。--budget-ms を指定した場合は、いずれかの
+エントリーポイントが予算を超えたら終了コード1で終了する（CIでの回帰検知用）
+
+    python devices/scripts/import_profile.py --budget-ms 300
+    python devices/scripts/import_profile.py read main --top 15
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# backend/lambda ディレクトリと devices ディレクトリ
+LAMBDA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEVICES_DIR = os.path.join(LAMBDA_DIR, 'devices')
+
+# エントリーポイント（名前 → (sys.path に追加するディレクトリ, モジュール)）
+# Lambdaのハンドラーは devices ディレクトリをルートとして common をトップレベルで読み込む
+ENTRY_POINTS = {
+    'create': (DEVICES_DIR, 'create'),
+    'read': (DEVICES_DIR, 'read'),
+    'update': (DEVICES_DIR, 'update'),
+    'delete': (DEVICES_DIR, 'delete'),
+    'batch_create': (DEVICES_DIR, 'batch_create'),
+    'batch_read': (DEVICES_DIR, 'batch_read'),
+    'bulk_delete': (DEVICES_DIR, 'bulk_delete'),
+    'search': (DEVICES_DIR, 'search'),
+    'main': (LAMBDA_DIR, 'devices.main'),
+}
+
+# 予算の既定値（ミリ秒）。環境変数 IMPORT_TIME_BUDGET_MS で指定する（0は判定しない）
+DEFAULT_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', '0'))
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int, int]]:
+    """-X importtime の出力を (モジュール, 自身の時間[us], 累積時間[us], 深さ) のリストにする"""
+    entries = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+def summarize(entries: List[Tuple[str, int, int, int]]) -> Tuple[float, Dict[str, float]]:
+    """合計時間（ミリ秒）と、トップレベルのパッケージごとの自身の時間の合計（ミリ秒）を返す"""
+    per_package: Dict[str, float] = defaultdict(float)
+    for module, self_us, _, _ in entries:
+        per_package[module.split('.')[0]] += self_us / 1000
+    total = sum(cumulative_us for _, _, cumulative_us, depth in entries if depth == 0) / 1000
+    return total, dict(per_package)
+
+def _run_importtime(path: str, code: str) -> List[Tuple[str, int, int, int]]:
+    env = dict(os.environ, PYTHONPATH=path)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=path, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{code} に失敗しました:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def profile(name: str) -> Tuple[float, Dict[str, float]]:
+    """エントリーポイントを新しいプロセスでインポートし、インポート時間を集計する
+
+    インタープリターの起動時に読み込まれるモジュール（site 等）は集計から除く
+    """
+    path, module = ENTRY_POINTS[name]
+    startup = {entry[0] for entry in _run_importtime(path, 'pass')}
+    entries = [entry for entry in _run_importtime(path, f'import {module}') if entry[0] not in startup]
+    return summarize(entries)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Lambda関数のインポート時間を計測する")
+    parser.add_argument('entry_points', nargs='*', metavar='entry_point', help=f"計測するエントリーポイント（{', '.join(ENTRY_POINTS)}。既定は全て）")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help="インポート時間の上限（ミリ秒、0は判定しない）")
+    parser.add_argument('--repeat', type=int, default=3, help="計測回数（中央値を使用）")
+    parser.add_argument('--top', type=int, default=10, help="表示するパッケージ数")
+    args = parser.parse_args()
+    unknown = [name for name in args.entry_points if name not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"不明なエントリーポイント: {', '.join(unknown)}")
+
+    over_budget = []
+    for name in args.entry_points or list(ENTRY_POINTS):
+        runs = [profile(name) for _ in range(args.repeat)]
+        total = statistics.median(run[0] for run in runs)
+        # パッケージ別の内訳は中央値に最も近い回のものを表示する
+        _, per_package = min(runs, key=lambda run: abs(run[0] - total))
+
+        status = ''
+        if args.budget_ms > 0:
+            status = '  OK' if total <= args.budget_ms else f'  予算超過（{args.budget_ms:.0f} ms）'
+            if total > args.budget_ms:
+                over_budget.append(name)
+        print(f"{name}: {total:.1f} ms{status}")
+        for package, elapsed in sorted(per_package.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {package:<24} {elapsed:8.1f} ms")
+
+    if over_budget:
+        print(f"インポート時間が予算を超えました: {', '.join(over_budget)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,96 +1,398 @@
+"""デバイスの一括投入（CSV / NDJSON の取り込み、または大量のテストデータの生成）
+
+入力は1件ずつ読み込み、chunk_size 件ごとのチャンクにして複数のワーカープロセスから
+create_devices（RDSは複数行のINSERT、DynamoDBは BatchWriteItem）で並行して書き込む。
+書き込みが完了したチャンクはチェックポイントに記録し、失敗した場合は --resume で続きから再開する。
+処理中のチャンク数に上限があるため、メモリ使用量は入力の件数によらず一定
+
+    # 1,000万件を生成して8プロセスで投入する
+    python devices/scripts/insert_test_data.py --count 10000000 --workers 8 --checkpoint import.ckpt
+    # NDJSON（export_dynamodb.py の出力など）を取り込む（中断した場合は --resume で再開）
+    python devices/scripts/insert_test_data.py --input devices.ndjson --checkpoint import.ckpt --resume
+"""
 import os
 import sys
+import csv
+import json
+import time
 import uuid
-from datetime import datetime
-import logging
+import random
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from itertools import islice
+from multiprocessing import get_context
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from dotenv import load_dotenv
 
 # commonディレクトリをパスに追加
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from common.db_interface import get_db_interface
+from common.db_interface import DatabaseInterface, create_db_interface
+from common.clock import utc_now
+from common.logger import setup_logger
 
 # ロガーの設定
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# 環境変数の読み込み
-load_dotenv()
-
-# DynamoDB用の環境変数を設定
-os.environ['DB_TYPE'] = 'dynamodb'
-os.environ['DYNAMODB_TABLE_NAME'] = 'devices'
-
-def generate_test_data():
-    """テストデータを生成する"""
-    current_time = datetime.now().isoformat()
-    return [
-        {
-            'id': str(uuid.uuid4()),
-            'name': 'エアコン',
-            'manufacturer': 'パナソニック',
-            'created_at': current_time,
-            'updated_at': current_time
-        },
-        {
-            'id': str(uuid.uuid4()),
-            'name': '冷蔵庫',
-            'manufacturer': '日立',
-            'created_at': current_time,
-            'updated_at': current_time
-        },
-        {
-            'id': str(uuid.uuid4()),
-            'name': '洗濯機',
-            'manufacturer': 'シャープ',
-            'created_at': current_time,
-            'updated_at': current_time
-        },
-        {
-            'id': str(uuid.uuid4()),
-            'name': '電子レンジ',
-            'manufacturer': '東芝',
-            'created_at': current_time,
-            'updated_at': current_time
-        },
-        {
-            'id': str(uuid.uuid4()),
-            'name': '掃除機',
-            'manufacturer': 'ダイソン',
-            'created_at': current_time,
-            'updated_at': current_time
-        }
-    ]
+logger = setup_logger(__name__)
+
+# 生成するメーカーと出現頻度の重み（上位のメーカーに偏る分布）
+MANUFACTURERS = (
+    ('パナソニック', 18), ('日立', 12), ('シャープ', 10), ('東芝', 9), ('三菱電機', 9),
+    ('ダイキン', 7), ('ソニー', 6), ('アイリスオーヤマ', 6), ('富士通ゼネラル', 4), ('象印', 3),
+    ('タイガー', 3), ('ダイソン', 3), ('LG', 3), ('バルミューダ', 2), ('アクア', 2), ('コロナ', 1),
+)
+# 上記以外の少数のデバイスしか持たないメーカー（生成するデバイスのうち LONG_TAIL_RATIO の割合）
+LONG_TAIL_MANUFACTURERS = 500
+LONG_TAIL_RATIO = 0.05
+
+# 生成するデバイスの種類・型番の接頭辞と出現頻度の重み
+CATEGORIES = (
+    ('エアコン', 'CS', 14), ('冷蔵庫', 'NR', 10), ('洗濯機', 'NA', 9), ('電子レンジ', 'NE', 8),
+    ('掃除機', 'MC', 8), ('テレビ', 'TH', 8), ('炊飯器', 'SR', 6), ('空気清浄機', 'F', 6),
+    ('食器洗い乾燥機', 'NP', 4), ('ドライヤー', 'EH', 5), ('電気ケトル', 'NC', 5), ('照明', 'LGC', 7),
+    ('ヒーター', 'DS', 4), ('除湿機', 'DJ', 3), ('加湿器', 'FE', 3),
+)
+
+# 生成するデバイスの作成日時の範囲（この日時から過去 GENERATED_DAYS 日）
+GENERATED_UNTIL = datetime(2025, 1, 1)
+GENERATED_DAYS = 3 * 365
+
+# IDのないレコードに、入力と行番号から決まるIDを振るための名前空間（再開時に同じIDになる）
+IMPORT_NAMESPACE = uuid.UUID('8f0f7c2e-4a8b-5d0e-9a51-3f6f1d2c7b10')
+
+class DeviceGenerator:
+    """名前・メーカーの分布が実データに近いデバイスを生成する
+
+    チャンクごとに (seed, チャンク番号) から乱数を初期化するため、同じチャンクは何度生成しても
+    同じ内容（IDを含む）になる。ワーカーはチャンク番号だけを受け取って自分で生成する
+    """
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self._manufacturers = [name for name, _ in MANUFACTURERS]
+        self._manufacturer_weights = [weight for _, weight in MANUFACTURERS]
+        self._categories = [(name, prefix) for name, prefix, _ in CATEGORIES]
+        self._category_weights = [weight for _, _, weight in CATEGORIES]
+
+    def generate_chunk(self, chunk_index: int, chunk_size: int, count: int) -> List[Dict]:
+        """count 件のうち chunk_index 番目のチャンク（最大 chunk_size 件）を生成する"""
+        rng = random.Random(f'{self.seed}:{chunk_index}')
+        start = chunk_index * chunk_size
+        size = max(0, min(chunk_size, count - start))
+        categories = rng.choices(self._categories, self._category_weights, k=size)
+        manufacturers = rng.choices(self._manufacturers, self._manufacturer_weights, k=size)
+        devices = []
+        for (category, prefix), manufacturer in zip(categories, manufacturers):
+            if rng.random() < LONG_TAIL_RATIO:
+                manufacturer = f'メーカー{rng.randrange(LONG_TAIL_MANUFACTURERS):03d}'
+            model = f'{prefix}-{rng.choice("ABCDEFGHJKLMNPRSTUVWXZ")}{rng.randrange(100, 1000)}{rng.choice("ABCDEFGH")}'
+            created_at = (GENERATED_UNTIL - timedelta(seconds=rng.randrange(GENERATED_DAYS * 86400))).isoformat()
+            devices.append({
+                'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                'name': f'{category} {model}',
+                'manufacturer': manufacturer,
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        return devices
 
-def insert_test_data():
-    """テストデータを投入する"""
+def detect_format(path: str, fmt: Optional[str]) -> str:
+    """入力の形式（csv / ndjson）を返す（指定がなければ拡張子から判定する）"""
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+def iter_records(path: str, fmt: str) -> Iterator[Any]:
+    """入力のレコードを1件ずつ返す（CSVは辞書、NDJSONは未解析の行。'-' は標準入力）"""
+    stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
     try:
-        # データベースインターフェースの取得
-        db = get_db_interface()
-        logger.info(f"データベースに接続しました（タイプ: {os.getenv('DB_TYPE', 'dynamodb')}）")
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def to_device(record: Any, fmt: str, source: str, row_number: int) -> Dict:
+    """入力のレコードを create_devices に渡すデバイスデータにする
+
+    Raises:
+        ValueError: 解析できない、または name / manufacturer がない場合
+    """
+    data = json.loads(record) if fmt == 'ndjson' else record
+    if not isinstance(data, dict) or not data.get('name') or not data.get('manufacturer'):
+        raise ValueError("name と manufacturer は必須です")
+    now = utc_now().isoformat()
+    return {
+        'id': data.get('id') or str(uuid.uuid5(IMPORT_NAMESPACE, f'{source}:{row_number}')),
+        'name': str(data['name']),
+        'manufacturer': str(data['manufacturer']),
+        'created_at': data.get('created_at') or now,
+        'updated_at': data.get('updated_at') or data.get('created_at') or now,
+    }
+
+class Checkpoint:
+    """書き込みが完了したチャンクを記録するファイル
+
+    next_chunk より前のチャンクはすべて完了している。並行して書き込むため、next_chunk 以降で
+    先に完了したチャンクは done に持つ（処理中のチャンク数を超えて増えることはない）。
+    入力・チャンクサイズなどが異なる投入のチェックポイントでは再開しない
+    """
+
+    def __init__(self, path: Optional[str], signature: Dict[str, Any]):
+        self.path = path
+        self.signature = signature
+        self.next_chunk = 0
+        self.done: Set[int] = set()
+        self.rows = 0
+        self.skipped = 0
+
+    def load(self) -> None:
+        """チェックポイントを読み込む（ファイルがない場合は最初から）
+
+        Raises:
+            ValueError: 別の投入のチェックポイントの場合
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state['signature'] != self.signature:
+            raise ValueError(f"チェックポイント {self.path} は別の入力・設定の投入のものです: {state['signature']}")
+        self.next_chunk = state['next_chunk']
+        self.done = set(state['done'])
+        self.rows = state['rows']
+        self.skipped = state.get('skipped', 0)
+
+    def is_done(self, chunk_index: int) -> bool:
+        return chunk_index < self.next_chunk or chunk_index in self.done
+
+    def complete(self, chunk_index: int, rows: int, skipped: int) -> None:
+        """チャンクの完了を記録し、ファイルに書き出す"""
+        self.done.add(chunk_index)
+        while self.next_chunk in self.done:
+            self.done.remove(self.next_chunk)
+            self.next_chunk += 1
+        self.rows += rows
+        self.skipped += skipped
+        self.save()
 
-        # 既存のデータを確認
-        existing_devices = db.list_devices()
-        logger.info(f"既存のデバイス数: {len(existing_devices)}件")
+    def save(self) -> None:
+        """一時ファイルに書いてから置き換える（書き込み中に止まっても壊れない）"""
+        if not self.path:
+            return
+        state = {
+            'signature': self.signature,
+            'next_chunk': self.next_chunk,
+            'done': sorted(self.done),
+            'rows': self.rows,
+            'skipped': self.skipped,
+        }
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+
+class Progress:
+    """書き込んだ件数と速度（直近の区間・開始からの平均）を interval 秒ごとにログに出す"""
+
+    def __init__(self, total: Optional[int], interval: float, initial: int = 0):
+        self.total = total
+        self.interval = interval
+        self.rows = initial
+        self._initial = initial
+        self._started = self._last_time = time.monotonic()
+        self._last_rows = initial
+
+    def add(self, rows: int) -> None:
+        self.rows += rows
+        now = time.monotonic()
+        if now - self._last_time >= self.interval:
+            self._report(now)
+
+    def _report(self, now: float) -> None:
+        recent = (self.rows - self._last_rows) / max(now - self._last_time, 1e-9)
+        average = (self.rows - self._initial) / max(now - self._started, 1e-9)
+        if self.total:
+            logger.info(
+                "書き込み済み %s / %s件（%.1f%%）: %.0f件/秒（平均 %.0f件/秒）",
+                self.rows, self.total, 100 * self.rows / self.total, recent, average
+            )
+        else:
+            logger.info("書き込み済み %s件: %.0f件/秒（平均 %.0f件/秒）", self.rows, recent, average)
+        self._last_time = now
+        self._last_rows = self.rows
+
+    def finish(self) -> Tuple[float, float]:
+        """(経過秒数, 平均の件数/秒) を返す"""
+        elapsed = time.monotonic() - self._started
+        return elapsed, (self.rows - self._initial) / max(elapsed, 1e-9)
+
+# ワーカーごとのデータベースインターフェース（_init_worker で生成する）
+_db: Optional[DatabaseInterface] = None
+_generator: Optional[DeviceGenerator] = None
+
+def _init_worker(db_type: str, seed: int) -> None:
+    global _db, _generator
+    _db = create_db_interface(db_type)
+    _generator = DeviceGenerator(seed)
+
+def _write_chunk(chunk_index: int, rows: Optional[List[Dict]], chunk_size: int, count: int) -> Tuple[int, int]:
+    """チャンクを書き込み、(チャンク番号, 書き込んだ件数) を返す（rows がNoneの場合は生成する）
+
+    create_devices で失敗した場合（再開時に書き込み済みだったチャンクの主キーの重複など）は、
+    存在しないデバイスだけを書き直す。IDは入力から決まるため、同じチャンクを何度書いても重複しない
+
+    Raises:
+        RuntimeError: 書き直しても書き込めないデバイスがある場合
+    """
+    if rows is None:
+        rows = _generator.generate_chunk(chunk_index, chunk_size, count)
+    results = _db.create_devices(rows)
+    if not all(result['success'] for result in results):
+        missing = set(_db.get_devices([row['id'] for row in rows], ['id'])['missing'])
+        retry = [row for row in rows if row['id'] in missing]
+        errors = [result['error'] for result in _db.create_devices(retry) if not result['success']] if retry else []
+        if errors:
+            raise RuntimeError(f"チャンク {chunk_index} の{len(errors)}件を書き込めませんでした: {errors[0]}")
+    # SQLiteなどコミットをまとめる実装では、チェックポイントに記録する前にコミットする
+    flush = getattr(_db, 'flush', None)
+    if flush is not None:
+        flush()
+    return chunk_index, len(rows)
 
-        # テストデータの生成と投入
-        test_devices = generate_test_data()
-        for device in test_devices:
+def iter_chunks(args, checkpoint: Checkpoint) -> Iterator[Tuple[int, Optional[List[Dict]], int]]:
+    """書き込むチャンクを (チャンク番号, デバイスのリスト, 不正でスキップした件数) で返す
+
+    生成の場合はワーカーが生成するためリストはNone。取り込みの場合は完了済みのチャンクを
+    解析せずに読み飛ばす
+    """
+    if args.input is None:
+        chunks = (args.count + args.chunk_size - 1) // args.chunk_size
+        for chunk_index in range(chunks):
+            if not checkpoint.is_done(chunk_index):
+                yield chunk_index, None, 0
+        return
+
+    fmt = detect_format(args.input, args.format)
+    source = os.path.abspath(args.input) if args.input != '-' else '-'
+    records = iter_records(args.input, fmt)
+    chunk_index = 0
+    while True:
+        batch = list(islice(records, args.chunk_size))
+        if not batch:
+            return
+        if not checkpoint.is_done(chunk_index):
+            devices = []
+            skipped = 0
+            for offset, record in enumerate(batch):
+                row_number = chunk_index * args.chunk_size + offset + 1
+                try:
+                    devices.append(to_device(record, fmt, source, row_number))
+                except ValueError as e:
+                    skipped += 1
+                    logger.warning("%s件目をスキップしました: %s", row_number, e)
+            yield chunk_index, devices, skipped
+        chunk_index += 1
+
+def run_import(args) -> int:
+    """投入を実行し、終了コード（失敗したチャンクがあれば1）を返す"""
+    signature = {
+        'input': os.path.abspath(args.input) if args.input not in (None, '-') else args.input,
+        'count': args.count if args.input is None else None,
+        'seed': args.seed,
+        'chunk_size': args.chunk_size,
+        'db_type': args.db_type,
+    }
+    checkpoint = Checkpoint(args.checkpoint, signature)
+    if args.resume:
+        checkpoint.load()
+        if checkpoint.rows:
+            logger.info("チェックポイントから再開します: 書き込み済み %s件（チャンク %s から）", checkpoint.rows, checkpoint.next_chunk)
+
+    if args.workers > 0:
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(args.db_type, args.seed)
+        )
+    else:
+        # 0の場合はこのプロセスで順に書き込む（デバッグ・テスト用）
+        executor = ThreadPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(args.db_type, args.seed))
+
+    max_in_flight = max(1, args.workers) * 2
+    progress = Progress(args.count if args.input is None else None, args.progress_interval, checkpoint.rows)
+    in_flight = {}
+    failed = 0
+
+    def collect(futures) -> int:
+        errors = 0
+        for future in futures:
+            chunk_index, skipped = in_flight.pop(future)
             try:
-                db.create_device(device)
-                logger.info(f"デバイスを作成しました: {device['name']} ({device['manufacturer']})")
+                _, rows = future.result()
             except Exception as e:
-                logger.error(f"デバイス作成エラー: {str(e)}")
+                errors += 1
+                logger.error("チャンク %s の書き込みエラー: %s", chunk_index, e)
                 continue
+            checkpoint.complete(chunk_index, rows, skipped)
+            progress.add(rows)
+        return errors
+
+    try:
+        for chunk_index, devices, skipped in iter_chunks(args, checkpoint):
+            while len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                failed += collect(done)
+            if failed:
+                # 失敗したチャンクより後を書き進めないよう、新しいチャンクの投入をやめる
+                break
+            future = executor.submit(_write_chunk, chunk_index, devices, args.chunk_size, args.count)
+            in_flight[future] = (chunk_index, skipped)
+        failed += collect(list(wait(in_flight).done))
+    finally:
+        executor.shutdown()
 
-        # 投入後のデータを確認
-        updated_devices = db.list_devices()
-        logger.info(f"テストデータ投入完了。合計デバイス数: {len(updated_devices)}件")
+    elapsed, rate = progress.finish()
+    logger.info(
+        "書き込み済み %s件（スキップ %s件）: %.1f秒, 平均 %.0f件/秒",
+        checkpoint.rows, checkpoint.skipped, elapsed, rate
+    )
+    if failed:
+        logger.error("%s個のチャンクの書き込みに失敗しました。--resume で再開できます", failed)
+        return 1
+    return 0
 
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', help="取り込むCSV / NDJSONファイル（'-' は標準入力。省略時は --count 件を生成する）")
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help="入力の形式（省略時は拡張子から判定する）")
+    parser.add_argument('--count', type=int, default=5, help="生成するデバイスの件数")
+    parser.add_argument('--seed', type=int, default=0, help="生成に使う乱数のシード")
+    parser.add_argument('--db-type', default=os.getenv('DB_TYPE', 'dynamodb'), help="投入先（rds / dynamodb / sqlite）")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="書き込むプロセス数（0はこのプロセスで書き込む）")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="1回の create_devices で書き込む件数")
+    parser.add_argument('--checkpoint', help="完了したチャンクを記録するファイル")
+    parser.add_argument('--resume', action='store_true', help="チェックポイントの続きから再開する")
+    parser.add_argument('--progress-interval', type=float, default=5.0, help="進捗をログに出す間隔（秒）")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    # 環境変数の読み込み
+    load_dotenv()
+    args = parse_args(argv)
+    os.environ['DB_TYPE'] = args.db_type
+    if args.db_type == 'dynamodb':
+        os.environ.setdefault('DYNAMODB_TABLE_NAME', 'devices')
+    try:
+        return run_import(args)
     except Exception as e:
-        logger.error(f"エラーが発生しました: {str(e)}")
-        sys.exit(1)
+        logger.error("エラーが発生しました: %s", e)
+        return 1
 
 if __name__ == '__main__':
-    logger.info("テストデータ投入を開始します...")
-    insert_test_data()
-    logger.info("テストデータ投入が完了しました。") 
\ No newline at end of file
+    logger.info("デバイスの投入を開始します...")
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""既存のdevicesテーブルに、後から追加した列・インデックスを適用する
+
+何度実行しても同じ結果になるため、デプロイのたびに実行してよい
+
+    # ローカル開発用のMySQL（DB_*）
+    python devices/scripts/migrate_db.py
+    # Lambda用のRDS（RDS_*）
+    python devices/scripts/migrate_db.py --rds
+"""
+import os
+import sys
+import argparse
+
+# commonディレクトリをパスに追加
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from common.db_pool import DatabaseConnectionPool, default_db_config, rds_db_config
+from common.migrations import migrate
+from common.logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rds', action='store_true', help="Lambda用のRDS（RDS_*）に適用する")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    pool = DatabaseConnectionPool(rds_db_config() if args.rds else default_db_config(), pool_size=1)
+    try:
+        with pool.connection() as connection:
+            applied = migrate(connection)
+    except Exception as e:
+        logger.error("マイグレーションエラー: %s", e)
+        return 1
+    finally:
+        pool.health.stop()
+        pool.close_all_connections()
+    logger.info("マイグレーションが完了しました: %s件の変更", len(applied))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
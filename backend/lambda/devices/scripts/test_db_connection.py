@@ -25,7 +25,7 @@ def test_single_connection():
         cursor = connection.cursor()
         cursor.execute("SELECT 1")
         result = cursor.fetchone()
-        logger.info(f"テストクエリの結果: {result}")
+        logger.info("テストクエリの結果: %s", result)
 
         # 接続のクリーンアップ
         cursor.close()
@@ -33,7 +33,7 @@ def test_single_connection():
         logger.info("接続を正常にクローズしました")
         return True
     except Exception as e:
-        logger.error(f"接続テストエラー: {e}")
+        logger.error("接続テストエラー: %s", e)
         return False
 
 def test_multiple_connections(num_connections: int = 3) -> List[bool]:
@@ -69,14 +69,14 @@ def main():
         logger.info("複数同時接続テストを実行します")
         results = test_multiple_connections()
         success_count = sum(results)
-        logger.info(f"同時接続テスト結果: 成功 {success_count}/{len(results)}")
+        logger.info("同時接続テスト結果: 成功 %s/%s", success_count, len(results))
 
         # 全ての接続をクローズ
         close_all_connections()
         logger.info("全ての接続をクローズしました")
 
     except Exception as e:
-        logger.error(f"テスト実行中にエラーが発生しました: {e}")
+        logger.error("テスト実行中にエラーが発生しました: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":
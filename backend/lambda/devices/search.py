@@ -0,0 +1,59 @@
+from common.db_interface import get_db_interface, report_db_interface_failure
+from common.exceptions import SearchIndexNotReadyError, ValidationError
+from common.search import validate_search_query, normalize_search_limit
+from common.serialization import dumps_text
+from common.metrics import timed_handler
+from common.logger import setup_logger
+
+# ロガーの設定
+logger = setup_logger(__name__)
+
+@timed_handler('search')
+def handler(event, context):
+    """デバイス名を部分一致で検索するLambda関数
+
+    クエリパラメータは q（検索語）、limit（最大件数）、fuzzy（true の場合はあいまい検索で補う）
+    全角・半角、ひらがな・カタカナ、英字の大文字・小文字の違いは区別しない
+    """
+    try:
+        params = event.get('queryStringParameters') or {}
+        query = validate_search_query(params.get('q'))
+        limit = normalize_search_limit(params.get('limit'))
+        fuzzy = str(params.get('fuzzy', '')).lower() in ('1', 'true', 'yes')
+
+        # データベース操作（RDSは全文インデックス、DynamoDBはプロセス内のn-gramインデックス）
+        db = get_db_interface()
+        devices = db.search_devices(query, limit, fuzzy)
+
+        return {
+            'statusCode': 200,
+            'body': dumps_text(devices)
+        }
+
+    except ValidationError as e:
+        return {
+            'statusCode': 400,
+            'body': dumps_text({
+                'error': e.message,
+                'details': e.details
+            })
+        }
+    except SearchIndexNotReadyError as e:
+        # DynamoDBの検索インデックスを構築中（構築はバックグラウンドで続く）
+        return {
+            'statusCode': 503,
+            'headers': {'Retry-After': str(e.retry_after)},
+            'body': dumps_text({
+                'error': e.message
+            })
+        }
+    except Exception as e:
+        logger.error("エラー: %s", e)
+        # 接続が壊れている可能性があるため、次回の呼び出しでヘルスチェックを行う
+        report_db_interface_failure()
+        return {
+            'statusCode': 500,
+            'body': dumps_text({
+                'error': 'Internal server error'
+            })
+        }
@@ -1,11 +1,13 @@
 import json
-from common.db_interface import get_db_interface
-import logging
+from common.db_interface import get_db_interface, report_db_interface_failure
+from common.serialization import dumps_text
+from common.metrics import timed_handler
+from common.logger import setup_logger
 
 # ロガーの設定
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = setup_logger(__name__)
 
+@timed_handler('update')
 def handler(event, context):
     """デバイスを更新するLambda関数"""
     try:
@@ -22,7 +24,7 @@ def handler(event, context):
         if not update_data:
             return {
                 'statusCode': 400,
-                'body': json.dumps({
+                'body': dumps_text({
                     'error': '更新可能なフィールドがありません'
                 })
             }
@@ -30,32 +32,31 @@ def handler(event, context):
         # データベース操作
         db = get_db_interface()
         
-        # デバイスの存在確認
-        existing_device = db.get_device(device_id)
-        if not existing_device:
+        # デバイスの更新（存在確認も同じ書き込みで行う）
+        updated_device = db.update_device(device_id, update_data)
+        if not updated_device:
             return {
                 'statusCode': 404,
-                'body': json.dumps({
+                'body': dumps_text({
                     'error': 'デバイスが見つかりません'
                 })
             }
         
-        # デバイスの更新
-        updated_device = db.update_device(device_id, update_data)
-        
         return {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': dumps_text({
                 'message': 'デバイスを更新しました',
                 'device': updated_device
-            }, default=str)
+            })
         }
             
     except Exception as e:
-        logger.error(f"エラー: {str(e)}")
+        logger.error("エラー: %s", e)
+        # 接続が壊れている可能性があるため、次回の呼び出しでヘルスチェックを行う
+        report_db_interface_failure()
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': dumps_text({
                 'error': 'Internal server error'
             })
         } 
\ No newline at end of file
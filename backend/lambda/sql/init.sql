@@ -20,13 +20,19 @@ CREATE TABLE devices (
     id VARCHAR(36) PRIMARY KEY,
     name VARCHAR(255) NOT NULL COMMENT '機器名',
     manufacturer VARCHAR(255) NOT NULL COMMENT 'メーカー名',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    name_search VARCHAR(255) NOT NULL COMMENT '検索用に正規化した機器名',
+    -- ETagが同じ秒の中の更新でも変わるよう、マイクロ秒まで保存する
+    created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+    updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- インデックスの作成
 CREATE INDEX idx_devices_name ON devices(name);
 CREATE INDEX idx_devices_manufacturer ON devices(manufacturer);
+-- 一覧のキーセットページネーション用
+CREATE INDEX idx_devices_created_at_id ON devices(created_at, id);
+-- 部分一致検索用の全文インデックス（ngramパーサー）
+CREATE FULLTEXT INDEX ft_devices_name_search ON devices(name_search) WITH PARSER ngram;
 
 -- コメントの追加
 ALTER TABLE devices
@@ -36,5 +42,5 @@ ALTER TABLE devices
     MODIFY COLUMN id VARCHAR(36) COMMENT 'デバイスの一意識別子（UUID）',
     MODIFY COLUMN name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT '機器名',
     MODIFY COLUMN manufacturer VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT 'メーカー名',
-    MODIFY COLUMN created_at TIMESTAMP COMMENT 'レコード作成日時',
-    MODIFY COLUMN updated_at TIMESTAMP COMMENT 'レコード更新日時';
\ No newline at end of file
+    MODIFY COLUMN created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) COMMENT 'レコード作成日時',
+    MODIFY COLUMN updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6) COMMENT 'レコード更新日時';
\ No newline at end of file
@@ -3,24 +3,32 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 import sys
 import os
+import tempfile
 from pathlib import Path
 
 # プロジェクトルートをPythonパスに追加
 project_root = str(Path(__file__).parent.parent)
 sys.path.insert(0, project_root)
 
+# テストに使うDB（TEST_DB=sqlite の場合はMySQLサーバーなしでSQLiteのファイルに対して実行する）
+TEST_DB = os.environ.get("TEST_DB", "mysql").lower()
+SQLITE_TEST_PATH = os.path.join(tempfile.gettempdir(), "test_lambdadb.sqlite")
+
 # 既存の環境変数をクリア
 os.environ.clear()
 
 # テスト用の環境変数を設定
-os.environ["DB_TYPE"] = "rds"
+os.environ["DB_TYPE"] = "sqlite" if TEST_DB == "sqlite" else "rds"
+os.environ["SQLITE_PATH"] = SQLITE_TEST_PATH
 os.environ["DB_HOST"] = "127.0.0.1"
 os.environ["DB_PORT"] = "3306"
 os.environ["DB_USER"] = "root"
 os.environ["DB_PASSWORD"] = "okitasouji"
 os.environ["DB_NAME"] = "test_lambdadb"
+# TestClientはリクエストごとにイベントループが変わるため、非同期エンジンの接続をプールしない
+os.environ["DB_NULL_POOL"] = "true"
 
-from devices.database import Base
+from devices.database import Base, get_engine
 from devices.main import app
 from fastapi.testclient import TestClient
 from devices.common.db_pool import db_pool
@@ -31,6 +39,13 @@ SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{os.environ['DB_USER']}:{os.e
 @pytest.fixture(scope="session")
 def test_db():
     """テスト用データベースのセットアップとクリーンアップ"""
+    if TEST_DB == "sqlite":
+        engine = get_engine()
+        Base.metadata.create_all(bind=engine)
+        yield engine
+        Base.metadata.drop_all(bind=engine)
+        return
+
     # テスト用データベースの作成
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
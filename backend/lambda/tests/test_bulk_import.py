@@ -0,0 +1,89 @@
+import json
+import sqlite3
+from collections import Counter
+from datetime import datetime
+import pytest
+from devices.scripts import insert_test_data
+from devices.scripts.insert_test_data import DeviceGenerator, MANUFACTURERS, parse_args, run_import
+from common.sqlite import SQLiteInterface
+
+@pytest.fixture
+def sqlite_path(tmp_path, monkeypatch):
+    """投入先を一時ディレクトリのSQLiteにする"""
+    path = str(tmp_path / "import.sqlite")
+    monkeypatch.setattr(insert_test_data, "create_db_interface", lambda db_type: SQLiteInterface(path))
+    return path
+
+def count_rows(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM devices").fetchone()
+    finally:
+        connection.close()
+
+def test_generator_is_deterministic_and_skewed():
+    """同じチャンクは何度生成しても同じになり、メーカーの分布が上位に偏ることを確認"""
+    generator = DeviceGenerator(seed=1)
+    assert generator.generate_chunk(3, 500, 10000) == DeviceGenerator(seed=1).generate_chunk(3, 500, 10000)
+    assert len(generator.generate_chunk(2, 100, 250)) == 50
+
+    devices = [device for index in range(10) for device in generator.generate_chunk(index, 500, 5000)]
+    counts = Counter(device["manufacturer"] for device in devices)
+    assert counts.most_common(1)[0][0] == MANUFACTURERS[0][0]
+    assert len({device["id"] for device in devices}) == 5000
+
+def test_import_resumes_after_failure(sqlite_path, tmp_path, monkeypatch):
+    """チャンクの書き込みに失敗すると中断し、--resume で残りのチャンクだけを書き込むことを確認"""
+    checkpoint = str(tmp_path / "import.ckpt")
+    argv = ["--db-type", "sqlite", "--count", "250", "--chunk-size", "50", "--workers", "0", "--checkpoint", checkpoint]
+    write_chunk = insert_test_data._write_chunk
+
+    def failing_write_chunk(chunk_index, *args):
+        if chunk_index == 2:
+            raise RuntimeError("テスト用の書き込みエラー")
+        return write_chunk(chunk_index, *args)
+
+    monkeypatch.setattr(insert_test_data, "_write_chunk", failing_write_chunk)
+    assert run_import(parse_args(argv)) == 1
+    with open(checkpoint, encoding="utf-8") as f:
+        state = json.load(f)
+    assert state["next_chunk"] == 2
+    assert count_rows(sqlite_path)[0] == state["rows"]
+
+    monkeypatch.setattr(insert_test_data, "_write_chunk", write_chunk)
+    assert run_import(parse_args(argv + ["--resume"])) == 0
+    assert count_rows(sqlite_path) == (250, 250)
+
+def test_import_ndjson_is_idempotent(sqlite_path, tmp_path):
+    """NDJSONの不正な行をスキップし、IDのない行にも入力から決まるIDを振るため、取り込み直しても重複しないことを確認"""
+    source = tmp_path / "devices.ndjson"
+    rows = [{"name": f"機器{i}", "manufacturer": "メーカー"} for i in range(7)]
+    rows[3] = {"name": "メーカーなし"}
+    source.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n", encoding="utf-8")
+    argv = ["--db-type", "sqlite", "--input", str(source), "--chunk-size", "3", "--workers", "0"]
+
+    assert run_import(parse_args(argv)) == 0
+    assert count_rows(sqlite_path) == (6, 6)
+    assert run_import(parse_args(argv)) == 0
+    assert count_rows(sqlite_path) == (6, 6)
+
+def test_import_keeps_generated_timestamps(sqlite_path):
+    """生成したデバイスの created_at / updated_at が、投入先で現在時刻に置き換えられずに保存されることを確認"""
+    argv = ["--db-type", "sqlite", "--count", "20", "--chunk-size", "8", "--workers", "0", "--seed", "7"]
+    assert run_import(parse_args(argv)) == 0
+
+    generator = DeviceGenerator(seed=7)
+    expected = {
+        device["id"]: (device["created_at"], device["updated_at"])
+        for index in range(3) for device in generator.generate_chunk(index, 8, 20)
+    }
+    connection = sqlite3.connect(sqlite_path)
+    try:
+        rows = connection.execute("SELECT id, created_at, updated_at FROM devices").fetchall()
+    finally:
+        connection.close()
+    imported = {
+        device_id: (datetime.fromisoformat(created_at).isoformat(), datetime.fromisoformat(updated_at).isoformat())
+        for device_id, created_at, updated_at in rows
+    }
+    assert imported == expected
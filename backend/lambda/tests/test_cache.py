@@ -0,0 +1,150 @@
+import pytest
+from fastapi.testclient import TestClient
+from devices.main import app
+from devices.common import cache as cache_module
+from devices.common.cache import LRUTTLCache, CachedDatabaseInterface
+
+client = TestClient(app)
+
+class FakeInterface:
+    """テスト用のデータベースインターフェース（呼び出し回数を記録する）"""
+    def __init__(self):
+        self.devices = {}
+        self.get_calls = 0
+
+    def get_device(self, device_id):
+        self.get_calls += 1
+        return self.devices.get(device_id)
+
+    def get_devices(self, device_ids):
+        self.get_calls += 1
+        found = [self.devices[device_id] for device_id in device_ids if device_id in self.devices]
+        return {'items': found, 'missing': [device_id for device_id in device_ids if device_id not in self.devices]}
+
+    def update_device(self, device_id, device_data):
+        self.devices[device_id] = dict(self.devices[device_id], **device_data)
+        return self.devices[device_id]
+
+    def delete_device(self, device_id):
+        return self.devices.pop(device_id, None) is not None
+
+def test_lru_cache_evicts_least_recently_used():
+    """上限を超えた場合に最も古く使われたエントリが追い出されることを確認"""
+    cache = LRUTTLCache(max_entries=2, ttl=60)
+    cache.set("a", {"id": "a"})
+    cache.set("b", {"id": "b"})
+    cache.get("a")
+    cache.set("c", {"id": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"id": "a"}
+    assert cache.get("c") == {"id": "c"}
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+def test_lru_cache_expires_entries(monkeypatch):
+    """有効期限を過ぎたエントリが返されないことを確認"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = LRUTTLCache(max_entries=10, ttl=30)
+    cache.set("a", {"id": "a"})
+
+    now[0] += 29
+    assert cache.get("a") is not None
+    now[0] += 1
+    assert cache.get("a") is None
+    assert cache.get_stats()["expirations"] == 1
+
+def test_cached_interface_serves_repeat_reads():
+    """2回目以降の取得がデータベースにアクセスしないことを確認"""
+    fake = FakeInterface()
+    fake.devices["a"] = {"id": "a", "name": "テストデバイス"}
+    db = CachedDatabaseInterface(fake, LRUTTLCache(max_entries=10, ttl=60))
+
+    assert db.get_device("a")["name"] == "テストデバイス"
+    assert db.get_device("a")["name"] == "テストデバイス"
+    assert fake.get_calls == 1
+    stats = db.get_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+    # 一括取得ではキャッシュにないIDだけを問い合わせる
+    fake.devices["b"] = {"id": "b", "name": "テストデバイス2"}
+    result = db.get_devices(["a", "b", "x"])
+    assert [device["id"] for device in result["items"]] == ["a", "b"]
+    assert result["missing"] == ["x"]
+    assert fake.get_calls == 2
+
+def test_cached_interface_invalidates_on_write():
+    """更新・削除でキャッシュが置き換え・削除されることを確認"""
+    fake = FakeInterface()
+    fake.devices["a"] = {"id": "a", "name": "更新前"}
+    db = CachedDatabaseInterface(fake, LRUTTLCache(max_entries=10, ttl=60))
+    db.get_device("a")
+
+    db.update_device("a", {"name": "更新後"})
+    assert db.get_device("a")["name"] == "更新後"
+
+    db.delete_device("a")
+    assert db.get_device("a") is None
+
+def test_lru_cache_skips_sets_invalidated_during_read():
+    """読み込みを始めた後に無効化されたキーは、世代を指定した set で登録されないことを確認"""
+    cache = LRUTTLCache(max_entries=1, ttl=60)
+    generation = cache.generation()
+    cache.invalidate("a")
+    assert cache.set("a", {"id": "a"}, generation) is False
+    assert cache.get("a") is None
+    assert cache.set("a", {"id": "a"}, cache.generation()) is True
+
+    # 無効化の記録から溢れたキーも、読み込み中に無効化された可能性があれば登録しない
+    generation = cache.generation()
+    cache.invalidate("b")
+    cache.invalidate("c")
+    assert cache.set("b", {"id": "b"}, generation) is False
+    assert cache.get_stats()["stale_sets"] == 2
+
+def test_cached_interface_does_not_cache_rows_read_before_update():
+    """読み込み中に更新がコミットされた場合、更新前の行がキャッシュに残らないことを確認"""
+    fake = FakeInterface()
+    fake.devices["a"] = {"id": "a", "name": "更新前"}
+    db = CachedDatabaseInterface(fake, LRUTTLCache(max_entries=10, ttl=60))
+    read = fake.get_device
+
+    def read_overlapping_update(device_id):
+        # 更新前の行を読んだ後、キャッシュに登録する前に別のリクエストの更新が完了する
+        device = read(device_id)
+        db.update_device(device_id, {"name": "更新後"})
+        return device
+
+    fake.get_device = read_overlapping_update
+    assert db.get_device("a")["name"] == "更新前"
+    fake.get_device = read
+    assert db.get_device("a")["name"] == "更新後"
+    assert db.get_cache_stats()["stale_sets"] == 1
+
+@pytest.fixture
+def device_cache(monkeypatch):
+    """FastAPIのルートでデバイスキャッシュを有効にする"""
+    monkeypatch.setenv("DEVICE_CACHE_ENABLED", "true")
+    monkeypatch.setattr(cache_module, "_device_cache", None)
+    yield
+    monkeypatch.setattr(cache_module, "_device_cache", None)
+
+def test_get_device_route_uses_cache(test_db, device_cache):
+    """GET /devices/{id} の繰り返しがキャッシュから返され、更新・削除で無効化されることを確認"""
+    response = client.post("/api/v1/devices/", json={"name": "キャッシュ機器", "manufacturer": "テストメーカー"})
+    device_id = response.json()["id"]
+
+    client.get(f"/api/v1/devices/{device_id}")
+    response = client.get(f"/api/v1/devices/{device_id}")
+    assert response.status_code == 200
+    assert cache_module.get_device_cache().get_stats()["hits"] >= 1
+
+    response = client.put(f"/api/v1/devices/{device_id}", json={"name": "更新後", "manufacturer": "テストメーカー"})
+    assert response.status_code == 200
+    assert client.get(f"/api/v1/devices/{device_id}").json()["name"] == "更新後"
+
+    client.delete(f"/api/v1/devices/{device_id}")
+    assert client.get(f"/api/v1/devices/{device_id}").status_code == 404
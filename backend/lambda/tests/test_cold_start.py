@@ -0,0 +1,42 @@
+import os
+import sys
+import subprocess
+from devices.scripts.import_profile import DEVICES_DIR, LAMBDA_DIR, parse_importtime, summarize
+
+def _loaded_modules(path: str, module: str) -> set:
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    env = dict(os.environ, PYTHONPATH=path)
+    result = subprocess.run([sys.executable, '-c', code], cwd=path, env=env, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+def test_lambda_handler_import_does_not_load_db_drivers():
+    """Lambdaのハンドラーのインポート時にDBドライバーを読み込まないことを確認"""
+    modules = _loaded_modules(DEVICES_DIR, 'read')
+
+    assert 'mysql.connector' not in modules
+    assert 'aiomysql' not in modules
+    assert 'dotenv' not in modules
+
+def test_database_import_does_not_create_engine():
+    """devices.database のインポート時にエンジンを生成しないことを確認"""
+    modules = _loaded_modules(LAMBDA_DIR, 'devices.database')
+
+    assert 'mysql.connector' not in modules
+    assert 'aiomysql' not in modules
+
+def test_parse_importtime():
+    """-X importtime の出力をパッケージごとに集計できることを確認"""
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |     sqlalchemy.util",
+        "import time:       300 |        400 |   sqlalchemy",
+        "import time:        50 |         50 | json",
+        "import time:      1000 |       1450 | devices",
+    ])
+    entries = parse_importtime(output)
+    total, per_package = summarize(entries)
+
+    assert entries[0] == ("sqlalchemy.util", 100, 100, 2)
+    assert entries[-1] == ("devices", 1000, 1450, 0)
+    assert total == 1.5
+    assert per_package == {"sqlalchemy": 0.4, "json": 0.05, "devices": 1.0}
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+from devices.common.db_health import ConnectionHealthManager, install_sqlalchemy_health_checks, retry_on_disconnect
+
+class DisconnectError(Exception):
+    """テスト用の切断エラー（MySQLのエラー番号を持つ）"""
+    def __init__(self, errno):
+        super().__init__(f"{errno}: Lost connection")
+        self.errno = errno
+
+class FlakyInterface:
+    """最初の呼び出しだけ切断エラーを送出するインターフェース"""
+    def __init__(self, errno):
+        self.errno = errno
+        self.calls = 0
+        self.health = ConnectionHealthManager("test", lambda connection: True, check_interval=0)
+
+    def _call(self):
+        self.calls += 1
+        if self.calls == 1:
+            raise DisconnectError(self.errno)
+        return "ok"
+
+    @retry_on_disconnect()
+    def read(self):
+        return self._call()
+
+    @retry_on_disconnect(idempotent=False)
+    def write(self):
+        return self._call()
+
+def test_retry_on_disconnect():
+    """読み込みは切断エラーで1回だけ再実行し、書き込みはクエリが届いていない場合だけ再実行することを確認"""
+    reader = FlakyInterface(2013)
+    assert reader.read() == "ok"
+    assert reader.health.get_stats()["disconnect_retries"] == 1
+
+    # 2013（クエリ中の切断）は書き込みが実行済みの可能性があるため再実行しない
+    with pytest.raises(DisconnectError):
+        FlakyInterface(2013).write()
+    assert FlakyInterface(2006).write() == "ok"
+
+    # 切断以外のエラーは再実行しない
+    with pytest.raises(DisconnectError):
+        FlakyInterface(1062).read()
+
+def test_sqlalchemy_checks_only_idle_connections(tmp_path):
+    """SQLAlchemyのプールで、アイドル時間が長い接続だけを確認し、切れていれば借り直すことを確認"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'health.sqlite'}", poolclass=QueuePool)
+    health = install_sqlalchemy_health_checks(engine, "test")
+    try:
+        for _ in range(3):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        assert health.get_stats()["probes"] == 0
+        assert health.get_stats()["probes_avoided"] == 3
+
+        health.idle_seconds = 0
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        assert health.get_stats()["probes"] == 1
+
+        # 確認に失敗した接続は破棄され、新しい接続で借り直される
+        health._ping = lambda connection: False
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT 1")).scalar() == 1
+        assert health.get_stats()["probe_failures"] == 1
+    finally:
+        engine.dispose()
@@ -0,0 +1,120 @@
+import pytest
+from mysql.connector.errors import PoolError
+from devices.common import db_pool as db_pool_module
+from devices.common.db_pool import DatabaseConnectionPool, default_db_config, rds_db_config
+from devices.common.metrics import emf_record, metrics
+from devices.common.timing import RequestTiming
+
+class FakeConnection:
+    """テスト用のMySQL接続"""
+    def __init__(self):
+        self.autocommit = False
+        self.in_transaction = False
+        self.closed = False
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+    def is_connected(self):
+        return self.alive
+
+@pytest.fixture
+def pool(monkeypatch):
+    """実際には接続しないプール（pool_size=2, max_overflow=1）"""
+    monkeypatch.setattr(db_pool_module.mysql.connector, "connect", lambda **kwargs: FakeConnection())
+    return DatabaseConnectionPool({}, pool_size=2, max_overflow=1, min_idle=1, timeout=0.05)
+
+def test_pool_warm_up(pool):
+    """warm_up で最小アイドル数の接続が確立されることを確認"""
+    pool.warm_up()
+    stats = pool.get_stats()
+    assert stats["idle"] == 1
+    assert stats["connections_created"] == 1
+
+def test_pool_reuses_returned_connection(pool):
+    """返却された接続が再利用されることを確認"""
+    with pool.connection() as first:
+        raw = first._connection
+    with pool.connection() as second:
+        assert second._connection is raw
+    stats = pool.get_stats()
+    assert stats["checkouts"] == 2
+    assert stats["connections_created"] == 1
+    assert stats["in_use"] == 0
+    assert stats["checkout_latency_ms"]["le_inf"] == 2
+
+def test_pool_overflow_and_timeout(pool):
+    """上限を超えた場合は一時接続を作り、それも使い切るとタイムアウトすることを確認"""
+    connections = [pool.get_connection() for _ in range(3)]
+    assert pool.get_stats()["in_use"] == 3
+
+    with pytest.raises(PoolError):
+        pool.get_connection()
+    assert pool.get_stats()["timeouts"] == 1
+
+    # 一時的な接続は返却時に閉じられる
+    for connection in connections:
+        connection.close()
+    stats = pool.get_stats()
+    assert stats["idle"] == 2
+    assert stats["size"] == 2
+    assert stats["connections_discarded"] == 1
+
+def test_pool_discards_invalidated_connection(pool):
+    """壊れた接続はプールに戻さず破棄することを確認"""
+    connection = pool.get_connection()
+    raw = connection._connection
+    connection.invalidate()
+    connection.close()
+    assert raw.closed
+    assert pool.get_stats()["idle"] == 0
+
+def test_pool_probes_only_stale_connections(pool):
+    """アイドル時間が短い接続は確認せず、長くアイドルだった切断済みの接続は作り直すことを確認"""
+    with pool.connection() as first:
+        raw = first._connection
+    with pool.connection() as second:
+        assert second._connection is raw
+    assert pool.get_stats()["probes_avoided"] == 1
+    assert pool.get_stats()["probes"] == 0
+
+    pool.health.idle_seconds = 0
+    raw.alive = False
+    with pool.connection() as third:
+        assert third._connection is not raw
+    stats = pool.get_stats()
+    assert raw.closed
+    assert (stats["probes"], stats["probe_failures"]) == (1, 1)
+    assert (stats["size"], stats["in_use"], stats["connections_created"]) == (1, 0, 2)
+
+def test_pool_refresh_idle_replaces_dead_connections(pool):
+    """バックグラウンドの確認で、切れたアイドル接続が破棄され min_idle 本まで作り直されることを確認"""
+    pool.warm_up()
+    pool.health.idle_seconds = 0
+    [(raw, _)] = list(pool._idle)
+    raw.alive = False
+    pool.refresh_idle()
+    stats = pool.get_stats()
+    assert raw.closed
+    assert (stats["idle"], stats["size"], stats["in_use"]) == (1, 1, 0)
+    assert stats["connections_discarded"] == 1
+
+def test_db_configs_pin_session_time_zone_to_utc():
+    """全ての接続設定でセッションのタイムゾーンがUTCに固定されることを確認（utc_now() とサーバーの時計を揃える）"""
+    assert default_db_config()['time_zone'] == '+00:00'
+    assert rds_db_config()['time_zone'] == '+00:00'
+
+def test_pool_exports_metrics(pool):
+    """取得時間・操作の回数・接続数が /metrics とEMFに出力されることを確認"""
+    metrics.reset()
+    with pool.connection():
+        body = metrics.render_prometheus()
+        assert emf_record("read", "GET", "200", RequestTiming(), 0.0)["device_db_pool_connections_in_use"] >= 1
+    assert 'device_db_pool_checkout_seconds_count{backend="rds"} 1' in body
+    assert 'device_db_pool_events_total{backend="rds",event="checkout"} 1' in body
+    assert 'device_db_pool_events_total{backend="rds",event="created"} 1' in body
+
+    lines = metrics.render_prometheus().splitlines()
+    assert "# TYPE device_db_pool_connections_idle gauge" in lines
+    assert any(line.startswith("device_db_pool_connections_idle ") and float(line.split()[1]) >= 1 for line in lines)
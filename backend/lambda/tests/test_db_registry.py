@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+import pytest
+from devices.common import db_registry
+from devices.common.db_registry import DatabaseInterfaceRegistry
+from devices.common.metrics import metrics
+from devices.common.settings import reload_settings
+
+class FakeInterface:
+    """テスト用のデータベースインターフェース"""
+    def __init__(self):
+        self.healthy = True
+        self.closed = False
+
+    def is_healthy(self):
+        return self.healthy
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def registry(monkeypatch):
+    """生成処理をテスト用インターフェースに差し替えたレジストリ"""
+    monkeypatch.setattr(db_registry, "create_db_interface", lambda db_type: FakeInterface())
+    monkeypatch.setenv("RDS_HOST", "db-1")
+    return DatabaseInterfaceRegistry()
+
+def test_registry_reuses_instance(registry):
+    """ウォームスタート時に同じインスタンスが再利用されることを確認"""
+    first = registry.get("rds")
+    second = registry.get("rds")
+    assert first is second
+    assert registry.get_stats()["created"] == 1
+    assert registry.get_stats()["reused"] == 1
+
+def test_registry_exports_metrics(registry):
+    """生成・再利用の回数が /metrics に出力されることを確認"""
+    metrics.reset()
+    registry.get("rds")
+    registry.get("rds")
+    body = metrics.render_prometheus()
+    assert 'device_db_interface_events_total{backend="rds",event="created"} 1' in body
+    assert 'device_db_interface_events_total{backend="rds",event="reused"} 1' in body
+
+def test_registry_recreates_on_config_change(registry, monkeypatch):
+    """接続設定が変わった場合に作り直されることを確認"""
+    first = registry.get("rds")
+    monkeypatch.setenv("RDS_HOST", "db-2")
+    second = registry.get("rds")
+    assert first is not second
+    assert first.closed
+    assert registry.get_stats()["recreated"] == 1
+
+def test_registry_recreates_after_failed_health_check(registry):
+    """エラー後のヘルスチェックに失敗した場合に作り直されることを確認"""
+    first = registry.get("rds")
+
+    # エラー後でも接続が正常であれば再利用する
+    registry.mark_failed("rds")
+    assert registry.get("rds") is first
+
+    # 接続が壊れていれば作り直す
+    first.healthy = False
+    registry.mark_failed("rds")
+    second = registry.get("rds")
+    assert second is not first
+    stats = registry.get_stats()
+    assert stats["health_checks"] == 2
+    assert stats["health_check_failures"] == 1
+    assert stats["recreated"] == 1
+
+def test_registry_checks_health_after_idle_setting(registry, monkeypatch):
+    """DB_HEALTH_IDLE_SECONDS（接続プールと同じ設定）以上アイドルだった場合だけヘルスチェックすることを確認"""
+    monkeypatch.setenv("DB_HEALTH_IDLE_SECONDS", "30")
+    reload_settings()
+    now = [1000.0]
+    monkeypatch.setattr(db_registry, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    try:
+        first = registry.get("rds")
+        now[0] += 29
+        assert registry.get("rds") is first
+        assert registry.get_stats()["health_checks"] == 0
+
+        first.healthy = False
+        now[0] += 30
+        assert registry.get("rds") is not first
+        assert registry.get_stats()["health_checks"] == 1
+    finally:
+        monkeypatch.delenv("DB_HEALTH_IDLE_SECONDS")
+        reload_settings()
@@ -0,0 +1,148 @@
+import time
+from types import SimpleNamespace
+import pytest
+from botocore.exceptions import ClientError
+from devices.common import dynamodb as dynamodb_module
+from devices.common.dynamodb import DynamoDBInterface
+from devices.common.pagination import decode_cursor
+from devices.common.settings import reload_settings
+
+def conditional_check_failed(operation):
+    return ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"}},
+        operation
+    )
+
+class FakeTable:
+    """ConditionExpression と Limit / ExclusiveStartKey に従って応答するテスト用のテーブル"""
+    name = "devices"
+
+    def __init__(self, items):
+        self.items = {item["id"]: dict(item) for item in items}
+        self.calls = []
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeValues,
+                    ExpressionAttributeNames, ReturnValues):
+        assert ConditionExpression == "attribute_exists(id)"
+        item = self.items.get(Key["id"])
+        if item is None:
+            raise conditional_check_failed("UpdateItem")
+        for name, field in ExpressionAttributeNames.items():
+            item[field] = ExpressionAttributeValues[f":{name[1:]}"]
+        return {"Attributes": dict(item)}
+
+    def delete_item(self, Key, ConditionExpression):
+        assert ConditionExpression == "attribute_exists(id)"
+        if self.items.pop(Key["id"], None) is None:
+            raise conditional_check_failed("DeleteItem")
+
+    def _page(self, items, key_names, Limit, ExclusiveStartKey=None):
+        ids = [item["id"] for item in items]
+        start = ids.index(ExclusiveStartKey["id"]) + 1 if ExclusiveStartKey else 0
+        response = {"Items": items[start:start + Limit]}
+        if start + Limit < len(items):
+            last = items[start + Limit - 1]
+            response["LastEvaluatedKey"] = {name: last[name] for name in key_names}
+        return response
+
+    def scan(self, Limit, ExclusiveStartKey=None, **kwargs):
+        self.calls.append(("scan", ExclusiveStartKey))
+        return self._page(list(self.items.values()), ("id",), Limit, ExclusiveStartKey)
+
+    def query(self, IndexName, KeyConditionExpression, Limit, ExclusiveStartKey=None, **kwargs):
+        self.calls.append(("query", ExclusiveStartKey))
+        field = KeyConditionExpression.get_expression()["values"][0].name
+        value = KeyConditionExpression.get_expression()["values"][1]
+        items = [item for item in self.items.values() if item.get(field) == value]
+        # GSIの LastEvaluatedKey にはテーブルのキーとインデックスのキーが入る
+        return self._page(items, ("id", field), Limit, ExclusiveStartKey)
+
+class FakeResource:
+    """BatchWriteItem の最初の unprocessed 回は、各リクエストの先頭の1件を書き込まずに返すテスト用のリソース"""
+
+    def __init__(self, table, unprocessed):
+        self.table = table
+        self.unprocessed = unprocessed
+        self.requests = []
+
+    def batch_write_item(self, RequestItems):
+        requests = RequestItems[self.table.name]
+        self.requests.append(len(requests))
+        if self.unprocessed:
+            self.unprocessed -= 1
+            requests, rest = requests[1:], {self.table.name: requests[:1]}
+        else:
+            rest = {}
+        for request in requests:
+            item = request["PutRequest"]["Item"]
+            self.table.items[item["id"]] = item
+        return {"UnprocessedItems": rest}
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    """リクエストを送らないDynamoDBインターフェース（テーブルは5件のデバイスを持つ）"""
+    monkeypatch.setenv("AWS_REGION", "ap-northeast-1")
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", "devices")
+    reload_settings()
+    db = DynamoDBInterface()
+    db.table = FakeTable([
+        {"id": f"device-{i}", "name": f"機器{i}", "manufacturer": "メーカーA" if i % 2 else "メーカーB"}
+        for i in range(5)
+    ])
+    yield db
+    reload_settings()
+
+def test_dynamodb_update_and_delete_missing_device(dynamodb):
+    """存在しないデバイスの更新・削除は ConditionalCheckFailedException になり、None / False を返すことを確認"""
+    assert dynamodb.update_device("device-1", {"name": "更新後"})["name"] == "更新後"
+    assert dynamodb.update_device("missing", {"name": "更新後"}) is None
+    assert "missing" not in dynamodb.table.items
+
+    assert dynamodb.delete_device("device-1") is True
+    assert dynamodb.delete_device("device-1") is False
+
+def test_dynamodb_create_devices_retries_unprocessed_items(dynamodb, monkeypatch):
+    """UnprocessedItems を指数バックオフで再送し、再送回数の上限を超えたものだけを失敗として返すことを確認"""
+    sleeps = []
+    monkeypatch.setattr(dynamodb_module, "time", SimpleNamespace(sleep=sleeps.append, perf_counter=time.perf_counter))
+    monkeypatch.setattr(dynamodb_module, "BATCH_BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(dynamodb_module, "BATCH_MAX_RETRIES", 2)
+    devices = [{"id": f"new-{i}", "name": f"新規{i}", "manufacturer": "メーカーC"} for i in range(30)]
+
+    # 25件単位のリクエストの先頭が2回書き込まれず、再送で書き込まれる
+    dynamodb.dynamodb = FakeResource(dynamodb.table, unprocessed=2)
+    results = dynamodb.create_devices(devices)
+    assert all(result["success"] for result in results)
+    assert dynamodb.dynamodb.requests == [25, 1, 1, 5]
+    assert sleeps == [0.05, 0.1]
+    assert all(f"new-{i}" in dynamodb.table.items for i in range(30))
+
+    # 再送回数の上限（2回）を超えた1件だけが失敗する
+    sleeps.clear()
+    dynamodb.dynamodb = FakeResource(dynamodb.table, unprocessed=3)
+    results = dynamodb.create_devices([{"id": f"late-{i}", "name": "遅延", "manufacturer": "メーカーC"} for i in range(3)])
+    assert [result["success"] for result in results] == [False, True, True]
+    assert sleeps == [0.05, 0.1]
+
+@pytest.mark.parametrize("filters, expected", [
+    (None, [f"device-{i}" for i in range(5)]),
+    ({"manufacturer": "メーカーA"}, ["device-1", "device-3"]),
+])
+def test_dynamodb_list_devices_page_round_trips_cursor(dynamodb, filters, expected):
+    """LastEvaluatedKey がカーソルになり、次のページの ExclusiveStartKey にそのまま戻ることを確認（Scan / GSIへの Query）"""
+    items, cursor, last_keys = [], None, []
+    while True:
+        page = dynamodb.list_devices_page(1 if filters else 2, cursor, filters)
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        last_keys.append(decode_cursor(cursor))
+    assert [item["id"] for item in items] == expected
+
+    operation = "query" if filters else "scan"
+    calls = dynamodb.table.calls
+    assert [name for name, _ in calls] == [operation] * len(calls)
+    assert [start for _, start in calls] == [None] + last_keys
+    if filters:
+        assert last_keys[0] == {"id": "device-1", "manufacturer": "メーカーA"}
@@ -0,0 +1,58 @@
+import json
+import logging
+from devices.common import logger as logger_module
+from devices.common.logger import JsonFormatter, SamplingFilter, configure_logging, flush_logging, setup_logger
+
+def make_record(msg, *args, level=logging.INFO, created=1000.0, **extra):
+    record = logging.makeLogRecord({
+        "name": "devices.common.rds", "levelno": level, "levelname": logging.getLevelName(level),
+        "msg": msg, "args": args, **extra
+    })
+    record.created = created
+    return record
+
+def test_json_formatter_includes_extra_and_exception():
+    """引数を展開したメッセージ・extra のフィールド・例外が1行のJSONになることを確認"""
+    try:
+        raise ValueError("テスト")
+    except ValueError as e:
+        record = make_record("デバイスを取得しました: %s", "device-1", device_id="device-1", exc_info=(type(e), e, e.__traceback__))
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "デバイスを取得しました: device-1"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "devices.common.rds"
+    assert entry["device_id"] == "device-1"
+    assert "ValueError: テスト" in entry["exception"]
+
+def test_sampling_filter_limits_info_per_template():
+    """同じテンプレートのINFOは1秒あたり rate 件までになり、間引いた件数が次の1秒に記録されることを確認"""
+    sampling = SamplingFilter(2)
+    passed = [sampling.filter(make_record("デバイスを取得しました: %s", i)) for i in range(5)]
+    assert passed == [True, True, False, False, False]
+
+    # 別のテンプレートとWARNING以上は間引かない
+    assert sampling.filter(make_record("デバイスを削除しました: %s", 1))
+    assert all(sampling.filter(make_record("接続エラー: %s", i, level=logging.WARNING)) for i in range(5))
+
+    record = make_record("デバイスを取得しました: %s", 5, created=1001.0)
+    assert sampling.filter(record)
+    assert record.sampled_out == 3
+
+def test_queue_pipeline_writes_json(monkeypatch, capsys):
+    """キュー経由でバックグラウンドのスレッドから出力され、ロガーごとのレベルが反映されることを確認"""
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_LEVELS", "devices.test.quiet=WARNING")
+    monkeypatch.setenv("LOG_SAMPLE_PER_SECOND", "0")
+    configure_logging(force=True)
+    try:
+        setup_logger("devices.test.quiet").info("出力しない")
+        setup_logger("devices.test").info("デバイスを作成しました: %s", "device-1", extra={"count": 1})
+        flush_logging()
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+        assert [(line["message"], line["count"]) for line in lines] == [("デバイスを作成しました: device-1", 1)]
+        handlers = [h for h in logging.getLogger().handlers if getattr(h, "listener", None) is not None]
+        assert handlers == [logger_module._handler]
+    finally:
+        monkeypatch.delenv("LOG_LEVELS")
+        logging.getLogger("devices.test.quiet").setLevel(logging.NOTSET)
+        configure_logging(force=True)
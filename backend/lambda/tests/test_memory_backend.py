@@ -0,0 +1,140 @@
+import tracemalloc
+from datetime import datetime, timedelta
+from devices.common.db_interface import create_db_interface
+from devices.common.memory import MemoryInterface
+from devices.common.search import normalize_text
+
+BASE = datetime(2024, 1, 1)
+
+def make_rows(count):
+    return [
+        {
+            "id": f"device-{i:05d}",
+            "name": f"テストデバイス{i}",
+            "manufacturer": "".join(["メーカー", str(i % 3)]),
+            "created_at": BASE + timedelta(seconds=i // 2),
+            "updated_at": BASE + timedelta(seconds=i // 2),
+        }
+        for i in range(count)
+    ]
+
+def load(interface, rows):
+    for row in rows:
+        interface.create_device(row)
+    return interface
+
+def read_all(interface, limit, filters=None):
+    """カーソルをたどって全ページを読み込む"""
+    items, cursor = [], None
+    while True:
+        page = interface.list_devices_page(limit, cursor, filters)
+        assert len(page["items"]) <= limit
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+def test_memory_crud():
+    """作成・取得・更新・削除ができることを確認"""
+    db = MemoryInterface()
+    created = db.create_device({"id": "device-1", "name": "テスト機器", "manufacturer": "テストメーカー"})
+    assert created["created_at"] == created["updated_at"]
+
+    assert db.get_device("device-1", ["id", "name"]) == {"id": "device-1", "name": "テスト機器"}
+    assert db.update_device("device-1", {"name": "更新後"})["name"] == "更新後"
+    assert db.update_device("missing", {"name": "更新後"}) is None
+    assert db.delete_device("device-1") is True
+    assert db.delete_device("device-1") is False
+    assert db.get_device("device-1") is None
+    assert db.get_collection_version(10) == MemoryInterface().get_collection_version(10)
+
+def test_memory_pagination_with_filters():
+    """絞り込み・ページングの結果が (created_at, id) 順の全件走査と一致することを確認"""
+    rows = make_rows(50)
+    db = load(MemoryInterface(), reversed(rows))
+    db.update_device("device-00004", {"manufacturer": "メーカー1"})
+    db.delete_device("device-00010")
+
+    expected = [row["id"] for row in rows if row["id"] != "device-00010"]
+    assert [device["id"] for device in read_all(db, 7)] == expected
+
+    for filters in ({"manufacturer": "メーカー1"}, {"manufacturer": "メーカー1", "name": "テストデバイス4"}):
+        devices = [db.get_device(device_id) for device_id in expected]
+        matched = [d["id"] for d in devices if all(d[k] == v for k, v in filters.items())]
+        assert [device["id"] for device in read_all(db, 4, filters)] == matched
+    assert read_all(db, 4, {"name": "存在しない"}) == []
+
+def test_memory_hydrates_and_writes_through_source():
+    """source から読み込み、書き込みが source にも反映されることを確認"""
+    source = load(MemoryInterface(), make_rows(10))
+    replica = MemoryInterface(source)
+    assert len(replica) == 10
+    assert replica.get_device("device-00003") == source.get_device("device-00003")
+
+    replica.create_device({"id": "device-new", "name": "新規", "manufacturer": "メーカー0"})
+    replica.update_device("device-00001", {"name": "更新後"})
+    replica.delete_device("device-00002")
+    assert source.get_device("device-new")["name"] == "新規"
+    assert source.get_device("device-00001")["name"] == "更新後"
+    assert source.get_device("device-00002") is None
+    assert replica.list_devices() == source.list_devices()
+
+def test_memory_delete_devices():
+    """IDまたはメーカーを指定してまとめて削除でき、インデックスからも削除されることを確認"""
+    source = load(MemoryInterface(), make_rows(9))
+    replica = MemoryInterface(source)
+    result = replica.delete_devices(["device-00004", "device-99999", "device-00001"])
+    assert result == {"deleted": ["device-00004", "device-00001"], "missing": ["device-99999"]}
+
+    result = replica.delete_devices(manufacturer="メーカー0")
+    assert result["deleted"] == ["device-00000", "device-00003", "device-00006"]
+    assert result["missing"] == []
+    for db in (source, replica):
+        assert len(db) == 4
+        assert read_all(db, 10, {"manufacturer": "メーカー1"}) == [db.get_device("device-00007")]
+
+def test_memory_search_tracks_writes():
+    """最初の検索でインデックスを作り、その後の書き込みが検索結果に反映されることを確認"""
+    db = load(MemoryInterface(), make_rows(5))
+    query = normalize_text("テストデバイス")
+    assert len(db.search_devices(query, 10)) == 5
+    db.update_device("device-00001", {"name": "別の名前"})
+    db.delete_device("device-00002")
+    assert {d["id"] for d in db.search_devices(query, 10)} == {"device-00000", "device-00003", "device-00004"}
+
+def test_memory_uses_less_memory_than_dict_rows():
+    """インデックスを含めても、行ごとの辞書より1件あたりのメモリが小さいことを確認"""
+    count = 5000
+
+    class Rows:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def iter_devices(self, batch_size=500):
+            yield from self.rows
+
+    def hydrated():
+        db = MemoryInterface()
+        db.hydrate(Rows(make_rows(count)))
+        return db
+
+    def traced(build):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            kept = build()
+            return tracemalloc.get_traced_memory()[0] - before, kept
+        finally:
+            tracemalloc.stop()
+
+    dict_rows, _ = traced(lambda: make_rows(count))
+    memory, _ = traced(hydrated)
+    assert memory < dict_rows
+
+def test_create_db_interface_memory(monkeypatch):
+    """DB_TYPE=memory で、キャッシュのラッパーなしでメモリのインターフェースが生成されることを確認"""
+    monkeypatch.setenv("DEVICE_CACHE_ENABLED", "true")
+    monkeypatch.delenv("DEVICE_MEMORY_SOURCE", raising=False)
+    interface = create_db_interface("memory")
+    assert isinstance(interface, MemoryInterface)
+    assert interface.source is None
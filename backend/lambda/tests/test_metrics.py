@@ -0,0 +1,92 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from devices.main import app
+from devices.common import metrics as metrics_module
+from devices.common.metrics import Histogram, MetricsRegistry, emf_record, metrics, route_template, timed_handler
+from devices.common.serialization import dumps_text
+from devices.common.timing import RequestTiming, record, stage
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+def test_server_timing_header_and_prometheus():
+    """レスポンスに Server-Timing が付き、/metrics にルートのテンプレートごとの集計が出ることを確認"""
+    client = TestClient(app)
+    response = client.get("/")
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert "serialize;dur=" in timing
+    assert timing.split(", ")[-1].startswith("total;dur=")
+
+    client.get("/not-found")
+    body = client.get("/metrics").text
+    assert 'device_api_request_duration_seconds_count{route="/",method="GET",status="200"} 1' in body
+    assert 'device_api_request_duration_seconds_count{route="unmatched",method="GET",status="404"} 1' in body
+    assert 'device_api_stage_duration_seconds_count{route="/",method="GET",stage="serialize"} 1' in body
+
+def test_route_template():
+    """パスパラメータの値が {名前} に置き換わり、一致しないルートはまとめられることを確認"""
+    route = object()
+    assert route_template({"path": "/api/v1/devices/abc", "route": route, "path_params": {"device_id": "abc"}}) \
+        == "/api/v1/devices/{device_id}"
+    assert route_template({"path": "/api/v1/devices/def", "route": route, "path_params": {"device_id": "def"}}) \
+        == "/api/v1/devices/{device_id}"
+    assert route_template({"path": "/api/v1/devices/", "route": object(), "path_params": {}}) == "/api/v1/devices/"
+    assert route_template({"path": "/favicon.ico"}) == "unmatched"
+
+def test_histogram_rendering():
+    """バケットが累積で出力され、ラベルの値がエスケープされることを確認"""
+    registry = MetricsRegistry()
+    timing = RequestTiming()
+    timing.add("db", 0.002)
+    timing.add("db", 0.003)
+    registry.observe('/a"b', "GET", "200", timing, 0.004)
+    registry.observe('/a"b', "GET", "200", RequestTiming(), 0.2)
+
+    lines = registry.render_prometheus().splitlines()
+    labels = 'route="/a\\"b",method="GET",status="200"'
+    assert f'device_api_request_duration_seconds_bucket{{{labels},le="0.0025"}} 0' in lines
+    assert f'device_api_request_duration_seconds_bucket{{{labels},le="0.005"}} 1' in lines
+    assert f'device_api_request_duration_seconds_bucket{{{labels},le="0.25"}} 2' in lines
+    assert f'device_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    # 同じリクエスト内の2回のクエリは合計して1件として集計する
+    assert 'device_api_stage_duration_seconds_count{route="/a\\"b",method="GET",stage="db"} 1' in lines
+
+    histogram = Histogram()
+    histogram.observe(10.0)
+    assert histogram.counts[-1] == 1
+
+def test_timed_handler_adds_header_and_emits_emf(monkeypatch, capsys):
+    """Lambda関数のレスポンスに Server-Timing が付き、EMFのログが1行出力されることを確認"""
+    monkeypatch.setattr(metrics_module, "EMF_ENABLED", True)
+
+    @timed_handler("read")
+    def handler(event, context):
+        with stage("db"):
+            pass
+        record("db", 0.001)
+        return {"statusCode": 200, "headers": {"ETag": '"1"'}, "body": dumps_text({"id": "device-1"})}
+
+    response = handler({"resource": "/devices/{id}", "httpMethod": "GET"}, None)
+    assert response["headers"]["ETag"] == '"1"'
+    assert 'db;dur=' in response["headers"]["Server-Timing"]
+    assert 'desc="2x"' in response["headers"]["Server-Timing"]
+
+    line = json.loads(capsys.readouterr().out.strip())
+    directive = line["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["Route", "Method", "Status"]]
+    assert {m["Name"] for m in directive["Metrics"]} == {"db", "serialize", "total"}
+    assert (line["Route"], line["Method"], line["Status"]) == ("/devices/{id}", "GET", "200")
+    assert line["db"] >= 1.0
+
+def test_stage_without_request_is_noop():
+    """計測中のリクエストがない場合（スクリプトなど）は何も記録しないことを確認"""
+    with stage("db"):
+        pass
+    record("db", 1.0)
+    timing = RequestTiming()
+    assert emf_record("read", "GET", "200", timing, 0.0)["total"] == 0.0
@@ -0,0 +1,115 @@
+import re
+from devices.common import migrations
+from devices.common.migrations import migrate
+from devices.common.search import normalize_text
+
+class FakeSchema:
+    """テスト用のMySQL接続（devices テーブルの列・インデックス・行を保持し、実行した文を記録する）"""
+    def __init__(self, indexes, precision=6, name_search=True, rows=()):
+        self.indexes = dict(indexes)
+        # 列ごとの (日時の精度, NULLを許可するか)
+        self.columns = {'id': (None, False), 'name': (None, False), 'manufacturer': (None, False),
+                        'created_at': (precision, True), 'updated_at': (precision, True)}
+        if name_search:
+            self.columns['name_search'] = (None, False)
+        self.rows = {device_id: {'name': name, 'name_search': None} for device_id, name in rows}
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+class FakeCursor:
+    def __init__(self, schema):
+        self.schema = schema
+        self.rows = []
+
+    def execute(self, statement, params=()):
+        schema = self.schema
+        schema.executed.append(statement)
+        if 'information_schema.STATISTICS' in statement:
+            self.rows = [(name, column) for name, columns in schema.indexes.items() for column in columns]
+        elif 'information_schema.COLUMNS' in statement:
+            self.rows = [(name, precision, 'YES' if nullable else 'NO')
+                         for name, (precision, nullable) in schema.columns.items()]
+        elif statement.startswith('ALTER TABLE devices ADD COLUMN name_search'):
+            schema.columns['name_search'] = (None, True)
+        elif statement.startswith('ALTER TABLE devices MODIFY COLUMN name_search'):
+            assert all(row['name_search'] is not None for row in schema.rows.values())
+            schema.columns['name_search'] = (None, False)
+        elif statement.startswith('SELECT id, name FROM devices WHERE name_search IS NULL'):
+            last_id, limit = params
+            pending = sorted(device_id for device_id, row in schema.rows.items()
+                             if row['name_search'] is None and device_id > last_id)
+            self.rows = [(device_id, schema.rows[device_id]['name']) for device_id in pending[:limit]]
+        else:
+            for name in re.findall(r"MODIFY COLUMN (\w+) TIMESTAMP\(6\)", statement):
+                schema.columns[name] = (6, True)
+            match = re.match(r"CREATE (?:FULLTEXT )?INDEX (\w+) ON devices \(([^)]*)\)", statement)
+            if match:
+                schema.indexes[match.group(1)] = tuple(match.group(2).split(', '))
+
+    def executemany(self, statement, params):
+        self.schema.executed.append(statement)
+        for name_search, device_id in params:
+            self.schema.rows[device_id]['name_search'] = name_search
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+# 作成済みのテーブルにあるインデックス（init_db() の名前）
+CURRENT_INDEXES = {
+    'PRIMARY': ('id',), 'idx_created_at_id': ('created_at', 'id'), 'ft_name_search': ('name_search',)
+}
+
+def test_migrate_adds_missing_indexes_once():
+    """init.sql の名前で作られたインデックスは作り直さず、不足しているインデックスだけを1回だけ作成することを確認"""
+    schema = FakeSchema({'PRIMARY': ('id',), 'idx_devices_name': ('name',), 'ft_devices_name_search': ('name_search',)})
+    assert migrate(schema) == ["インデックス idx_created_at_id を作成"]
+    assert schema.indexes['idx_created_at_id'] == ('created_at', 'id')
+
+    executed = len(schema.executed)
+    assert migrate(schema) == []
+    assert not any(statement.startswith('CREATE') for statement in schema.executed[executed:])
+
+    existing = FakeSchema({'PRIMARY': ('id',), 'idx_devices_created_at_id': ('created_at', 'id'), 'ft_name_search': ('name_search',)})
+    assert migrate(existing) == []
+
+def test_migrate_widens_second_precision_timestamps():
+    """秒精度の日時の列を1回の ALTER TABLE でマイクロ秒精度に変更し、再実行では変更しないことを確認"""
+    schema = FakeSchema(CURRENT_INDEXES, precision=0)
+    assert migrate(schema) == ["列 created_at をマイクロ秒精度に変更", "列 updated_at をマイクロ秒精度に変更"]
+    assert schema.columns['created_at'][0] == schema.columns['updated_at'][0] == 6
+    assert len([statement for statement in schema.executed if statement.startswith('ALTER')]) == 1
+    assert migrate(schema) == []
+
+def test_migrate_adds_and_backfills_name_search(monkeypatch):
+    """name_search 列をNULL許可で追加し、既存の行をバッチごとにコミットしながら埋めてから NOT NULL と全文インデックスを作ることを確認"""
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH_SIZE", 2)
+    names = ["ｾﾝｻｰ", "温度センサー", "カメラ", "ゲートウェイ", "スイッチ"]
+    schema = FakeSchema(
+        {'PRIMARY': ('id',), 'idx_created_at_id': ('created_at', 'id')},
+        name_search=False, rows=[(f"device-{i}", name) for i, name in enumerate(names)]
+    )
+
+    assert migrate(schema) == [
+        "列 name_search を追加",
+        "列 name_search の既存の5行を埋める",
+        "列 name_search を NOT NULL に変更",
+        "インデックス ft_name_search を作成",
+    ]
+    assert schema.commits == 3
+    assert [row['name_search'] for row in schema.rows.values()] == [normalize_text(name) for name in names]
+    assert schema.columns['name_search'] == (None, False)
+    assert schema.indexes['ft_name_search'] == ('name_search',)
+
+    executed = len(schema.executed)
+    assert migrate(schema) == []
+    assert not any(statement.startswith(('ALTER', 'CREATE', 'UPDATE')) for statement in schema.executed[executed:])
@@ -0,0 +1,42 @@
+import threading
+from devices.common.parallel_scan import ParallelScanner
+
+class FakeScanClient:
+    """Segment / TotalSegments と Limit に従ってページを返すテスト用のクライアント"""
+    def __init__(self, count):
+        self.items = [{"id": {"S": f"device-{i}"}, "name": {"S": f"デバイス{i}"}} for i in range(count)]
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def scan(self, TableName, Segment, TotalSegments, Limit, ExclusiveStartKey=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        segment = self.items[Segment::TotalSegments]
+        start = ExclusiveStartKey["offset"] if ExclusiveStartKey else 0
+        response = {"Items": segment[start:start + Limit]}
+        if start + Limit < len(segment):
+            response["LastEvaluatedKey"] = {"offset": start + Limit}
+        if kwargs.get("ReturnConsumedCapacity"):
+            response["ConsumedCapacity"] = {"CapacityUnits": 0.5}
+        return response
+
+def test_parallel_scan_reads_all_pages():
+    """全セグメントの LastEvaluatedKey を辿って全件を読み込むことを確認"""
+    client = FakeScanClient(103)
+    scanner = ParallelScanner(client, "devices", segments=4, page_size=10, max_rcu=1000)
+
+    devices = scanner.scan_all()
+    assert sorted(device["id"] for device in devices) == sorted(f"device-{i}" for i in range(103))
+    assert devices[0]["name"].startswith("デバイス")
+    # セグメントあたり26件前後を10件ずつ読み込む
+    assert client.calls == 12
+
+def test_parallel_scan_stops_when_consumer_stops():
+    """反復を途中でやめた場合に、残りのページを読み込まずに終了することを確認"""
+    client = FakeScanClient(1000)
+    scanner = ParallelScanner(client, "devices", segments=2, page_size=10)
+
+    items = scanner.iter_items()
+    assert len([next(items) for _ in range(5)]) == 5
+    items.close()
+    assert client.calls < 100
@@ -0,0 +1,57 @@
+import os
+import sys
+import pytest
+
+# Lambdaと同じく common をトップレベルのパッケージとして読み込む
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'devices'))
+from devices import read
+from common.sqlite import SQLiteInterface
+
+class CountingInterface:
+    """get_collection_version（バージョンだけを読み込むクエリ）の呼び出し回数を数えるインターフェース"""
+    def __init__(self, db):
+        self.db = db
+        self.version_queries = 0
+
+    def get_collection_version(self, *args):
+        self.version_queries += 1
+        return self.db.get_collection_version(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """一時ディレクトリのSQLiteに3件のデバイスを登録し、read.handler が使うインターフェースにする"""
+    sqlite = SQLiteInterface(str(tmp_path / "read.sqlite"))
+    sqlite.create_devices([{"id": f"device-{i}", "name": f"機器{i}", "manufacturer": "メーカー"} for i in range(3)])
+    interface = CountingInterface(sqlite)
+    monkeypatch.setattr(read, "get_db_interface", lambda: interface)
+    yield interface
+    sqlite.close()
+
+# 計測のデコレーター（timed_handler）を除いたハンドラー（ETagの計算だけを確認する）
+handler = read.handler.__wrapped__
+
+def list_event(headers=None):
+    return {"httpMethod": "GET", "resource": "/devices", "queryStringParameters": {"limit": "2", "fields": "name"},
+            "headers": headers or {}}
+
+def test_list_etag_comes_from_the_page_read(db):
+    """If-None-Match がなければバージョンだけのクエリを実行せず、一覧と同じ読み込みからETagを計算することを確認"""
+    response = handler(list_event(), None)
+    assert response["statusCode"] == 200
+    assert response["headers"]["ETag"].startswith("W/")
+    assert db.version_queries == 0
+
+    response = handler(list_event({"If-None-Match": response["headers"]["ETag"]}), None)
+    assert response["statusCode"] == 304
+    assert db.version_queries == 1
+
+    # ページ内の更新では、条件付きGETでも一覧を返し、新しいETagは本文と同じ読み込みから計算する
+    etag = response["headers"]["ETag"]
+    db.update_device("device-0", {"name": "更新後"})
+    response = handler(list_event({"If-None-Match": etag}), None)
+    assert response["statusCode"] == 200
+    assert '"更新後"' in response["body"]
+    assert response["headers"]["ETag"] not in (etag, None)
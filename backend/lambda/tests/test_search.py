@@ -0,0 +1,81 @@
+import threading
+import pytest
+from devices.common.dynamodb import DynamoDBInterface
+from devices.common.exceptions import SearchIndexNotReadyError
+from devices.common.search import NgramIndex, normalize_text
+from devices.common.settings import reload_settings
+
+def test_normalize_text():
+    """全角・半角、ひらがな・カタカナ、大文字・小文字、空白の違いが正規化されることを確認"""
+    assert normalize_text("ｾﾝｻｰ Ａ") == normalize_text("せんさーa")
+    assert normalize_text("ガス検知器") == "がす検知器"
+
+def test_ngram_index_search():
+    """n-gramインデックスの部分一致・あいまい検索と、書き込みの反映を確認"""
+    index = NgramIndex()
+    index.build([
+        {"id": "1", "name": "温度センサー"},
+        {"id": "2", "name": "温度センサーPro"},
+        {"id": "3", "name": "湿度計"},
+    ])
+
+    assert [device["id"] for device in index.search(normalize_text("センサー"), 10)] == ["1", "2"]
+    assert [device["id"] for device in index.search(normalize_text("度"), 10)] == ["3", "1", "2"]
+
+    # 部分一致しない場合も、n-gramの一致率が高ければあいまい検索で返る
+    assert index.search(normalize_text("温度センター"), 10) == []
+    assert [device["id"] for device in index.search(normalize_text("温度センター"), 10, fuzzy=True)] == ["1", "2"]
+
+    index.update("3", {"name": "湿度センサー"})
+    index.remove("2")
+    assert [device["id"] for device in index.search(normalize_text("センサー"), 10)] == ["1", "3"]
+
+class FakeTable:
+    """テスト用のDynamoDBテーブル（書き込みは常に成功する）"""
+    name = "devices"
+
+    def put_item(self, Item):
+        pass
+
+    def delete_item(self, **kwargs):
+        pass
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    """リクエストを送らないDynamoDBインターフェース"""
+    monkeypatch.setenv("AWS_REGION", "ap-northeast-1")
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", "devices")
+    reload_settings()
+    db = DynamoDBInterface()
+    db.table = FakeTable()
+    yield db
+    reload_settings()
+
+def test_dynamodb_search_index_builds_off_the_request_path(dynamodb):
+    """検索インデックスはバックグラウンドで構築され、構築中は503用の例外を返し、構築中の書き込みも反映されることを確認"""
+    db = dynamodb
+    scanned = threading.Event()
+    release = threading.Event()
+
+    def slow_scan(batch_size=500, filters=None):
+        yield {"id": "1", "name": "温度センサー"}
+        yield {"id": "2", "name": "湿度センサー"}
+        scanned.set()
+        release.wait(5)
+
+    db.iter_devices = slow_scan
+    with pytest.raises(SearchIndexNotReadyError) as excinfo:
+        db.search_devices(normalize_text("センサー"), 10)
+    assert excinfo.value.status_code == 503
+    builder = db._search_index_builder
+    assert db.warm_search_index() is False
+
+    # スキャン済みのデバイスへの書き込みも、構築後のインデックスに反映される
+    assert scanned.wait(5)
+    db.create_device({"id": "3", "name": "気圧センサー"})
+    db.delete_device("1")
+    release.set()
+    builder.join(5)
+
+    assert sorted(device["id"] for device in db.search_devices(normalize_text("センサー"), 10)) == ["2", "3"]
+    assert db._search_index_journal is None
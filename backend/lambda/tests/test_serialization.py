@@ -0,0 +1,45 @@
+import json
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from devices.common import serialization
+from devices.common.serialization import get_encoder, register_engine
+
+DEVICE = {
+    "id": "device-1",
+    "name": "テスト機器",
+    "manufacturer": "テストメーカー",
+    "created_at": datetime(2024, 1, 2, 3, 4, 5),
+    "updated_at": datetime(2024, 1, 2, 3, 4, 5, 678000),
+    "count": Decimal("3"),
+    "ratio": Decimal("0.5"),
+}
+
+@pytest.mark.parametrize("engine", ["json", "orjson", "msgspec"])
+def test_encoders_produce_same_output(engine):
+    """どのエンジンでも同じコンパクトなJSONになることを確認（未インストールのエンジンはスキップ）"""
+    if engine != "json":
+        pytest.importorskip(engine)
+    body = get_encoder(engine)(DEVICE)
+
+    assert b" " not in body
+    assert "テスト機器".encode("utf-8") in body
+    assert json.loads(body) == {
+        "id": "device-1",
+        "name": "テスト機器",
+        "manufacturer": "テストメーカー",
+        "created_at": "2024-01-02T03:04:05",
+        "updated_at": "2024-01-02T03:04:05.678000",
+        "count": 3,
+        "ratio": 0.5,
+    }
+
+def test_unknown_engine_falls_back_to_json(monkeypatch):
+    """未登録のエンジンが指定された場合に標準の json を使うことを確認"""
+    monkeypatch.setattr(serialization, "JSON_ENGINE", "unknown")
+    assert serialization.dumps({"a": 1}) == b'{"a":1}'
+
+def test_register_engine():
+    """エンジンを追加できることを確認"""
+    register_engine("upper", lambda: lambda content: json.dumps(content).upper().encode("utf-8"))
+    assert get_encoder("upper")({"a": "b"}) == b'{"A": "B"}'
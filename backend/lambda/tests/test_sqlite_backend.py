@@ -0,0 +1,230 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from devices.database import Base
+from devices.common.settings import reload_settings
+from devices.common.sqlite import SQLiteInterface
+from devices.common.search import normalize_text
+
+@pytest.fixture
+def make_db(tmp_path, monkeypatch):
+    """一時ディレクトリのSQLiteを使うインターフェースを作る"""
+    created = []
+
+    def make(**env):
+        for key, value in env.items():
+            monkeypatch.setenv(key, str(value))
+        reload_settings()
+        db = SQLiteInterface(str(tmp_path / "devices.sqlite"))
+        created.append(db)
+        return db
+
+    yield make
+    for db in created:
+        db.close()
+    reload_settings()
+
+def committed_count(db):
+    """別の接続から見えるデバイスの件数（コミット済みの件数）"""
+    connection = sqlite3.connect(db.path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM devices").fetchone()[0]
+    finally:
+        connection.close()
+
+def test_sqlite_crud(make_db):
+    """作成・取得・更新・削除ができ、WALモードになっていることを確認"""
+    db = make_db()
+    created = db.create_device({"id": "device-1", "name": "テスト機器", "manufacturer": "テストメーカー"})
+
+    assert db.get_device("device-1") == created
+    assert db.get_device("device-1", ["id", "name"]) == {"id": "device-1", "name": "テスト機器"}
+    updated = db.update_device("device-1", {"name": "更新後"})
+    assert (updated["name"], updated["manufacturer"], updated["created_at"]) == ("更新後", "テストメーカー", created["created_at"])
+    assert updated["updated_at"] > created["updated_at"]
+    assert db.update_device("missing", {"name": "更新後"}) is None
+    assert db.get_devices(["device-1", "missing"], ["id"]) == {"items": [{"id": "device-1"}], "missing": ["missing"]}
+    assert db.delete_device("device-1") is True
+    assert db.delete_device("device-1") is False
+    assert db._writer.execute("PRAGMA journal_mode").fetchone()["journal_mode"] == "wal"
+
+def test_sqlite_pagination_and_search(make_db):
+    """キーセットページネーションと、LIKE の特殊文字を含む検索を確認"""
+    db = make_db()
+    db.create_devices([
+        {"id": f"device-{i:02d}", "name": f"センサー{i}%", "manufacturer": f"メーカー{i % 2}"} for i in range(10)
+    ])
+    db.create_device({"id": "device-xx", "name": "センサー_", "manufacturer": "メーカー0"})
+
+    items, cursor = [], None
+    while True:
+        page = db.list_devices_page(3, cursor, {"manufacturer": "メーカー0"}, ["id"])
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [item["id"] for item in items] == ["device-00", "device-02", "device-04", "device-06", "device-08", "device-xx"]
+
+    assert [d["id"] for d in db.search_devices(normalize_text("ー1%"), 10)] == ["device-01"]
+    assert [d["id"] for d in db.search_devices(normalize_text("ー_"), 10)] == ["device-xx"]
+
+    # 一覧と同じ読み込みで返すバージョンは、バージョンだけを読み込んだ場合と同じ（fields で updated_at を返さなくても）
+    page = db.list_devices_page(3, None, {"manufacturer": "メーカー0"}, ["id", "name"])
+    assert page["items"][0].keys() == {"id", "name"}
+    assert page["version"] == db.get_collection_version(3, None, {"manufacturer": "メーカー0"})
+
+    # ページのバージョンはページ内の更新でだけ変わる
+    version = db.get_collection_version(3)
+    db.update_device("device-09", {"name": "ページ外"})
+    assert db.get_collection_version(3) == version
+    db.update_device("device-01", {"name": "ページ内"})
+    assert db.get_collection_version(3) != version
+
+def test_sqlite_delete_devices(make_db):
+    """IDまたはメーカーを指定してまとめて削除できることを確認"""
+    db = make_db()
+    db.create_devices([
+        {"id": f"device-{i}", "name": f"機器{i}", "manufacturer": "撤去メーカー" if i < 2 else "メーカー"}
+        for i in range(4)
+    ])
+    result = db.delete_devices(["device-3", "device-9", "device-2"])
+    assert result == {"deleted": ["device-3", "device-2"], "missing": ["device-9"]}
+
+    result = db.delete_devices(manufacturer="撤去メーカー")
+    assert sorted(result["deleted"]) == ["device-0", "device-1"]
+    assert db.list_devices() == []
+
+def test_sqlite_create_devices_reports_only_bad_rows(make_db):
+    """一括作成で重複したIDの行だけが失敗し、他の行は登録されることを確認"""
+    db = make_db()
+    db.create_device({"id": "device-1", "name": "既存", "manufacturer": "メーカー"})
+    results = db.create_devices([
+        {"id": f"device-{i}", "name": f"機器{i}", "manufacturer": "メーカー"} for i in range(3)
+    ])
+    assert [result["success"] for result in results] == [True, False, True]
+    assert "UNIQUE" in results[1]["error"]
+    assert db.get_device("device-1")["name"] == "既存"
+    assert committed_count(db) == 3
+
+def test_sqlite_create_devices_keeps_supplied_timestamps(make_db):
+    """一括作成で指定した created_at / updated_at（移行元のISO 8601の文字列）がそのまま保存されることを確認"""
+    db = make_db()
+    db.create_devices([
+        {"id": "device-1", "name": "機器1", "manufacturer": "メーカー",
+         "created_at": "2023-04-01T09:30:15.123456", "updated_at": "2024-01-02T03:04:05.000006+09:00"},
+        {"id": "device-2", "name": "機器2", "manufacturer": "メーカー", "created_at": "2023-05-01T00:00:00"},
+        {"id": "device-3", "name": "機器3", "manufacturer": "メーカー"},
+    ])
+
+    device = db.get_device("device-1")
+    assert device["created_at"] == datetime(2023, 4, 1, 9, 30, 15, 123456)
+    assert device["updated_at"] == datetime(2024, 1, 1, 18, 4, 5, 6)
+    assert db.get_device("device-2")["updated_at"] == datetime(2023, 5, 1)
+    assert db.get_device("device-3")["created_at"] > datetime(2024, 1, 2)
+
+def start_write(db, device_id, results):
+    """別のスレッドでデバイスを作成し、未コミットの書き込みに加わるまで待つ（コミットを待つ書き込みは戻らないため）"""
+    pending = db._pending
+
+    def write():
+        try:
+            results[device_id] = db.create_device({"id": device_id, "name": device_id, "manufacturer": "メーカー"})
+        except sqlite3.Error as e:
+            results[device_id] = e
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while db._pending == pending and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert thread.is_alive()
+    return thread
+
+def test_sqlite_commits_each_write_by_default(make_db):
+    """既定ではグループコミットを行わず、書き込みが戻った時点でコミット済みであることを確認"""
+    db = make_db(SQLITE_COMMIT_BATCH_SIZE=3)
+    db.create_device({"id": "device-1", "name": "機器1", "manufacturer": "メーカー"})
+    assert committed_count(db) == 1
+
+def test_sqlite_batches_commits(make_db):
+    """SQLITE_COMMIT_BATCH_SIZE 件ごとにまとめてコミットし、各書き込みはコミットされるまで戻らないことを確認"""
+    db = make_db(SQLITE_COMMIT_BATCH_SIZE=3, SQLITE_COMMIT_INTERVAL_MS=60000)
+    results = {}
+    threads = [start_write(db, "device-1", results), start_write(db, "device-2", results)]
+    assert committed_count(db) == 0
+    assert results == {}
+
+    db.create_device({"id": "device-3", "name": "機器3", "manufacturer": "メーカー"})
+    for thread in threads:
+        thread.join(5)
+    assert committed_count(db) == 3
+    assert sorted(results) == ["device-1", "device-2"]
+
+    # 読み込み前には未コミットの書き込みをコミットする
+    thread = start_write(db, "device-4", results)
+    assert db.get_device("device-4") is not None
+    thread.join(5)
+    assert committed_count(db) == 4
+
+def test_sqlite_failed_write_keeps_batch(make_db):
+    """失敗した書き込みだけが取り消され、同じバッチの他の書き込みは残ることを確認"""
+    db = make_db(SQLITE_COMMIT_BATCH_SIZE=10, SQLITE_COMMIT_INTERVAL_MS=60000)
+    results = {}
+    thread = start_write(db, "device-1", results)
+    with pytest.raises(sqlite3.IntegrityError):
+        db.create_device({"id": "device-1", "name": "重複", "manufacturer": "メーカー"})
+    db.flush()
+    thread.join(5)
+    assert committed_count(db) == 1
+    assert results["device-1"]["name"] == "device-1"
+
+def test_sqlite_commit_failure_fails_whole_batch(make_db):
+    """コミットに失敗した場合は、同じバッチでコミットを待っていた全ての書き込みが例外になり、何も残らないことを確認"""
+    db = make_db(SQLITE_COMMIT_BATCH_SIZE=10, SQLITE_COMMIT_INTERVAL_MS=60000)
+
+    class FailingCommit:
+        def __init__(self, connection):
+            self.connection = connection
+
+        def execute(self, statement, *args):
+            if statement == "COMMIT":
+                raise sqlite3.OperationalError("disk I/O error")
+            return self.connection.execute(statement, *args)
+
+        def __getattr__(self, name):
+            return getattr(self.connection, name)
+
+    writer = db._writer
+    db._writer = FailingCommit(writer)
+    results = {}
+    threads = [start_write(db, f"device-{i}", results) for i in range(2)]
+    with pytest.raises(sqlite3.OperationalError):
+        db.flush()
+    for thread in threads:
+        thread.join(5)
+    assert all(isinstance(result, sqlite3.OperationalError) for result in results.values()) and len(results) == 2
+
+    db._writer = writer
+    assert committed_count(db) == 0
+    assert db.get_device("device-0") is None
+
+def test_sqlite_schema_matches_models(make_db, tmp_path):
+    """SQLiteInterface が作るインデックスが models から作るもの（init_db）と同じであることを確認"""
+    def indexes(path):
+        connection = sqlite3.connect(path)
+        try:
+            rows = connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+            ).fetchall()
+            return sorted(row[0] for row in rows)
+        finally:
+            connection.close()
+
+    db = make_db()
+    engine = create_engine(f"sqlite:///{tmp_path / 'models.sqlite'}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    assert indexes(db.path) == indexes(str(tmp_path / "models.sqlite"))
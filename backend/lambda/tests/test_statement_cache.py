@@ -0,0 +1,199 @@
+import re
+import pytest
+import mysql.connector
+from devices.common import rds as rds_module
+from devices.common.rds import RDSInterface
+from devices.common.statement_cache import PreparedStatements
+
+def reject_multi_statements(statement):
+    """mysql-connector 9.2 より前と同じく、multi=True なしの複数の文をエラーにする"""
+    if ";" in statement.strip().rstrip(";"):
+        raise mysql.connector.InterfaceError("Use multi=True when executing multiple statements")
+
+def run_on_table(connection, statement, params):
+    """UPDATE / SELECT ... WHERE id = %s を接続の devices テーブル（辞書）に対して実行し、(結果の行, rowcount) を返す"""
+    update = re.match(r"UPDATE devices SET (.+) WHERE id = %s$", statement)
+    if update:
+        columns = re.findall(r"(\w+) = %s", update.group(1))
+        row = connection.table.get(params[-1])
+        if row is not None:
+            row.update(zip(columns, params))
+        return [], int(row is not None)
+    select = re.match(r"SELECT (.+) FROM devices WHERE id = %s$", statement)
+    row = connection.table.get(params[0])
+    rows = [{column: row[column] for column in select.group(1).split(", ")}] if row is not None else []
+    return rows, len(rows)
+
+class FakePreparedCursor:
+    """テスト用の prepared カーソル（mysql-connector と同じく、直前と同じ文字列オブジェクトでなければ準備し直す）"""
+    def __init__(self, connection):
+        self.connection = connection
+        self._executed = None
+        self.rows = []
+        self.rowcount = -1
+        self.closed = False
+
+    def execute(self, statement, params=()):
+        reject_multi_statements(statement)
+        if statement is not self._executed:
+            self.connection.prepared.append(statement)
+            self._executed = statement
+        self.connection.executed.append((statement, tuple(params)))
+        if self.connection.table is not None:
+            self.rows, self.rowcount = run_on_table(self.connection, " ".join(statement.split()), tuple(params))
+            return
+        self.rows = self.connection.results.pop(0) if self.connection.results else []
+        self.rowcount = len(self.rows)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        self.closed = True
+
+class FakeCursor:
+    """テスト用の通常のカーソル"""
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+        self.rowcount = -1
+
+    def execute(self, statement, params=()):
+        reject_multi_statements(statement)
+        self.connection.executed.append((statement, tuple(params)))
+        self.rows = self.connection.results.pop(0) if self.connection.results else []
+        self.rowcount = len(self.rows)
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    """テスト用のMySQL接続（準備した文と実行した文を記録する）"""
+    def __init__(self):
+        self.autocommit = False
+        self.in_transaction = False
+        self.unread_result = False
+        self.connection_id = 1
+        self.prepared = []
+        self.executed = []
+        self.results = []
+        # 行を保持する場合は UPDATE / SELECT をこのテーブルに対して実行する（None の場合は results を順に返す）
+        self.table = None
+        self.transactions = []
+
+    def start_transaction(self):
+        self.in_transaction = True
+        self.transactions.append("START")
+
+    def commit(self):
+        self.in_transaction = False
+        self.transactions.append("COMMIT")
+
+    def rollback(self):
+        self.in_transaction = False
+        self.transactions.append("ROLLBACK")
+
+    def cursor(self, prepared=False, dictionary=False):
+        assert dictionary
+        return FakePreparedCursor(self) if prepared else FakeCursor(self)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def interface(monkeypatch):
+    """実際には接続しないRDSインターフェース（接続は1本だけ作られる）"""
+    connections = []
+
+    def connect(**kwargs):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(rds_module.mysql.connector, "connect", connect)
+    interface = RDSInterface()
+    interface.connections = connections
+    yield interface
+    interface.health.stop()
+
+def test_statements_are_reused_across_checkouts(interface):
+    """同じ形の文は接続を借り直しても再準備されないことを確認"""
+    [connection] = interface.connections
+    connection.results = [[{"id": "device-1", "name": "A"}], [{"id": "device-1", "name": "B"}]]
+    assert interface.get_device("device-1")["name"] == "A"
+    assert interface.get_device("device-1")["name"] == "B"
+
+    interface.delete_device("device-1")
+    interface.delete_device("device-1")
+
+    assert len(connection.prepared) == 2
+    assert connection.prepared[1].startswith("DELETE FROM devices")
+    stats = interface.get_pool_stats()
+    assert stats["checkouts"] == 4
+    assert stats["statement_cache"]["hits"] == 2
+    assert stats["statement_cache"]["misses"] == 2
+    assert stats["statement_cache"]["hit_rate"] == 0.5
+
+def test_reconnect_invalidates_statements(interface):
+    """接続のスレッドIDが変わった（再接続された）場合は準備し直すことを確認"""
+    [connection] = interface.connections
+    interface.delete_device("device-1")
+    interface.delete_device("device-1")
+    connection.connection_id = 2
+    interface.delete_device("device-1")
+    assert len(connection.prepared) == 2
+    assert interface.statements.get_stats()["invalidations"] == 1
+
+def test_in_list_is_padded_and_cache_is_bounded(interface):
+    """IN 句のID数が2のべき乗に揃えられ、接続ごとの文の数が上限を超えると古い文から破棄されることを確認"""
+    interface.statements = PreparedStatements(max_size=2)
+    [connection] = interface.connections
+    connection.results = [[{"id": "a"}, {"id": "b"}, {"id": "c"}], [{"id": "d"}]]
+    result = interface.get_devices(["a", "b", "c"])
+    interface.get_devices(["a", "b", "c", "d"])
+    assert len(connection.prepared) == 1
+    assert connection.executed[0][1] == ("a", "b", "c", "c")
+    assert [device["id"] for device in result["items"]] == ["a", "b", "c"]
+
+    interface.get_device("a")
+    interface.delete_device("a")
+    stats = interface.statements.get_stats()
+    assert stats["evictions"] == 1
+    assert len(connection.prepared) == 3
+
+def test_update_reads_back_row_in_same_transaction(interface):
+    """UPDATE と更新後の行の SELECT を（複数の文を1回で送らずに）1トランザクションで実行し、
+    列の指定順によらず同じ準備済みの文を使い、存在しないIDでは SELECT を省略することを確認"""
+    [connection] = interface.connections
+    connection.table = {"device-1": {
+        "id": "device-1", "name": "A", "name_search": "a", "manufacturer": "X",
+        "created_at": "作成日時", "updated_at": "更新日時"
+    }}
+
+    updated = interface.update_device("device-1", {"name": "C", "manufacturer": "X"})
+    assert (updated["name"], updated["manufacturer"], updated["created_at"]) == ("C", "X", "作成日時")
+    assert updated["updated_at"] != "更新日時"
+    assert "name_search" not in updated
+    assert interface.update_device("device-1", {"manufacturer": "Y", "name": "D"})["manufacturer"] == "Y"
+    assert connection.table["device-1"]["name_search"] == "d"
+    assert connection.transactions == ["START", "COMMIT"] * 2
+
+    executed = len(connection.executed)
+    assert interface.update_device("missing", {"name": "E", "manufacturer": "Z"}) is None
+    assert [statement for statement, _ in connection.executed[executed:]] == [connection.executed[0][0]]
+    assert connection.transactions[-2:] == ["START", "COMMIT"]
+
+    statements = [statement for statement, _ in connection.executed]
+    assert statements[0] == statements[2] and statements[1] == statements[3]
+    assert statements[0].startswith("UPDATE devices SET name = %s, name_search = %s, manufacturer = %s")
+    assert len(connection.prepared) == 2
@@ -5,10 +5,18 @@ const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000
 const API_PATH = '/api/v1/devices';
 
 export const deviceApi = {
-    // デバイス一覧の取得
-    getDevices: async (): Promise<Device[]> => {
-        const response = await axios.get(`${API_BASE_URL}${API_PATH}/`);
-        return response.data;
+    // デバイス一覧の取得（X-Next-Cursor ヘッダーを辿って全ページを取得、name / manufacturer で絞り込み可能）
+    getDevices: async (filters?: { name?: string; manufacturer?: string }): Promise<Device[]> => {
+        const devices: Device[] = [];
+        let cursor: string | undefined;
+        do {
+            const response = await axios.get(`${API_BASE_URL}${API_PATH}/`, {
+                params: { ...filters, ...(cursor ? { cursor } : {}) }
+            });
+            devices.push(...response.data);
+            cursor = response.headers['x-next-cursor'];
+        } while (cursor);
+        return devices;
     },
 
     // 特定のデバイスの取得
@@ -17,6 +25,20 @@ export const deviceApi = {
         return response.data;
     },
 
+    // 複数のデバイスをIDでまとめて取得（見つからなかったIDは missing で返る）
+    getDevicesByIds: async (ids: string[]): Promise<{ items: Device[]; missing: string[] }> => {
+        const response = await axios.post(`${API_BASE_URL}${API_PATH}/lookup`, { ids });
+        return response.data;
+    },
+
+    // デバイス名の部分一致検索（全角・半角、ひらがな・カタカナを区別しない）
+    searchDevices: async (q: string, options?: { limit?: number; fuzzy?: boolean }): Promise<Device[]> => {
+        const response = await axios.get(`${API_BASE_URL}${API_PATH}/search`, {
+            params: { q, ...options }
+        });
+        return response.data;
+    },
+
     // デバイスの作成
     createDevice: async (device: DeviceCreateInput): Promise<Device> => {
         const response = await axios.post(`${API_BASE_URL}${API_PATH}/`, device);
@@ -32,5 +54,13 @@ export const deviceApi = {
     // デバイスの削除
     deleteDevice: async (id: string): Promise<void> => {
         await axios.delete(`${API_BASE_URL}${API_PATH}/${id}`);
+    },
+
+    // 複数のデバイスをIDまたはメーカーでまとめて削除（見つからなかったIDは missing で返る）
+    deleteDevices: async (
+        target: { ids: string[] } | { manufacturer: string }
+    ): Promise<{ deleted: string[]; missing: string[] }> => {
+        const response = await axios.post(`${API_BASE_URL}${API_PATH}/bulk-delete`, target);
+        return response.data;
     }
 }; 
\ No newline at end of file